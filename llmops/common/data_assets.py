@@ -0,0 +1,155 @@
+"""
+Cached, batched resolution of AML data assets.
+
+The index maps data asset names to their latest version and experiment
+datasets to the evaluation datasets related to them through
+RELATED_EXP_DATASET in data_config.json. Missing versions are resolved
+concurrently in one batch, and the index is persisted so that later steps
+of the same build do not call the service again. Assets that may not be
+registered yet, e.g. evaluation datasets, can be resolved lazily: a missing
+one is left pending and resolved again when its data id is first needed.
+"""
+
+import concurrent.futures
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("data_assets")
+
+DEFAULT_INDEX_FILE = "data_assets_index.json"
+
+
+class DataAssetIndex:
+    """
+    Index of data asset versions for one build.
+
+    Args:
+        ml_client: AML client used to resolve missing versions.
+        index_file (str, optional): file persisting the index.
+        build_id (str, optional): build the index belongs to. A persisted
+        index of another build is ignored.
+    """
+
+    def __init__(
+        self,
+        ml_client=None,
+        index_file: Optional[str] = DEFAULT_INDEX_FILE,
+        build_id: Optional[str] = None,
+    ):
+        self.ml_client = ml_client
+        self.index_file = index_file
+        self.build_id = build_id
+        self.versions: Dict[str, str] = {}
+        self.related: Dict[str, str] = {}
+        self.pending: Set[str] = set()
+        if index_file is not None and os.path.exists(index_file):
+            with open(index_file, "r") as index:
+                data = json.load(index)
+            if data.get("build_id") == build_id:
+                self.versions = data.get("versions", {})
+                self.related = data.get("related", {})
+                self.pending = set(data.get("pending", []))
+                logger.info(
+                    f"Loaded {len(self.versions)} data asset versions "
+                    f"from {index_file}"
+                )
+            else:
+                logger.info(f"Ignoring {index_file} of another build")
+
+    def index_config(self, datasets: Iterable[dict]):
+        """
+        Index experiment to evaluation dataset pairings of data_config.json.
+
+        Returns:
+            None
+        """
+        for elem in datasets:
+            if "RELATED_EXP_DATASET" in elem:
+                self.related[elem["RELATED_EXP_DATASET"]] = elem["DATASET_NAME"]
+
+    def record(self, name: str, version: str):
+        """
+        Record the version of a data asset, e.g. right after registering it.
+
+        Returns:
+            None
+        """
+        self.versions[name] = str(version)
+        self.pending.discard(name)
+
+    def _get_latest(self, name: str, lazy: bool = False):
+        try:
+            data = self.ml_client.data.get(name=name, label="latest")
+        except Exception as error:
+            if not lazy:
+                raise
+            logger.info(f"Data asset {name} not found, resolving it later: {error}")
+            return name, None
+        return data.name, data.version
+
+    def resolve(
+        self, names: Iterable[str], max_workers: int = 8, lazy: bool = False
+    ) -> List[Optional[str]]:
+        """
+        Return data ids for the names, resolving missing ones concurrently.
+
+        With lazy, a data asset that cannot be resolved yet is left pending
+        instead of failing, and its data id is None.
+
+        Returns:
+            list: data ids in the azureml:<name>:<version> form.
+        """
+        names = list(names)
+        missing = sorted({name for name in names if name not in self.versions})
+        if missing:
+            logger.info(f"Resolving data assets {missing}")
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(missing)))
+            ) as executor:
+                for name, version in executor.map(
+                    lambda name: self._get_latest(name, lazy), missing
+                ):
+                    if version is None:
+                        self.pending.add(name)
+                    else:
+                        self.record(name, version)
+            self.save()
+        return [
+            f"azureml:{name}:{self.versions[name]}" if name in self.versions else None
+            for name in names
+        ]
+
+    def data_id(self, name: str) -> str:
+        """Return the data id of a data asset, resolving it if still pending."""
+        if name not in self.versions:
+            self.resolve([name])
+        return f"azureml:{name}:{self.versions[name]}"
+
+    def related_dataset(self, experiment_dataset: str) -> Optional[str]:
+        """Return the evaluation dataset related to an experiment dataset."""
+        return self.related.get(experiment_dataset)
+
+    def save(self):
+        """
+        Persist the index to index_file, if configured.
+
+        Returns:
+            None
+        """
+        if self.index_file is None:
+            return
+        with open(self.index_file, "w") as index:
+            json.dump(
+                {
+                    "build_id": self.build_id,
+                    "versions": self.versions,
+                    "related": self.related,
+                    "pending": sorted(self.pending),
+                },
+                index,
+                indent=2,
+                sort_keys=True,
+            )
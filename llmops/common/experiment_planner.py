@@ -0,0 +1,493 @@
+"""
+Experiment design planner for Prompt Flow variant combinations.
+
+This module reads the node variants of a standard flow and enumerates the
+variant combinations to run for a design:
+
+one_at_a_time: every variant of a node with all other nodes at their
+default variant (the historical behaviour of prompt_pipeline).
+full_factorial: every combination of variants across all nodes.
+fractional_factorial: a pairwise covering subset of the full factorial in
+which every pair of variants of two different nodes is run at least once.
+
+For every design it estimates the number of runs, LLM calls, tokens and
+cost from the dataset size before anything is submitted.
+
+Args:
+--flow_to_execute: The name of the flow use case.
+This argument is required to specify the name of the flow to plan.
+--env_name: The environment name for execution.
+This argument is required to specify the environment (dev, test, prod).
+--data_purpose: The data identified by its purpose.
+This argument is required to specify the purpose of the data.
+--rules: Comma separated list of rules, each one multiplies the runs.
+--token_cost_per_1k: Cost of 1000 tokens used for the estimates.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import yaml
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("experiment_planner")
+
+ONE_AT_A_TIME = "one_at_a_time"
+FULL_FACTORIAL = "full_factorial"
+FRACTIONAL_FACTORIAL = "fractional_factorial"
+DESIGNS = (ONE_AT_A_TIME, FULL_FACTORIAL, FRACTIONAL_FACTORIAL)
+
+# rough characters-per-token ratio used for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class LlmNodeEstimate:
+    """
+    Token estimate of a single LLM node call.
+
+    Args:
+        prompt_tokens (int): tokens of the prompt template.
+        completion_tokens (int): max_tokens configured for the node.
+    """
+
+    prompt_tokens: int
+    completion_tokens: int
+
+
+@dataclass
+class FlowVariants:
+    """
+    Variant structure of a flow.
+
+    Args:
+        defaults (dict): default variant id per variant node.
+        variants (dict): ordered variant ids per variant node.
+        estimates (dict): token estimate per (node, variant id). Plain LLM
+        nodes are stored with an empty variant id.
+    """
+
+    defaults: Dict[str, str] = field(default_factory=dict)
+    variants: Dict[str, List[str]] = field(default_factory=dict)
+    estimates: Dict[tuple, LlmNodeEstimate] = field(default_factory=dict)
+
+    def llm_estimates(self, assignments: Dict[str, str]):
+        """Return the token estimates of every LLM call for one line."""
+        return [
+            estimate
+            for (node, variant_id), estimate in self.estimates.items()
+            if variant_id == "" or assignments.get(node) == variant_id
+        ]
+
+
+@dataclass
+class DesignPoint:
+    """
+    A single variant combination of a design.
+
+    Args:
+        assignments (dict): variant id of every variant node.
+        defaults (dict): default variant id of every variant node.
+    """
+
+    assignments: Dict[str, str]
+    defaults: Dict[str, str]
+
+    @property
+    def changed(self) -> Dict[str, str]:
+        """Return the nodes that do not use their default variant."""
+        return {
+            node: variant_id
+            for node, variant_id in self.assignments.items()
+            if self.defaults[node] != variant_id
+        }
+
+    @property
+    def variant_id(self) -> Optional[str]:
+        """Return a label of the combination, None without variants."""
+        if not self.assignments:
+            return None
+        changed = self.changed
+        if not changed:
+            return next(iter(self.assignments.values()))
+        return "_".join(changed.values())
+
+    @property
+    def variant_string(self) -> Optional[str]:
+        """
+        Return the Prompt Flow variant reference of the combination.
+
+        Prompt Flow selects the variant of a single node per run, so this is
+        None when more than one node deviates from its default. Such points
+        are run against a materialized copy of the flow instead.
+        """
+        if not self.assignments:
+            return None
+        changed = self.changed
+        if len(changed) > 1:
+            return None
+        node, variant_id = (
+            next(iter(changed.items())) if changed
+            else next(iter(self.assignments.items()))
+        )
+        return f"${{{node}.{variant_id}}}"
+
+
+@dataclass
+class ExperimentPlan:
+    """
+    Variant combinations of a design with their estimated cost.
+
+    Args:
+        design (str): name of the design.
+        points (list): variant combinations to run per dataset and rule.
+        runs (int): number of bulk runs.
+        llm_calls (int): number of LLM calls over all runs.
+        prompt_tokens (int): estimated prompt tokens over all runs.
+        completion_tokens (int): upper bound of completion tokens.
+        estimated_cost (float): estimated cost of all tokens.
+    """
+
+    design: str
+    points: List[DesignPoint]
+    runs: int = 0
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    estimated_cost: float = 0.0
+
+    def summary(self) -> str:
+        """Return a one line summary of the plan estimates."""
+        return (
+            f"{self.design:<22} runs={self.runs:<5} "
+            f"llm_calls={self.llm_calls:<8} "
+            f"tokens={self.prompt_tokens + self.completion_tokens:<10} "
+            f"cost={self.estimated_cost:.2f}"
+        )
+
+
+def _template_tokens(flow_path: str, node: dict) -> int:
+    source_path = node.get("source", {}).get("path")
+    if source_path is None:
+        return 0
+    template_file = os.path.join(flow_path, source_path)
+    if not os.path.exists(template_file):
+        return 0
+    with open(template_file, "r") as template:
+        return len(template.read()) // CHARS_PER_TOKEN
+
+
+def _node_estimate(flow_path: str, node: dict) -> LlmNodeEstimate:
+    return LlmNodeEstimate(
+        prompt_tokens=_template_tokens(flow_path, node),
+        completion_tokens=int(node.get("inputs", {}).get("max_tokens", 0)),
+    )
+
+
+def read_flow_variants(flow_path: str) -> FlowVariants:
+    """
+    Read the variant nodes and LLM nodes of a flow.dag.yaml.
+
+    Returns:
+        FlowVariants: variants, defaults and token estimates of the flow.
+    """
+    with open(f"{flow_path}/flow.dag.yaml", "r") as yaml_file:
+        yaml_data = yaml.safe_load(yaml_file)
+
+    flow_variants = FlowVariants()
+    for node_name, node_data in yaml_data.get("node_variants", {}).items():
+        flow_variants.defaults[node_name] = node_data["default_variant_id"]
+        flow_variants.variants[node_name] = []
+        for variant_name, variant_data in node_data.get("variants", {}).items():
+            flow_variants.variants[node_name].append(variant_name)
+            variant_node = variant_data.get("node", {})
+            if variant_node.get("type") == "llm":
+                flow_variants.estimates[(node_name, variant_name)] = \
+                    _node_estimate(flow_path, variant_node)
+
+    for node in yaml_data.get("nodes", []):
+        if node.get("type") == "llm":
+            flow_variants.estimates[(node["name"], "")] = \
+                _node_estimate(flow_path, node)
+    return flow_variants
+
+
+def _pairwise_design(variants: Dict[str, List[str]],
+                     defaults: Dict[str, str]) -> List[Dict[str, str]]:
+    """
+    Greedily build a set of combinations covering every pair of variants.
+
+    The all-defaults combination is always part of the design so that each
+    point can be compared against the baseline.
+    """
+    nodes = list(variants)
+    if len(nodes) < 2:
+        return [dict(zip(nodes, levels))
+                for levels in itertools.product(*variants.values())]
+
+    def pairs_of(combination):
+        return {
+            ((nodes[i], combination[i]), (nodes[j], combination[j]))
+            for i, j in itertools.combinations(range(len(nodes)), 2)
+        }
+
+    candidates = list(itertools.product(*variants.values()))
+    baseline = tuple(defaults[node] for node in nodes)
+    uncovered = set()
+    for candidate in candidates:
+        uncovered |= pairs_of(candidate)
+
+    design = [baseline]
+    uncovered -= pairs_of(baseline)
+    while uncovered:
+        best = max(candidates, key=lambda c: len(pairs_of(c) & uncovered))
+        design.append(best)
+        uncovered -= pairs_of(best)
+    return [dict(zip(nodes, combination)) for combination in design]
+
+
+def enumerate_design(flow_variants: FlowVariants,
+                     design: str) -> List[DesignPoint]:
+    """
+    Enumerate the distinct variant combinations of a design.
+
+    Returns:
+        list: design points, a single point without assignments when the
+        flow has no node variants.
+    """
+    defaults = flow_variants.defaults
+    variants = flow_variants.variants
+    if not variants:
+        return [DesignPoint(assignments={}, defaults={})]
+
+    if design == ONE_AT_A_TIME:
+        combinations = []
+        for node, node_variants in variants.items():
+            for variant_id in node_variants:
+                combination = dict(defaults)
+                combination[node] = variant_id
+                combinations.append(combination)
+    elif design == FULL_FACTORIAL:
+        combinations = [
+            dict(zip(variants, levels))
+            for levels in itertools.product(*variants.values())
+        ]
+    elif design == FRACTIONAL_FACTORIAL:
+        combinations = _pairwise_design(variants, defaults)
+    else:
+        raise ValueError(f"Unknown design {design}, expected one of {DESIGNS}")
+
+    points = []
+    seen = set()
+    for combination in combinations:
+        key = tuple(sorted(combination.items()))
+        if key not in seen:
+            seen.add(key)
+            points.append(DesignPoint(assignments=combination, defaults=defaults))
+    return points
+
+
+def count_dataset_rows(data_path: str) -> int:
+    """
+    Count the lines of a local JSON, JSONL or CSV dataset.
+
+    Returns:
+        int: number of rows, 0 when the file cannot be read.
+    """
+    if not os.path.exists(data_path):
+        logger.warning(f"Dataset {data_path} not found, assuming 0 rows")
+        return 0
+    with open(data_path, "r") as data_file:
+        if data_path.endswith(".json"):
+            return len(json.load(data_file))
+        rows = sum(1 for line in data_file if line.strip())
+    return rows - 1 if data_path.endswith(".csv") else rows
+
+
+def average_row_tokens(data_path: str) -> int:
+    """
+    Estimate the tokens a dataset row adds to a prompt.
+
+    Returns:
+        int: average serialized row length in tokens, 0 if unknown.
+    """
+    if not data_path.endswith(".json") or not os.path.exists(data_path):
+        return 0
+    with open(data_path, "r") as data_file:
+        rows = json.load(data_file)
+    if not rows:
+        return 0
+    total_chars = sum(len(json.dumps(row)) for row in rows)
+    return total_chars // len(rows) // CHARS_PER_TOKEN
+
+
+def plan_experiment(
+    flow_variants: FlowVariants,
+    design: str,
+    rows: int,
+    row_tokens: int = 0,
+    datasets: int = 1,
+    rules: int = 1,
+    token_cost_per_1k: float = 0.002,
+) -> ExperimentPlan:
+    """
+    Build a plan for a design and estimate its cost.
+
+    Args:
+        flow_variants (FlowVariants): variants of the standard flow.
+        design (str): one of DESIGNS.
+        rows (int): number of lines over all datasets.
+        row_tokens (int): prompt tokens contributed by each line.
+        datasets (int): number of datasets the design is run against.
+        rules (int): number of rules the design is repeated for.
+        token_cost_per_1k (float): cost of 1000 tokens.
+
+    Returns:
+        ExperimentPlan: the design points and estimates.
+    """
+    plan = ExperimentPlan(
+        design=design,
+        points=enumerate_design(flow_variants, design),
+    )
+    for point in plan.points:
+        estimates = flow_variants.llm_estimates(point.assignments)
+        plan.llm_calls += rows * len(estimates)
+        plan.prompt_tokens += rows * sum(
+            e.prompt_tokens + row_tokens for e in estimates
+        )
+        plan.completion_tokens += rows * sum(
+            e.completion_tokens for e in estimates
+        )
+    plan.runs = len(plan.points) * datasets * rules
+    plan.llm_calls *= rules
+    plan.prompt_tokens *= rules
+    plan.completion_tokens *= rules
+    plan.estimated_cost = (
+        (plan.prompt_tokens + plan.completion_tokens) / 1000 * token_cost_per_1k
+    )
+    return plan
+
+
+def plan_all_designs(**kwargs) -> Dict[str, ExperimentPlan]:
+    """
+    Plan every design with the same inputs and log the comparison.
+
+    Returns:
+        dict: plan per design name.
+    """
+    plans = {design: plan_experiment(design=design, **kwargs)
+             for design in DESIGNS}
+    for plan in plans.values():
+        logger.info(plan.summary())
+    return plans
+
+
+def materialize_flow(flow_path: str, point: DesignPoint,
+                     output_root: str = ".llmops_plans") -> str:
+    """
+    Copy a flow with the variants of a design point set as defaults.
+
+    Used for points that change more than one node, which cannot be
+    expressed with a single Prompt Flow variant reference.
+
+    Returns:
+        str: path of the materialized flow.
+    """
+    key = hashlib.sha256(
+        json.dumps([flow_path, point.assignments], sort_keys=True).encode()
+    ).hexdigest()[:12]
+    target = os.path.join(output_root, f"{os.path.basename(flow_path)}_{key}")
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(
+        flow_path, target,
+        ignore=shutil.ignore_patterns("__pycache__", ".promptflow", ".runs")
+    )
+    flow_file = os.path.join(target, "flow.dag.yaml")
+    with open(flow_file, "r") as yaml_file:
+        yaml_data = yaml.safe_load(yaml_file)
+    for node, variant_id in point.assignments.items():
+        yaml_data["node_variants"][node]["default_variant_id"] = variant_id
+    with open(flow_file, "w") as yaml_file:
+        yaml.safe_dump(yaml_data, yaml_file, sort_keys=False)
+    return target
+
+
+def main():
+    """
+    Run the planner and print the estimates of every design.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser("experiment_planner")
+    parser.add_argument(
+        "--flow_to_execute", type=str, help="flow use case name", required=True
+    )
+    parser.add_argument(
+        "--env_name",
+        type=str,
+        help="environment name(dev, test, prod) for execution",
+        required=True,
+    )
+    parser.add_argument(
+        "--data_purpose",
+        type=str,
+        help="data identified by purpose",
+        required=True
+    )
+    parser.add_argument(
+        "--rules",
+        help="List of rules for MVE experiment",
+        required=False,
+        type=lambda arg: arg.split(","),
+        default=["default"],
+    )
+    parser.add_argument(
+        "--token_cost_per_1k",
+        type=float,
+        help="cost of 1000 tokens",
+        required=False,
+        default=0.002,
+    )
+    args = parser.parse_args()
+
+    with open(f"{args.flow_to_execute}/llmops_config.json") as main_config:
+        model_config = json.load(main_config)
+    config = next(
+        obj for obj in model_config["envs"]
+        if obj.get("ENV_NAME") == args.env_name
+    )
+    with open(f"{args.flow_to_execute}/configs/data_config.json") as data_file:
+        data_config = json.load(data_file)
+    data_paths = [
+        f"{args.flow_to_execute}/{elem['DATA_PATH']}"
+        for elem in data_config["datasets"]
+        if elem.get("ENV_NAME") == args.env_name
+        and elem.get("DATA_PURPOSE") == args.data_purpose
+    ]
+    if not data_paths:
+        raise ValueError("No dataset found for the environment and purpose")
+
+    flow_variants = read_flow_variants(
+        f"{args.flow_to_execute}/{config['STANDARD_FLOW_PATH']}"
+    )
+    plan_all_designs(
+        flow_variants=flow_variants,
+        rows=sum(count_dataset_rows(path) for path in data_paths),
+        row_tokens=max(average_row_tokens(path) for path in data_paths),
+        datasets=len(data_paths),
+        rules=len(args.rules),
+        token_cost_per_1k=args.token_cost_per_1k,
+    )
+
+
+if __name__ == "__main__":
+    main()
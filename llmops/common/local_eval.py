@@ -0,0 +1,310 @@
+"""
+Local execution of pure-Python evaluation flows.
+
+Evaluation flows made only of Python nodes, such as sanitize, score and
+metric aggregation nodes, do not need a remote bulk run. This module runs
+such flows in-process over the whole output table of an experiment run:
+each node is executed once per distinct combination of its inputs and the
+results are mapped back to every line, and aggregation nodes are called
+once with the full columns. The details and metrics produced have the
+shape of those of a remote evaluation run.
+"""
+
+import importlib.util
+import inspect
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import yaml
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("local_eval")
+
+REFERENCE_PATTERN = re.compile(r"^\$\{([^}]+)\}$")
+LINE_NUMBER = "line_number"
+
+
+def _reference(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    match = REFERENCE_PATTERN.match(value.strip())
+    return match.group(1) if match else None
+
+
+def is_local_flow(flow_path: str) -> bool:
+    """
+    Check whether a flow only has Python nodes that can run locally.
+
+    Returns:
+        bool: True if every node is a Python code node without variants
+        whose inputs are references or literals.
+    """
+    flow_file = os.path.join(flow_path, "flow.dag.yaml")
+    if not os.path.exists(flow_file):
+        return False
+    with open(flow_file, "r") as yaml_file:
+        flow = yaml.safe_load(yaml_file)
+    if flow.get("node_variants") or not flow.get("nodes"):
+        return False
+    for node in flow["nodes"]:
+        source = node.get("source", {})
+        if node.get("type") != "python" or source.get("type") != "code":
+            return False
+        if node.get("activate") or node.get("connection"):
+            return False
+        if not os.path.exists(os.path.join(flow_path, source["path"])):
+            return False
+    return True
+
+
+def _coerce(value, value_type: Optional[str]):
+    """Convert a flow input to its declared type, as the runtime does."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if value_type == "bool":
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "yes", "1")
+        return bool(value)
+    if value_type == "int":
+        return int(value)
+    if value_type == "double":
+        return float(value)
+    if value_type == "string":
+        return str(value)
+    return value
+
+
+def _ordered_nodes(nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order the nodes so that every node runs after the nodes it uses."""
+    ordered = []
+    done = set()
+    remaining = list(nodes)
+    while remaining:
+        ready = [
+            node for node in remaining
+            if all(
+                reference.split(".")[0] in done
+                for reference in map(_reference, node.get("inputs", {}).values())
+                if reference is not None and not reference.startswith("inputs.")
+            )
+        ]
+        if not ready:
+            raise ValueError("The flow nodes have circular references")
+        for node in ready:
+            ordered.append(node)
+            done.add(node["name"])
+            remaining.remove(node)
+    return ordered
+
+
+def _load_tool(flow_path: str, node: Dict[str, Any]):
+    """Import the source file of a node and return its tool function."""
+    source_file = os.path.join(flow_path, node["source"]["path"])
+    module_name = "llmops_local_eval_" + re.sub(
+        r"\W", "_", os.path.abspath(source_file)
+    )
+    spec = importlib.util.spec_from_file_location(module_name, source_file)
+    module = importlib.util.module_from_spec(spec)
+    # nodes may import helper modules next to them
+    sys.path.insert(0, os.path.abspath(flow_path))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(os.path.abspath(flow_path))
+
+    functions = [
+        member for _, member in inspect.getmembers(module, inspect.isfunction)
+        if member.__module__ == module_name
+    ]
+    stem = os.path.splitext(os.path.basename(source_file))[0]
+    for function in functions:
+        if function.__name__ in (stem, node["name"]):
+            return function
+    if len(functions) == 1:
+        return functions[0]
+    raise ValueError(f"Unable to find the tool function of {source_file}")
+
+
+def read_table(data_path: str) -> pd.DataFrame:
+    """
+    Read a local JSON, JSONL or CSV dataset.
+
+    Returns:
+        DataFrame: one row per dataset line.
+    """
+    if data_path.endswith(".jsonl"):
+        return pd.read_json(data_path, lines=True)
+    if data_path.endswith(".csv"):
+        return pd.read_csv(data_path)
+    return pd.read_json(data_path)
+
+
+class LocalEvalFlow:
+    """
+    A pure-Python evaluation flow executed in-process.
+
+    Args:
+        flow_path (str): directory of the flow.dag.yaml.
+    """
+
+    def __init__(self, flow_path: str):
+        with open(os.path.join(flow_path, "flow.dag.yaml"), "r") as yaml_file:
+            flow = yaml.safe_load(yaml_file)
+        self.flow_path = flow_path
+        self.inputs = flow.get("inputs", {}) or {}
+        self.outputs = flow.get("outputs", {}) or {}
+        self.nodes = _ordered_nodes(flow["nodes"])
+        self.tools = {
+            node["name"]: _load_tool(flow_path, node) for node in self.nodes
+        }
+
+    def _flow_inputs(self, column_mapping: Dict[str, Any],
+                     data: pd.DataFrame,
+                     run_details: pd.DataFrame) -> pd.DataFrame:
+        """Resolve the flow inputs of every line from the column mapping."""
+        lines = pd.DataFrame(index=run_details.index)
+        for input_name, input_spec in self.inputs.items():
+            value = column_mapping.get(input_name)
+            reference = _reference(value)
+            if reference is None:
+                if value is None:
+                    value = (input_spec or {}).get("default")
+                values = [value] * len(lines)
+            elif reference.startswith("data."):
+                values = data[reference[len("data."):]].values
+            elif reference.startswith("run."):
+                values = run_details[reference[len("run."):]].values
+            else:
+                raise ValueError(f"Unsupported reference {value}")
+            value_type = (input_spec or {}).get("type")
+            lines[input_name] = pd.Series(
+                [_coerce(value, value_type) for value in values],
+                index=lines.index,
+                dtype=object,
+            )
+        return lines
+
+    def _node_column(self, node: Dict[str, Any],
+                     columns: Dict[str, pd.Series]) -> pd.Series:
+        """Run a line node once per distinct input combination."""
+        arguments = {}
+        for argument, value in node.get("inputs", {}).items():
+            reference = _reference(value)
+            if reference is None:
+                arguments[argument] = pd.Series(
+                    [value] * len(columns[LINE_NUMBER]),
+                    index=columns[LINE_NUMBER].index,
+                )
+            else:
+                arguments[argument] = columns[reference]
+        tool = self.tools[node["name"]]
+        if not arguments:
+            value = tool()
+            return pd.Series(
+                [value] * len(columns[LINE_NUMBER]),
+                index=columns[LINE_NUMBER].index,
+            )
+
+        frame = pd.DataFrame(arguments)
+        # evaluation inputs repeat a lot, e.g. yes/no predictions
+        keys = [
+            tuple(row) for row in frame.astype(object).itertuples(index=False)
+        ]
+        results = {}
+        names = list(frame.columns)
+        values = []
+        for key in keys:
+            try:
+                if key not in results:
+                    results[key] = tool(**dict(zip(names, key)))
+                values.append(results[key])
+            except TypeError:
+                # unhashable inputs such as lists are not deduplicated
+                values.append(tool(**dict(zip(names, key))))
+        return pd.Series(values, index=frame.index, dtype=object)
+
+    def run(self, column_mapping: Dict[str, Any], data: pd.DataFrame,
+            run_details: pd.DataFrame):
+        """
+        Evaluate the outputs of an experiment run.
+
+        Args:
+            column_mapping (dict): evaluation mapping of the flow inputs to
+            ${data.<column>} and ${run.outputs.<name>} references.
+            data (DataFrame): evaluation dataset, one row per line.
+            run_details (DataFrame): details of the experiment run.
+
+        Returns:
+            tuple: details DataFrame with inputs.<name>, inputs.line_number
+            and outputs.<name> columns, and the metrics dict.
+        """
+        run_details = run_details.reset_index(drop=True)
+        line_column = f"inputs.{LINE_NUMBER}"
+        if line_column in run_details:
+            line_numbers = run_details[line_column].astype(int)
+        else:
+            line_numbers = pd.Series(range(len(run_details)))
+        data = data.reset_index(drop=True).iloc[line_numbers.values]
+        data = data.reset_index(drop=True)
+
+        flow_inputs = self._flow_inputs(column_mapping, data, run_details)
+        columns: Dict[str, pd.Series] = {LINE_NUMBER: line_numbers}
+        for input_name in flow_inputs:
+            columns[f"inputs.{input_name}"] = flow_inputs[input_name]
+
+        metrics: Dict[str, Any] = {}
+        for node in self.nodes:
+            if node.get("aggregation"):
+                arguments = {
+                    argument: (
+                        list(columns[_reference(value)])
+                        if _reference(value) is not None else value
+                    )
+                    for argument, value in node.get("inputs", {}).items()
+                }
+                result = self.tools[node["name"]](**arguments)
+                if isinstance(result, dict):
+                    metrics.update(result)
+                continue
+            columns[f"{node['name']}.output"] = self._node_column(
+                node, columns
+            )
+
+        details = pd.DataFrame(
+            {f"inputs.{name}": flow_inputs[name] for name in flow_inputs}
+        )
+        details[line_column] = line_numbers.values
+        for output_name, output_spec in self.outputs.items():
+            details[f"outputs.{output_name}"] = \
+                columns[_reference(output_spec["reference"])].values
+        return details, metrics
+
+
+def load_local_flows(flow_paths: Dict[str, str]) -> Dict[str, LocalEvalFlow]:
+    """
+    Load the evaluation flows that can run locally.
+
+    Flows with other node types or whose code cannot be imported in this
+    environment are left out and keep running remotely.
+
+    Returns:
+        dict: local flows keyed by flow name.
+    """
+    local_flows = {}
+    for flow_name, flow_path in flow_paths.items():
+        if not is_local_flow(flow_path):
+            logger.info(f"{flow_name} has non-Python nodes, running remotely")
+            continue
+        try:
+            local_flows[flow_name] = LocalEvalFlow(flow_path)
+        except Exception as ex:
+            logger.warning(
+                f"Unable to load {flow_name} locally, running remotely: {ex}"
+            )
+            continue
+        logger.info(f"{flow_name} will be evaluated locally")
+    return local_flows
@@ -0,0 +1,494 @@
+"""
+Benchmark the experiment and evaluation orchestration offline.
+
+This module runs prompt_pipeline and prompt_eval against the simulated
+Prompt Flow backend on a synthetic flow use case, and measures how the
+orchestration overhead, the peak memory and the report writing time scale
+with the number of variants, rules and dataset rows. Each dimension is
+scaled one at a time starting from the base scenario.
+
+Args:
+--variants: Comma separated numbers of variants to benchmark.
+--rules: Comma separated numbers of rules to benchmark.
+--rows: Comma separated numbers of dataset rows to benchmark.
+--max_concurrent_runs: Maximum number of bulk runs in flight at once.
+--queue_latency: Mean seconds a simulated run is queued.
+--execute_latency: Mean seconds a simulated run is running.
+--latency_sigma: Spread of the lognormal latency distributions.
+--failure_rate: Probability of a simulated run failing.
+--detail_chars: Characters of the text column of every details row.
+--skip_eval: Flag to only benchmark the experiment step.
+--pipelined: Flag to evaluate each run as soon as it completes instead of
+running the evaluation step after the experiment step.
+--seed: Seed of the simulated latencies and failures.
+--output_file: A file path to save the results as CSV.
+Defaults to reports/orchestration_benchmark.csv.
+"""
+
+import argparse
+import csv
+import dataclasses
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+import yaml
+
+from llmops.common import prompt_eval, prompt_pipeline
+from llmops.common.logger import llmops_logger
+from llmops.common.simulation import SimulatedPFClient, SimulationConfig
+from llmops.common.tracing import Tracer
+
+logger = llmops_logger("orchestration_benchmark")
+
+USE_CASE = "benchmark"
+STAGE = "dev"
+EXPERIMENT_DATASET = "benchmark_experiment"
+EVALUATION_DATASET = "benchmark_evaluation"
+BASE_SCENARIO = {"variants": 2, "rules": 1, "rows": 100}
+REPORT_SPANS = ("report_writing", "report.write_details")
+
+
+def rule_names(rules: int) -> List[str]:
+    """Return rule names none of which is a substring of another."""
+    return [f"rule{index:03d}" for index in range(rules)]
+
+
+def write_use_case(variants: int, rules: int, rows: int):
+    """
+    Write a synthetic flow use case to the current directory.
+
+    The experiment flow has one LLM node with the given number of variants
+    and its dataset has a truth column per rule.
+
+    Returns:
+        None
+    """
+    flow_dir = f"{USE_CASE}/flows/experiment"
+    os.makedirs(flow_dir)
+    os.makedirs(f"{USE_CASE}/flows/evaluation")
+    os.makedirs(f"{USE_CASE}/configs")
+    os.makedirs(f"{USE_CASE}/data")
+    names = rule_names(rules)
+
+    with open(f"{USE_CASE}/llmops_config.json", "w") as config_file:
+        json.dump(
+            {
+                "envs": [
+                    {
+                        "ENV_NAME": STAGE,
+                        "RUNTIME_NAME": "simulated",
+                        "RESOURCE_GROUP_NAME": "simulated",
+                        "WORKSPACE_NAME": "simulated",
+                        "STANDARD_FLOW_PATH": "flows/experiment",
+                        "EVALUATION_FLOW_PATH": "flows/evaluation",
+                    }
+                ]
+            },
+            config_file,
+        )
+    with open(f"{USE_CASE}/configs/data_config.json", "w") as config_file:
+        json.dump(
+            {
+                "datasets": [
+                    {
+                        "ENV_NAME": STAGE,
+                        "DATA_PURPOSE": "training_data",
+                        "DATA_PATH": "data/data.json",
+                        "DATASET_NAME": EXPERIMENT_DATASET,
+                    },
+                    {
+                        "ENV_NAME": STAGE,
+                        "DATA_PURPOSE": "test_data",
+                        "DATA_PATH": "data/data.json",
+                        "DATASET_NAME": EVALUATION_DATASET,
+                        "RELATED_EXP_DATASET": EXPERIMENT_DATASET,
+                    },
+                ]
+            },
+            config_file,
+        )
+    with open(f"{USE_CASE}/configs/mapping_config.json", "w") as config_file:
+        json.dump(
+            {
+                "experiment": {
+                    "query": "${data.text}",
+                    "truth": f"${{data.{names[0]}}}",
+                    "rule_id": names[0],
+                },
+                "evaluation": {
+                    "evaluation": {
+                        "truth": f"${{data.{names[0]}}}",
+                        "prediction": "${run.outputs.violation}",
+                    }
+                },
+            },
+            config_file,
+        )
+    with open(f"{USE_CASE}/data/data.json", "w") as data_file:
+        json.dump(
+            [
+                dict({"text": f"requirement {row}"},
+                     **{name: "False" for name in names})
+                for row in range(rows)
+            ],
+            data_file,
+        )
+
+    with open(f"{flow_dir}/prompt.jinja2", "w") as template:
+        template.write("Does the requirement violate {{rule_id}}?\n{{query}}")
+    with open(f"{flow_dir}/flow.dag.yaml", "w") as flow_file:
+        yaml.safe_dump(
+            {
+                "inputs": {
+                    "query": {"type": "string"},
+                    "rule_id": {"type": "string"},
+                },
+                "outputs": {
+                    "violation": {
+                        "type": "string",
+                        "reference": "${classify.output}",
+                    }
+                },
+                "nodes": [{"name": "classify", "use_variants": True}],
+                "node_variants": {
+                    "classify": {
+                        "default_variant_id": "variant_0",
+                        "variants": {
+                            f"variant_{index}": {
+                                "node": {
+                                    "type": "llm",
+                                    "source": {
+                                        "type": "code",
+                                        "path": "prompt.jinja2",
+                                    },
+                                    "inputs": {"max_tokens": 20},
+                                }
+                            }
+                            for index in range(variants)
+                        },
+                    }
+                },
+            },
+            flow_file,
+        )
+    with open(f"{USE_CASE}/flows/evaluation/flow.dag.yaml", "w") as flow_file:
+        yaml.safe_dump({"inputs": {}, "outputs": {}, "nodes": []}, flow_file)
+
+
+def _ideal_seconds(runs, max_concurrent_runs: int) -> float:
+    """Return a lower bound of the time the service needs for the runs."""
+    durations = [run.service_seconds + run.details_seconds for run in runs]
+    if not durations:
+        return 0.0
+    return max(max(durations), sum(durations) / max_concurrent_runs)
+
+
+def _span_seconds(tracers: List[Tracer], names) -> float:
+    return sum(
+        span.duration
+        for tracer in tracers
+        for span in tracer.spans
+        if span.name in names
+    )
+
+
+def run_scenario(
+    variants: int,
+    rules: int,
+    rows: int,
+    config: SimulationConfig,
+    max_concurrent_runs: int = 4,
+    evaluate: bool = True,
+    pipelined: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run the experiment and evaluation steps of one scenario.
+
+    The scenario runs in a temporary directory that is removed afterwards.
+    When pipelined, the experiment step evaluates each run as soon as it
+    completes, and its measurements include the evaluation runs.
+
+    Returns:
+        dict: measurements of the scenario.
+    """
+    result: Dict[str, Any] = {
+        "variants": variants, "rules": rules, "rows": rows, "status": "ok"
+    }
+    pf = SimulatedPFClient(dataclasses.replace(config, detail_rows=rows))
+    experiment_tracer = Tracer("prompt_pipeline")
+    eval_tracer = Tracer("prompt_eval")
+    working_dir = os.getcwd()
+    scenario_dir = tempfile.mkdtemp(prefix="llmops_benchmark_")
+    tracemalloc.start()
+    try:
+        os.chdir(scenario_dir)
+        write_use_case(variants, rules, rows)
+
+        started = time.perf_counter()
+        prompt_pipeline.prepare_and_execute(
+            subscription_id="simulated",
+            build_id="benchmark",
+            flow_to_execute=USE_CASE,
+            stage=STAGE,
+            output_file="run_ids.txt",
+            data_purpose="training_data",
+            save_output=True,
+            save_metric=True,
+            rules=rule_names(rules),
+            max_concurrent_runs=max_concurrent_runs,
+            use_run_cache=False,
+            manifest_file="run_manifest.jsonl",
+            tracer=experiment_tracer,
+            pf=pf,
+            ml_client=pf.ml_client,
+            evaluate=evaluate and pipelined,
+        )
+        experiment_seconds = time.perf_counter() - started
+        experiment_runs = pf.simulated_runs
+        experiment_names = {run.name for run in experiment_runs}
+        ideal_seconds = _ideal_seconds(experiment_runs, max_concurrent_runs)
+        result.update(
+            experiment_runs=len(experiment_runs),
+            experiment_seconds=round(experiment_seconds, 2),
+            experiment_overhead_seconds=round(
+                experiment_seconds - ideal_seconds, 2
+            ),
+        )
+
+        if evaluate and not pipelined:
+            started = time.perf_counter()
+            prompt_eval.prepare_and_execute(
+                subscription_id="simulated",
+                build_id="benchmark",
+                stage=STAGE,
+                run_id=None,
+                data_purpose="test_data",
+                flow_to_execute=USE_CASE,
+                rules=rule_names(rules),
+                manifest_file="run_manifest.jsonl",
+                tracer=eval_tracer,
+                pf=pf,
+            )
+            eval_seconds = time.perf_counter() - started
+            eval_runs = [
+                run for run in pf.simulated_runs
+                if run.name not in experiment_names
+            ]
+            # evaluation runs are streamed one after the other
+            ideal_seconds = _ideal_seconds(eval_runs, 1)
+            result.update(
+                eval_runs=len(eval_runs),
+                eval_seconds=round(eval_seconds, 2),
+                eval_overhead_seconds=round(eval_seconds - ideal_seconds, 2),
+            )
+    except Exception as ex:
+        logger.warning(f"Scenario {variants}/{rules}/{rows} failed: {ex}")
+        result["status"] = f"failed: {ex}"
+    finally:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        os.chdir(working_dir)
+        shutil.rmtree(scenario_dir, ignore_errors=True)
+
+    result.update(
+        report_seconds=round(
+            _span_seconds([experiment_tracer, eval_tracer], REPORT_SPANS), 2
+        ),
+        status_polls=pf.status_calls,
+        details_calls=pf.details_calls,
+        peak_memory_mb=round(peak_memory / 2 ** 20, 1),
+    )
+    return result
+
+
+def scenarios(variant_counts: List[int], rule_counts: List[int],
+              row_counts: List[int]) -> List[Dict[str, int]]:
+    """
+    Scale each dimension one at a time starting from the base scenario.
+
+    Returns:
+        list: distinct scenarios, the base scenario first.
+    """
+    points = [dict(BASE_SCENARIO)]
+    for dimension, counts in (
+        ("variants", variant_counts),
+        ("rules", rule_counts),
+        ("rows", row_counts),
+    ):
+        for count in counts:
+            point = dict(BASE_SCENARIO, **{dimension: count})
+            if point not in points:
+                points.append(point)
+    return points
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """
+    Format the benchmark results as a text table.
+
+    Returns:
+        str: the formatted table.
+    """
+    columns = []
+    for result in results:
+        columns.extend(key for key in result if key not in columns)
+    widths = {
+        column: max(
+            [len(column)] + [len(str(result.get(column, ""))) for result in results]
+        ) + 2
+        for column in columns
+    }
+    lines = ["".join(f"{column:>{widths[column]}}" for column in columns)]
+    for result in results:
+        lines.append(
+            "".join(
+                f"{str(result.get(column, '')):>{widths[column]}}"
+                for column in columns
+            )
+        )
+    return "\n".join(lines)
+
+
+def write_results(results: List[Dict[str, Any]], output_file: str):
+    """
+    Save the benchmark results as CSV.
+
+    Returns:
+        None
+    """
+    output_dir = os.path.dirname(output_file)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    columns = []
+    for result in results:
+        columns.extend(key for key in result if key not in columns)
+    with open(output_file, "w", newline="") as results_file:
+        writer = csv.DictWriter(results_file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+    logger.info(f"Saved the benchmark results in {output_file}")
+
+
+# Define a custom argument type for a list of integers
+def list_of_ints(arg):
+    return [int(value) for value in arg.split(',')]
+
+
+def main():
+    """
+    Benchmark the orchestration against the simulated backend.
+
+    Returns:
+        None
+    """
+    parser = argparse.ArgumentParser("orchestration_benchmark")
+    parser.add_argument(
+        "--variants",
+        type=list_of_ints,
+        help="numbers of variants to benchmark",
+        default=[1, 4, 8],
+    )
+    parser.add_argument(
+        "--rules",
+        type=list_of_ints,
+        help="numbers of rules to benchmark",
+        default=[1, 3],
+    )
+    parser.add_argument(
+        "--rows",
+        type=list_of_ints,
+        help="numbers of dataset rows to benchmark",
+        default=[100, 10000],
+    )
+    parser.add_argument(
+        "--max_concurrent_runs",
+        type=int,
+        help="maximum number of bulk runs in flight at once",
+        default=4,
+    )
+    parser.add_argument(
+        "--queue_latency",
+        type=float,
+        help="mean seconds a simulated run is queued",
+        default=0.5,
+    )
+    parser.add_argument(
+        "--execute_latency",
+        type=float,
+        help="mean seconds a simulated run is running",
+        default=2.0,
+    )
+    parser.add_argument(
+        "--latency_sigma",
+        type=float,
+        help="spread of the lognormal latency distributions",
+        default=0.5,
+    )
+    parser.add_argument(
+        "--failure_rate",
+        type=float,
+        help="probability of a simulated run failing",
+        default=0.0,
+    )
+    parser.add_argument(
+        "--detail_chars",
+        type=int,
+        help="characters of the text column of every details row",
+        default=200,
+    )
+    parser.add_argument(
+        "--skip_eval",
+        action="store_true",
+        help="only benchmark the experiment step",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed of the simulated latencies and failures",
+        default=0,
+    )
+    parser.add_argument(
+        "--output_file",
+        type=str,
+        help="a file to save the results as CSV",
+        default="./reports/orchestration_benchmark.csv",
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="evaluate each run as soon as it completes",
+    )
+    args = parser.parse_args()
+
+    config = SimulationConfig(
+        queue_latency=args.queue_latency,
+        execute_latency=args.execute_latency,
+        latency_sigma=args.latency_sigma,
+        failure_rate=args.failure_rate,
+        detail_chars=args.detail_chars,
+        seed=args.seed,
+    )
+    output_file = os.path.abspath(args.output_file)
+    results = []
+    for scenario in scenarios(args.variants, args.rules, args.rows):
+        logger.info(f"Benchmarking {scenario}")
+        results.append(
+            run_scenario(
+                config=config,
+                max_concurrent_runs=args.max_concurrent_runs,
+                evaluate=not args.skip_eval,
+                pipelined=args.pipelined,
+                **scenario,
+            )
+        )
+    logger.info("Orchestration benchmark:\n" + format_results(results))
+    write_results(results, output_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,27 +11,436 @@ This argument is required to specify the environment (dev, test, prod)
 --data_purpose: The data identified by its purpose.
 This argument is required to specify the purpose of the data.
 --run_id: The bulk run IDs.
-This argument is required to specify the bulk run IDs for execution.
+This argument specifies the bulk run IDs for execution when no
+run manifest is provided.
+--manifest_file: The JSONL run manifest written by prompt_pipeline.
+If provided, the completed runs in the manifest are evaluated.
+--data_index_file: A file path for the data asset index of the build.
+Defaults to data_assets_index.json.
+--trace_file: A file path for the spans of the job in OTLP/JSON format.
+Defaults to reports/prompt_eval_trace.json.
+--local_eval: Flag to run evaluation flows made only of Python nodes
+in-process over the outputs of each run instead of as remote runs.
+--fan_out: Flag to evaluate each run with all evaluation flows at once
+instead of flow by flow, and to save their results merged by line.
 --flow_to_execute: The name of the flow use case.
 This argument is required to specify the name of the flow for execution.
 """
 
 import argparse
 import ast
+import concurrent.futures
 import datetime
 import json
-import os
-import time
+import threading
 import yaml
-import pandas as pd
 from promptflow.entities import Run
 from llmops.common.utils.get_clients import get_pf_client
+from llmops.common.data_assets import DEFAULT_INDEX_FILE, DataAssetIndex
+from llmops.common.local_eval import load_local_flows, read_table
+from llmops.common.report_writer import StreamingReportWriter
+from llmops.common.run_index import NODE_VARIANT_PROPERTY, RunIndex
+from llmops.common.run_manifest import read_completed_runs
+from llmops.common.run_waiter import RunCompletionWaiter
+from llmops.common.tracing import RUN_NAME_ATTRIBUTE, Tracer
 
 from llmops.common.logger import llmops_logger
 
 logger = llmops_logger("prompt_eval")
 
 
+def read_default_variants(standard_flow):
+    """
+    Read the default variant of every variant node of a standard flow.
+
+    Returns:
+        list: one {node name: default variant id} mapping per node.
+    """
+    with open(f"{standard_flow}/flow.dag.yaml", "r") as yaml_file:
+        yaml_data = yaml.safe_load(yaml_file)
+
+    default_variants = []
+    for node_name, node_data in yaml_data.get("node_variants", {}).items():
+        node_variant_mapping = {}
+        default_variant = node_data["default_variant_id"]
+        node_variant_mapping[node_name] = default_variant
+        default_variants.append(node_variant_mapping)
+    return default_variants
+
+
+def node_variant(my_run):
+    """
+    Read the node and variant an experiment run was executed with.
+
+    Returns:
+        list: [node name, variant id], None for runs without variant.
+    """
+    variant_id = my_run.properties.get(NODE_VARIANT_PROPERTY, None)
+    if variant_id is None:
+        return None
+    start_index = variant_id.find("{") + 1
+    end_index = variant_id.find("}")
+    return variant_id[start_index:end_index].split(".")
+
+
+def merge_flow_results(flow_results):
+    """
+    Join the details of several evaluation flows of one run by line.
+
+    Returns:
+        DataFrame: a line_number column and the outputs of every flow,
+        prefixed with the flow name.
+    """
+    merged = None
+    for flow_name, details in flow_results.items():
+        flow_outputs = details[
+            [column for column in details.columns
+             if column.startswith("outputs.")]
+        ].rename(columns=lambda column: f"{flow_name}.{column}")
+        if "inputs.line_number" in details:
+            flow_outputs.insert(
+                0, "line_number", details["inputs.line_number"].values
+            )
+        else:
+            flow_outputs.insert(0, "line_number", range(len(details)))
+        merged = flow_outputs if merged is None else merged.merge(
+            flow_outputs, on="line_number", how="outer"
+        )
+    return merged.sort_values("line_number").reset_index(drop=True)
+
+
+class RunEvaluator:
+    """
+    Create the evaluation runs of experiment runs and collect their results.
+
+    Used by prompt_eval after all experiment runs finished, and by
+    prompt_pipeline to evaluate each experiment run as soon as it completed.
+
+    Args:
+        flow_to_execute (str): name of the flow use case.
+        stage (str): environment name.
+        build_id (str): unique identifier for build execution.
+        config (dict): environment entry of llmops_config.json.
+        data_assets (DataAssetIndex): index resolving evaluation datasets.
+        report_writer (StreamingReportWriter): writer of the results.
+        local (bool): evaluate with the pure-Python evaluation flows
+        in-process instead of submitting evaluation runs.
+        merge_flows (bool): also write the results of all evaluation flows
+        of an experiment run as one table keyed by run and line, once every
+        flow evaluated the run.
+    """
+
+    def __init__(self, flow_to_execute, stage, build_id, config,
+                 data_assets, report_writer, local=False, merge_flows=False):
+        self.flow_to_execute = flow_to_execute
+        self.build_id = build_id
+        self.runtime = config["RUNTIME_NAME"]
+        self.experiment_name = f"{flow_to_execute}_{stage}"
+        self.data_assets = data_assets
+        self.report_writer = report_writer
+
+        self.flows = {}
+        for flow in config["EVALUATION_FLOW_PATH"].split(","):
+            flow = f"{flow_to_execute}/{flow.strip()}"
+            self.flows[(flow.split("/")[-1]).strip()] = flow
+        mapping_file = open(
+            f"{flow_to_execute}/configs/mapping_config.json"
+        )
+        self.eval_config_node = json.load(mapping_file)["evaluation"]
+        self.default_variants = read_default_variants(
+            f"{flow_to_execute}/{config['STANDARD_FLOW_PATH']}"
+        )
+        self.metrics = {flow_name: [] for flow_name in self.flows}
+        self.data_refs = {}
+        self._names = set()
+        self._lock = threading.Lock()
+
+        self.local_flows = load_local_flows(self.flows) if local else {}
+        data_config_file = open(f"{flow_to_execute}/configs/data_config.json")
+        self.data_paths = {
+            elem["DATASET_NAME"]: f"{flow_to_execute}/{elem['DATA_PATH']}"
+            for elem in json.load(data_config_file)["datasets"]
+            if "DATA_PATH" in elem
+        }
+        self._data = {}
+
+        self.merged_writer = None
+        if merge_flows and len(self.flows) > 1:
+            self.merged_writer = StreamingReportWriter(
+                report_dir=report_writer.report_dir,
+                dataset_name=f"{self.experiment_name}_eval_merged",
+                extra_columns=report_writer.extra_columns,
+            )
+        self._flow_results = {}
+
+    @property
+    def flow_names(self):
+        """Return the names of the evaluation flows."""
+        return list(self.flows)
+
+    def _unique_name(self, name):
+        # evaluation runs submitted within the same second share timestamps
+        with self._lock:
+            unique_name = name
+            index = 1
+            while unique_name in self._names:
+                unique_name = f"{name}_{index}"
+                index += 1
+            self._names.add(unique_name)
+            return unique_name
+
+    def is_local(self, flow_name):
+        """Return True if the flow is evaluated in-process."""
+        return flow_name in self.local_flows
+
+    def _prepare(self, flow_name, my_run, rule):
+        """Resolve the mapping, data, name and metadata of an evaluation."""
+        column_mapping = dict(self.eval_config_node[flow_name])
+        if rule != "default":
+            column_mapping["truth"] = f"${{data.{rule}}}"
+        run_data_id = my_run.data.replace("azureml:", "")
+        run_data_id = run_data_id.split(":")[0]
+        eval_data_name = self.data_assets.related_dataset(run_data_id)
+        if eval_data_name is None:
+            raise ValueError(
+                f"No evaluation dataset related to {run_data_id}"
+            )
+        data_id = self.data_assets.data_id(eval_data_name)
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        variant_name = "default"
+        variant_value = node_variant(my_run)
+        if variant_value is not None:
+            variant_name = variant_value[1]
+            name = f"{self.experiment_name}_{variant_value[1]}_{rule}_eval_{timestamp}"
+        else:
+            name = f"{self.experiment_name}_{rule}_eval_{timestamp}"
+        name = self._unique_name(name)
+        metadata = {
+            "evaluation": True,
+            "flow_name": flow_name,
+            "exp_run": my_run.name,
+            "data_id": data_id,
+            "data_ref": run_data_id,
+            "variant_name": variant_name,
+            "rule": rule,
+        }
+        return column_mapping, eval_data_name, name, metadata
+
+    def create_eval_run(self, flow_name, my_run, rule):
+        """
+        Create the evaluation run of an experiment run.
+
+        Returns:
+            tuple: the evaluation Run and the metadata needed to collect
+            its results.
+        """
+        column_mapping, _, name, metadata = self._prepare(
+            flow_name, my_run, rule
+        )
+        eval_run = Run(
+            flow=self.flows[flow_name],
+            data=metadata["data_id"],
+            run=my_run,
+            column_mapping=column_mapping,
+            runtime=self.runtime,
+            # un-comment the resources line and
+            # comment the argument runtime to
+            # enable automatic runtime.
+            # Reference: COMPUTE_RUNTIME
+            # resources={"instance_type": "Standard_E4ds_v4"},
+            name=name,
+            display_name=name,
+            tags={"build_id": self.build_id},
+        )
+        eval_run._experiment_name = self.experiment_name
+        return eval_run, metadata
+
+    def evaluate_locally(self, flow_name, my_run, rule, run_details):
+        """
+        Evaluate the details of an experiment run in-process.
+
+        The evaluation dataset is read from the DATA_PATH it was
+        registered from.
+
+        Returns:
+            tuple: the evaluation name, its details and metrics, and the
+            metadata needed to collect its results.
+        """
+        column_mapping, eval_data_name, name, metadata = self._prepare(
+            flow_name, my_run, rule
+        )
+        with self._lock:
+            if eval_data_name not in self._data:
+                self._data[eval_data_name] = read_table(
+                    self.data_paths[eval_data_name]
+                )
+        df_result, metric_variant = self.local_flows[flow_name].run(
+            column_mapping, self._data[eval_data_name], run_details
+        )
+        return name, df_result, metric_variant, metadata
+
+    def add_results(self, metadata, my_run, eval_run_name, df_result,
+                    metric_variant):
+        """
+        Label the results of a completed evaluation run and write them.
+
+        Returns:
+            None
+        """
+        flow_name = metadata["flow_name"]
+        data_id = metadata["data_id"]
+        variant_value = node_variant(my_run)
+        if variant_value is not None:
+            df_result[variant_value[0]] = variant_value[1]
+            metric_variant[variant_value[0]] = variant_value[1]
+            df_result["dataset"] = data_id
+            metric_variant["dataset"] = data_id
+
+            for var in self.default_variants:
+                for key in var.keys():
+                    if key == variant_value[0]:
+                        pass
+                    else:
+                        df_result[key] = var[key]
+                        metric_variant[key] = var[key]
+
+        metric_variant["flow_name"] = flow_name
+        metric_variant["exp_run"] = metadata["exp_run"]
+        metrics = self.metrics[flow_name]
+        metrics.append(metric_variant)
+        self.data_refs[flow_name] = metadata["data_ref"]
+
+        logger.info(json.dumps(metrics, indent=4))
+        logger.info(df_result.head(10))
+        self.report_writer.write_details(
+            df_result,
+            partitions={
+                "flow": flow_name,
+                "dataset": metadata["data_ref"],
+                "variant": metadata["variant_name"],
+                "rule": metadata["rule"],
+            },
+            run_name=eval_run_name,
+            columns={
+                "flow_name": flow_name,
+                "exp_run": metadata["exp_run"],
+            },
+        )
+        if self.merged_writer is not None:
+            self._merge(metadata, df_result)
+
+    def _merge(self, metadata, df_result):
+        """Write the merged results of a run once every flow reported."""
+        flow_results = self._flow_results.setdefault(metadata["exp_run"], {})
+        flow_results[metadata["flow_name"]] = df_result
+        if len(flow_results) < len(self.flows):
+            return
+        del self._flow_results[metadata["exp_run"]]
+        self.merged_writer.write_details(
+            merge_flow_results(flow_results),
+            partitions={
+                "dataset": metadata["data_ref"],
+                "variant": metadata["variant_name"],
+                "rule": metadata["rule"],
+            },
+            run_name=metadata["exp_run"],
+            columns={"exp_run": metadata["exp_run"]},
+        )
+
+    def write_flow_summary(self, flow_name):
+        """
+        Save the metrics of one evaluation flow in csv and html format.
+
+        Returns:
+            None
+        """
+        if flow_name in self.data_refs:
+            self.report_writer.write_summary(
+                self.data_refs[flow_name], self.metrics[flow_name]
+            )
+
+    def write_summary(self):
+        """
+        Save the metrics of all evaluation flows in csv and html format.
+
+        Returns:
+            None
+        """
+        all_eval_metrics = []
+        for flow_name in self.flows:
+            all_eval_metrics.extend(self.metrics[flow_name])
+        self.report_writer.write_summary(
+            self.experiment_name, all_eval_metrics
+        )
+        logger.info(
+            f"Saved {self.report_writer.rows_written} result rows "
+            f"in {self.report_writer.details_dir}"
+        )
+
+
+def evaluate_all_flows(pf, waiter, evaluator, my_run, rule, tracer):
+    """
+    Evaluate one experiment run with every evaluation flow at once.
+
+    The evaluation runs of all remote flows are submitted together and
+    waited for in a single polling loop. The run outputs are downloaded
+    once and fed to all local flows concurrently.
+
+    Returns:
+        None
+    """
+    span_attributes = {RUN_NAME_ATTRIBUTE: my_run.name, "run.rule": rule}
+    remote_runs = {}
+    local_flows = []
+    with tracer.span("eval.submit", **span_attributes):
+        for flow_name in evaluator.flow_names:
+            if evaluator.is_local(flow_name):
+                local_flows.append(flow_name)
+                continue
+            eval_run, metadata = evaluator.create_eval_run(
+                flow_name, my_run, rule
+            )
+            eval_job = pf.runs.create_or_update(eval_run)
+            remote_runs[eval_job.name] = metadata
+
+    if local_flows:
+        with tracer.span("eval.local", **span_attributes):
+            run_details = pf.get_details(my_run)
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=len(local_flows)
+            ) as executor:
+                local_results = list(
+                    executor.map(
+                        lambda flow_name: evaluator.evaluate_locally(
+                            flow_name, my_run, rule, run_details
+                        ),
+                        local_flows,
+                    )
+                )
+            for name, df_result, metric_variant, metadata in local_results:
+                evaluator.add_results(
+                    metadata, my_run, name, df_result, metric_variant
+                )
+
+    if not remote_runs:
+        return
+    with tracer.span("eval.wait", **span_attributes):
+        wait_results = waiter.wait_all(list(remote_runs))
+    for name, metadata in remote_runs.items():
+        wait_result = wait_results[name]
+        if not wait_result.completed:
+            raise Exception("Sorry, exiting job with failure..")
+        logger.info(wait_result.run.status)
+        with tracer.span(
+            "eval.metrics_download", **{RUN_NAME_ATTRIBUTE: name}
+        ):
+            metric_variant = pf.get_metrics(wait_result.run)
+        evaluator.add_results(
+            metadata, my_run, name, wait_result.details, metric_variant
+        )
+
+
 def prepare_and_execute(
     subscription_id,
     build_id, stage,
@@ -39,18 +448,31 @@ def prepare_and_execute(
     data_purpose,
     flow_to_execute,
     rules, 
+    manifest_file=None,
+    data_index_file=DEFAULT_INDEX_FILE,
+    tracer=None,
+    pf=None,
+    local_eval=False,
+    fan_out=False,
 ):
     """
     Run the evaluation loop by executing evaluation flows.
 
-    reads latest evaluation data assets
+    reads latest evaluation data assets from the data asset index
     executes evaluation flow against each provided bulk-run
     executes the flow creating a new evaluation job
-    saves the results in both csv and html format
+    or, with local_eval, runs pure-Python evaluation flows in-process
+    or, with fan_out, evaluates each bulk-run with all flows at once
+    streams the results of each job to partitioned parquet files
+    saves the metrics in both csv and html format
+    records the time spent in each phase and run as spans of the tracer
 
     Returns:
         None
     """
+    if tracer is None:
+        tracer = Tracer("prompt_eval")
+
     main_config = open(f"{flow_to_execute}/llmops_config.json")
     model_config = json.load(main_config)
 
@@ -61,202 +483,129 @@ def prepare_and_execute(
 
     resource_group_name = config["RESOURCE_GROUP_NAME"]
     workspace_name = config["WORKSPACE_NAME"]
-    data_mapping_config = f"{flow_to_execute}/configs/mapping_config.json"
-    standard_flow_path = config["STANDARD_FLOW_PATH"]
     data_config_path = f"{flow_to_execute}/configs/data_config.json"
-
-    runtime = config["RUNTIME_NAME"]
-    eval_flow_path = config["EVALUATION_FLOW_PATH"]
     experiment_name = f"{flow_to_execute}_{stage}"
 
-    eval_flows = eval_flow_path.split(",")
-    pf = get_pf_client(subscription_id, resource_group_name, workspace_name)
+    if pf is None:
+        pf = get_pf_client(subscription_id, resource_group_name, workspace_name)
+    waiter = RunCompletionWaiter(pf)
 
-    standard_flow = f"{flow_to_execute}/{standard_flow_path}"
-    dataset_name = []
     config_file = open(data_config_path)
     data_config = json.load(config_file)
-    for elem in data_config["datasets"]:
-        if "DATA_PURPOSE" in elem and "ENV_NAME" in elem:
-            if (stage == elem["ENV_NAME"] and
-                    data_purpose == elem["DATA_PURPOSE"]):
-
-                data_name = elem["DATASET_NAME"]
-                related_data = elem["RELATED_EXP_DATASET"]
-                data = pf.ml_client.data.get(name=data_name, label="latest")
-                data_id = f"azureml:{data.name}:{data.version}"
-                dataset_name.append(
-                    {
-                        "data_id": data_id,
-                        "ref_data": related_data
-                    }
-                )
-
-    standard_flow_file = f"{standard_flow}/flow.dag.yaml"
-
-    with open(standard_flow_file, "r") as yaml_file:
-        yaml_data = yaml.safe_load(yaml_file)
-
-    default_variants = []
-    for node_name, node_data in yaml_data.get("node_variants", {}).items():
-        node_variant_mapping = {}
-        default_variant = node_data["default_variant_id"]
-        node_variant_mapping[node_name] = default_variant
-        default_variants.append(node_variant_mapping)
-
-    mapping_file = open(data_mapping_config)
-    mapping_config = json.load(mapping_file)
-    eval_config_node = mapping_config["evaluation"]
-
-    all_eval_df = []
-    all_eval_metrics = []
-
-    run_ids = ast.literal_eval(run_id)
-
-    for flow in eval_flows:
-        flow = f"{flow_to_execute}/{flow.strip()}"
-        dataframes = []
-        metrics = []
+    eval_datasets = [
+        elem for elem in data_config["datasets"]
+        if "DATA_PURPOSE" in elem and "ENV_NAME" in elem
+        and stage == elem["ENV_NAME"]
+        and data_purpose == elem["DATA_PURPOSE"]
+    ]
+    with tracer.span("data_asset_lookup"):
+        data_assets = DataAssetIndex(pf.ml_client, data_index_file, build_id)
+        data_assets.index_config(eval_datasets)
+        data_assets.resolve(elem["DATASET_NAME"] for elem in eval_datasets)
+
+    report_writer = StreamingReportWriter(
+        report_dir="./reports",
+        dataset_name=f"{experiment_name}_eval_result",
+        extra_columns={
+            "stage": stage,
+            "experiment_name": experiment_name,
+            "build": build_id,
+        },
+    )
+    evaluator = RunEvaluator(
+        flow_to_execute, stage, build_id, config, data_assets, report_writer,
+        local=local_eval,
+        merge_flows=fan_out,
+    )
 
-        flow_name = (flow.split("/")[-1]).strip()
-        mapping_node = eval_config_node[flow_name]
-        if len(rules) == 0:
-            rules = ["default"]
+    with tracer.span("read_run_ids"):
+        if manifest_file is not None:
+            run_ids = [
+                record["run_name"]
+                for record in read_completed_runs(manifest_file)
+            ]
+        else:
+            run_ids = ast.literal_eval(run_id)
+
+    with tracer.span("read_runs"):
+        # every run is fetched once and looked up by its rule tag
+        run_index = RunIndex(pf)
+        run_index.load(run_ids)
+
+    if not rules:
+        rules = ["default"]
+    sequential_flows = evaluator.flow_names
+    if fan_out:
         for rule in rules:
-            for flow_run in run_ids:
-                my_run = pf.runs.get(flow_run)
-                if my_run.name.__contains__(rule):
-                    if rule != "default":
-                        mapping_node["truth"] = f"${{data.{rule}}}"
-                    run_data_id = my_run.data.replace("azureml:", "")
-                    run_data_id = run_data_id.split(":")[0]
-                    for data_item in dataset_name:
-                        data_n = data_item["data_id"]
-                        ref_data = data_item["ref_data"]
-                        if ref_data == run_data_id:
-                            data_id = data_n
-                            break
-
-                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                    if (
-                            my_run.properties.get(
-                                "azureml.promptflow.node_variant",
-                                None) is not None
-                        ):
-                            variant_id = \
-                                my_run.properties["azureml.promptflow.node_variant"]
-                            start_index = variant_id.find("{") + 1
-                            end_index = variant_id.find("}")
-                            variant_value = \
-                                variant_id[start_index:end_index].split(".")
-                            name = f"{experiment_name}_{variant_value[1]}_{rule}_eval_{timestamp}"
-                    else:
-                        name = f"{experiment_name}_{rule}_eval_{timestamp}"
-                    eval_run = Run(
-                        flow=flow.strip(),
-                        data=data_id,
-                        run=my_run,
-                        column_mapping=mapping_node,
-                        runtime=runtime,
-                        # un-comment the resources line and
-                        # comment the argument runtime to
-                        # enable automatic runtime.
-                        # Reference: COMPUTE_RUNTIME
-                        # resources={"instance_type": "Standard_E4ds_v4"},
-                        name=name,
-                        display_name=name,
-                        tags={"build_id": build_id},
-                    )
-                    eval_run._experiment_name = experiment_name
-                    eval_job = pf.runs.create_or_update(eval_run, stream=True)
-                    df_result = None
-
-                    time.sleep(15)
-                    if eval_job.status == "Completed" or eval_job.status == "Finished":
-                        logger.info(eval_job.status)
-                        df_result = pf.get_details(eval_job)
+            for my_run in run_index.find(rule=rule):
+                evaluate_all_flows(pf, waiter, evaluator, my_run, rule, tracer)
+        for flow_name in evaluator.flow_names:
+            with tracer.span("report_writing", flow_name=flow_name):
+                evaluator.write_flow_summary(flow_name)
+        sequential_flows = []
+    for flow_name in sequential_flows:
+        for rule in rules:
+            for my_run in run_index.find(rule=rule):
+                flow_run = my_run.name
+                if evaluator.is_local(flow_name):
+                    with tracer.span(
+                        "eval.local", **{RUN_NAME_ATTRIBUTE: flow_run}
+                    ):
+                        name, df_result, metric_variant, metadata = \
+                            evaluator.evaluate_locally(
+                                flow_name, my_run, rule, pf.get_details(my_run)
+                            )
+                        evaluator.add_results(
+                            metadata, my_run, name, df_result, metric_variant
+                        )
+                    continue
+                eval_run, metadata = evaluator.create_eval_run(
+                    flow_name, my_run, rule
+                )
+                span_attributes = {
+                    RUN_NAME_ATTRIBUTE: eval_run.name,
+                    "run.flow_name": flow_name,
+                    "run.experiment_run": flow_run,
+                    "run.rule": rule,
+                }
+                with tracer.span("eval.submit", **span_attributes):
+                    eval_job = pf.runs.create_or_update(eval_run)
+
+                with tracer.span("eval.wait", **span_attributes):
+                    wait_result = \
+                        waiter.wait_all([eval_job.name])[eval_job.name]
+                eval_job = wait_result.run
+                if wait_result.completed:
+                    logger.info(eval_job.status)
+                    with tracer.span(
+                        "eval.metrics_download", **span_attributes
+                    ):
                         metric_variant = pf.get_metrics(eval_job)
+                    with tracer.span(
+                        "report.write_details", **span_attributes
+                    ):
+                        evaluator.add_results(
+                            metadata,
+                            my_run,
+                            eval_job.name,
+                            wait_result.details,
+                            metric_variant,
+                        )
+                else:
+                    raise Exception("Sorry, exiting job with failure..")
+
+        with tracer.span("report_writing", flow_name=flow_name):
+            evaluator.write_flow_summary(flow_name)
+
+    with tracer.span("report_writing"):
+        evaluator.write_summary()
 
-                        if (
-                            my_run.properties.get(
-                                "azureml.promptflow.node_variant",
-                                None) is not None
-                        ):
-                            variant_id = \
-                                my_run.properties["azureml.promptflow.node_variant"]
-                            start_index = variant_id.find("{") + 1
-                            end_index = variant_id.find("}")
-                            variant_value = \
-                                variant_id[start_index:end_index].split(".")
-
-                            df_result[variant_value[0]] = variant_value[1]
-                            metric_variant[variant_value[0]] = variant_value[1]
-                            df_result["dataset"] = data_id
-                            metric_variant["dataset"] = data_id
-
-                            for var in default_variants:
-                                for key in var.keys():
-                                    if key == variant_value[0]:
-                                        pass
-                                    else:
-                                        df_result[key] = var[key]
-                                        metric_variant[key] = var[key]
-
-                        dataframes.append(df_result)
-                        metrics.append(metric_variant)
-
-                        logger.info(json.dumps(metrics, indent=4))
-                        logger.info(df_result.head(10))
-
-                    else:
-                        raise Exception("Sorry, exiting job with failure..")
-
-        if not os.path.exists("./reports"):
-            os.makedirs("./reports")
-
-        combined_results_df = pd.concat(dataframes, ignore_index=True)
-        combined_metrics_df = pd.DataFrame(metrics)
-        combined_results_df["flow_name"] = flow_name
-        combined_metrics_df["flow_name"] = flow_name
-        combined_results_df["exp_run"] = flow_run
-        combined_metrics_df["exp_run"] = flow_run
-
-        combined_results_df.to_csv(f"./reports/{run_data_id}_result.csv")
-        combined_metrics_df.to_csv(f"./reports/{run_data_id}_metrics.csv")
-
-        styled_df = combined_results_df.to_html(index=False)
-
-        with open(f"reports/{run_data_id}_result.html", "w") as c_results:
-            c_results.write(styled_df)
-
-        html_table_metrics = combined_metrics_df.to_html(index=False)
-        with open(f"reports/{run_data_id}_metrics.html", "w") as c_metrics:
-            c_metrics.write(html_table_metrics)
-
-        all_eval_df.append(combined_results_df)
-        all_eval_metrics.append(combined_metrics_df)
-
-    final_results_df = pd.concat(all_eval_df, ignore_index=True)
-    final_metrics_df = pd.concat(all_eval_metrics, ignore_index=True)
-    final_results_df["stage"] = stage
-    final_results_df["experiment_name"] = experiment_name
-    final_results_df["build"] = build_id
-
-    final_results_df.to_csv(f"./reports/{experiment_name}_result.csv")
-    final_metrics_df.to_csv(f"./reports/{experiment_name}_metrics.csv")
-
-    styled_df = final_results_df.to_html(index=False)
-    with open(f"reports/{experiment_name}_result.html", "w") as f_results:
-        f_results.write(styled_df)
-
-    html_table_metrics = final_metrics_df.to_html(index=False)
-    with open(f"reports/{experiment_name}_metrics.html", "w") as f_metrics:
-        f_metrics.write(html_table_metrics)
 
 # Define a custom argument type for a list of strings
 def list_of_strings(arg):
     return arg.split(',')
 
+
 def main():
     """
     Run the main evaluation loop by executing evaluation flows.
@@ -292,8 +641,35 @@ def main():
     parser.add_argument(
         "--run_id",
         type=str,
-        required=True,
+        required=False,
         help="bulk run ids")
+    parser.add_argument(
+        "--manifest_file",
+        type=str,
+        required=False,
+        help="run manifest written by the experiment step")
+    parser.add_argument(
+        "--data_index_file",
+        type=str,
+        required=False,
+        default=DEFAULT_INDEX_FILE,
+        help="data asset index of the build")
+    parser.add_argument(
+        "--trace_file",
+        type=str,
+        required=False,
+        default="./reports/prompt_eval_trace.json",
+        help="file to export the spans of the job to")
+    parser.add_argument(
+        "--local_eval",
+        required=False,
+        action="store_true",
+        help="run pure-Python evaluation flows in-process")
+    parser.add_argument(
+        "--fan_out",
+        required=False,
+        action="store_true",
+        help="evaluate each run with all evaluation flows at once")
 
     parser.add_argument(
         "--flow_to_execute", type=str, help="flow use case name", required=True
@@ -306,16 +682,27 @@ def main():
         type=list_of_strings,
     )
     args = parser.parse_args()
-
-    prepare_and_execute(
-        args.subscription_id,
-        args.build_id,
-        args.env_name,
-        args.run_id,
-        args.data_purpose,
-        args.flow_to_execute,
-        args.rules,
-    )
+    if args.run_id is None and args.manifest_file is None:
+        parser.error("one of --run_id or --manifest_file is required")
+
+    tracer = Tracer("prompt_eval", args.trace_file)
+    try:
+        prepare_and_execute(
+            args.subscription_id,
+            args.build_id,
+            args.env_name,
+            args.run_id,
+            args.data_purpose,
+            args.flow_to_execute,
+            args.rules,
+            args.manifest_file,
+            args.data_index_file,
+            tracer=tracer,
+            local_eval=args.local_eval,
+            fan_out=args.fan_out,
+        )
+    finally:
+        tracer.finish()
 
 
 if __name__ == "__main__":
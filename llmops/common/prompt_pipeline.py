@@ -19,20 +19,62 @@ This argument is required to specify the file to save the run IDs.
 --flow_to_execute: The name of the flow use case.
 This argument is required to specify the name of the flow for execution.
 --save_output: Flag to save the outputs in files.
-If provided, the outputs will be saved in files.
+If provided, the outputs of each run are appended to a partitioned
+parquet dataset in the reports folder as soon as the run finishes.
 --save_metric: Flag to save the metrics in files.
 If provided, the metrics will be saved in files.
+--max_concurrent_runs: Maximum number of bulk runs in flight at once.
+Defaults to 4.
+--run_cache_file: A file path for the local index of completed runs.
+Completed runs with the same flow, data, variant and column mapping
+are reused instead of being submitted again.
+--disable_run_cache: Flag to always submit new runs.
+--manifest_file: A file path for the JSONL run manifest.
+Every run submission and completion is appended to it.
+--resume: Flag to resume the sweep recorded in the manifest.
+Completed runs are skipped and runs still in progress are re-attached.
+--design: The variant combinations to run: one_at_a_time (default),
+full_factorial or fractional_factorial.
+--plan_only: Flag to only log the estimates of every design.
+--token_cost_per_1k: Cost of 1000 tokens used for the estimates.
+--data_index_file: A file path for the data asset index of the build.
+Defaults to data_assets_index.json.
+--trace_file: A file path for the spans of the job in OTLP/JSON format.
+Defaults to reports/prompt_pipeline_trace.json.
+--evaluate: Flag to run the evaluation flows of EVALUATION_FLOW_PATH
+against each run as soon as it completes. Evaluation datasets not registered
+yet are resolved when the first evaluation needs them.
+--local_eval: Flag to run evaluation flows made only of Python nodes
+in-process over the outputs of each run instead of as remote runs.
 """
 
 import argparse
 import datetime
 import json
-import os
-import time
-import yaml
-import pandas as pd
 from promptflow.entities import Run
 from llmops.common.utils.get_clients import get_ml_client, get_pf_client
+from llmops.common.run_scheduler import RunScheduler, ScheduledRun
+from llmops.common.data_assets import DEFAULT_INDEX_FILE, DataAssetIndex
+from llmops.common.experiment_planner import (
+    DESIGNS,
+    ONE_AT_A_TIME,
+    average_row_tokens,
+    count_dataset_rows,
+    materialize_flow,
+    plan_all_designs,
+    read_flow_variants,
+)
+from llmops.common.prompt_eval import RunEvaluator
+from llmops.common.report_writer import StreamingReportWriter
+from llmops.common.tracing import RUN_NAME_ATTRIBUTE, Tracer
+from llmops.common.run_index import run_tags
+from llmops.common.run_manifest import RunManifest
+from llmops.common.run_cache import (
+    RUN_HASH_TAG,
+    RunCache,
+    compute_run_key,
+    hash_flow_directory,
+)
 
 from llmops.common.logger import llmops_logger
 
@@ -55,6 +97,25 @@ def are_dictionaries_similar(dict1, dict2):
     return False
 
 
+def unique_run_name(name, run_names):
+    """
+    Return the name, suffixed with an index if already taken.
+
+    The whole matrix is built within the same second, so run names sharing
+    rule, dataset and variant label would otherwise share their timestamp.
+
+    Returns:
+        str: a name not in run_names, added to it.
+    """
+    unique_name = name
+    index = 1
+    while unique_name in run_names:
+        unique_name = f"{name}_{index}"
+        index += 1
+    run_names.add(unique_name)
+    return unique_name
+
+
 def prepare_and_execute(
     subscription_id,
     build_id,
@@ -65,276 +126,413 @@ def prepare_and_execute(
     save_output,
     save_metric,
     rules, # Used to send a list of rules to run 
+    max_concurrent_runs=4,
+    run_cache_file=None,
+    use_run_cache=True,
+    manifest_file=None,
+    resume=False,
+    design=ONE_AT_A_TIME,
+    plan_only=False,
+    token_cost_per_1k=0.002,
+    data_index_file=DEFAULT_INDEX_FILE,
+    tracer=None,
+    pf=None,
+    ml_client=None,
+    evaluate=False,
+    local_eval=False,
 ):
     """
     Run the experimentation loop by executing standard flows.
 
-    reads latest experiment data assets.
+    reads latest experiment data assets from the data asset index.
     identifies all variants across all nodes.
-    executes the flow creating a new job using
-    unique variant combination across nodes.
-    saves the results in both csv and html format.
+    plans the variant combinations of the selected design
+    and estimates their runs, LLM calls and token cost.
+    executes the flow creating a new job for
+    each planned variant combination.
+    submits all jobs at once, keeping at most
+    max_concurrent_runs of them in flight.
+    reuses completed jobs from earlier builds with identical inputs.
+    appends every job submission and completion to the run manifest.
+    streams the results of each job to partitioned parquet files.
+    saves the metrics in both csv and html format.
     saves the job ids in text file for later use.
+    evaluates each completed job with the evaluation flows right away
+    when evaluate is set, overlapping experiment and evaluation runs.
+    with local_eval, pure-Python evaluation flows run in-process instead.
+    records the time spent in each phase and run as spans of the tracer.
 
     Returns:
         None
     """
-    main_config = open(f"{flow_to_execute}/llmops_config.json")
-    model_config = json.load(main_config)
-
-    for obj in model_config["envs"]:
-        if obj.get("ENV_NAME") == stage:
-            config = obj
-            break
-
-    resource_group_name = config["RESOURCE_GROUP_NAME"]
-    workspace_name = config["WORKSPACE_NAME"]
-    data_mapping_config = f"{flow_to_execute}/configs/mapping_config.json"
-    standard_flow_path = config["STANDARD_FLOW_PATH"]
-    data_config_path = f"{flow_to_execute}/configs/data_config.json"
-
-    runtime = config["RUNTIME_NAME"]
-    experiment_name = f"{flow_to_execute}_{stage}"
-
-    ml_client = get_ml_client(subscription_id, resource_group_name, workspace_name)
-
-    pf = get_pf_client(subscription_id, resource_group_name, workspace_name)
-
-    logger.info(data_mapping_config)
-    logger.info(rules)
-    flow = f"{flow_to_execute}/{standard_flow_path}"
-    dataset_name = []
-    config_file = open(data_config_path)
-    data_config = json.load(config_file)
-    for elem in data_config["datasets"]:
-        if "DATA_PURPOSE" in elem and "ENV_NAME" in elem:
-            if (stage == elem["ENV_NAME"] and
-                    data_purpose == elem["DATA_PURPOSE"]):
-                data_name = elem["DATASET_NAME"]
-                data = ml_client.data.get(name=data_name, label="latest")
-                data_id = f"azureml:{data.name}:{data.version}"
-                dataset_name.append(data_id)
-    logger.info(dataset_name)
-    flow_file = f"{flow}/flow.dag.yaml"
-
-    with open(flow_file, "r") as yaml_file:
-        yaml_data = yaml.safe_load(yaml_file)
-    all_variants = []
-    all_llm_nodes = set()
-    default_variants = {}
-    for node_name, node_data in yaml_data.get("node_variants", {}).items():
-        node_variant_mapping = {}
-        variants = node_data.get("variants", {})
-        default_variant = node_data["default_variant_id"]
-        default_variants[node_name] = default_variant
-        for variant_name, variant_data in variants.items():
-            node_variant_mapping[variant_name] = node_name
-            all_llm_nodes.add(node_name)
-        all_variants.append(node_variant_mapping)
-
-    for nodes in yaml_data["nodes"]:
-        node_variant_mapping = {}
-        if nodes.get("type", {}) == "llm":
-            all_llm_nodes.add(nodes["name"])
-
-    mapping_file = open(data_mapping_config)
-    mapping_config = json.load(mapping_file)
-    exp_config_node = mapping_config["experiment"]
-
-    run_ids = []
-    past_runs = []
-    all_eval_df = []
-    all_eval_metrics = []
-
-    for data_id in dataset_name:
-        data_ref = data_id.replace("azureml:", "")
-        data_ref = data_ref.split(":")[0]
-        dataframes = []
-        metrics = []
-        if len(rules) == 0:
+    if tracer is None:
+        tracer = Tracer("prompt_pipeline")
+
+    with tracer.span("config_parsing"):
+        main_config = open(f"{flow_to_execute}/llmops_config.json")
+        model_config = json.load(main_config)
+
+        for obj in model_config["envs"]:
+            if obj.get("ENV_NAME") == stage:
+                config = obj
+                break
+
+        resource_group_name = config["RESOURCE_GROUP_NAME"]
+        workspace_name = config["WORKSPACE_NAME"]
+        data_mapping_config = f"{flow_to_execute}/configs/mapping_config.json"
+        standard_flow_path = config["STANDARD_FLOW_PATH"]
+        data_config_path = f"{flow_to_execute}/configs/data_config.json"
+
+        runtime = config["RUNTIME_NAME"]
+        experiment_name = f"{flow_to_execute}_{stage}"
+
+        logger.info(data_mapping_config)
+        logger.info(rules)
+        if not rules:
             rules = ["default"]
-        for rule in rules:
-            if(rule != "default"):
-                # If real rules are passed, update the configs
-                exp_config_node["rule_id"] = rule
-                exp_config_node["truth"] = f"${{data.{rule}}}"
-            if len(all_variants) != 0:
-                for variant in all_variants:
-                    for variant_id, node_id in variant.items():
-                        variant_string = f"${{{node_id}.{variant_id}}}"
-                        logger.info(variant_string)
-
-                        get_current_defaults = {
-                            key: value
-                            for key, value in default_variants.items()
-                            if key != node_id or value != variant_id
-                        }
-                        get_current_defaults[node_id] = variant_id
-                        get_current_defaults["dataset"] = data_ref
-                        logger.info(get_current_defaults)
-
-                    
-                        past_runs.append(get_current_defaults)
-                        timestamp = datetime.datetime.now().strftime(
-                            "%Y%m%d_%H%M%S"
-                            )
-                        
-                        run = Run(
-                            flow=flow,
-                            data=data_id,
-                            runtime=runtime,
-                            # un-comment the resources line and
-                            # comment the argument runtime to
-                            # enable automatic runtime.
-                            # Reference: COMPUTE_RUNTIME
-                            # resources={"instance_type": "Standard_E4ds_v4"},
-                            variant=variant_string,
-                            name=(
-                                f"{experiment_name}_{variant_id}"
-                                f"_{rule}"
-                                f"_{timestamp}_{data_ref}"
-                                ),
-                            display_name=(
-                                f"{experiment_name}_{variant_id}"
-                                f"_{rule}"
-                                f"_{timestamp}_{data_ref}"
-                            ),
-                            column_mapping=exp_config_node,
-                            tags={
-                                "build_id": build_id
-                                },
+        flow = f"{flow_to_execute}/{standard_flow_path}"
+        config_file = open(data_config_path)
+        data_config = json.load(config_file)
+        experiment_datasets = [
+            elem for elem in data_config["datasets"]
+            if "DATA_PURPOSE" in elem and "ENV_NAME" in elem
+            and stage == elem["ENV_NAME"]
+            and data_purpose == elem["DATA_PURPOSE"]
+        ]
+
+        data_paths = [
+            f"{flow_to_execute}/{elem['DATA_PATH']}"
+            for elem in experiment_datasets
+        ]
+        plans = plan_all_designs(
+            flow_variants=read_flow_variants(flow),
+            rows=sum(count_dataset_rows(path) for path in data_paths),
+            row_tokens=max(
+                [average_row_tokens(path) for path in data_paths], default=0
+            ),
+            datasets=len(experiment_datasets),
+            rules=len(rules),
+            token_cost_per_1k=token_cost_per_1k,
+        )
+        plan = plans[design]
+        logger.info(f"Selected design: {plan.summary()}")
+        if plan_only:
+            return
+
+    with tracer.span("client_setup"):
+        # clients can be injected, e.g. the offline simulation clients
+        if ml_client is None:
+            ml_client = get_ml_client(subscription_id, resource_group_name, workspace_name)
+        if pf is None:
+            pf = get_pf_client(subscription_id, resource_group_name, workspace_name)
+
+    with tracer.span("data_asset_lookup"):
+        # resolve the experiment datasets once, later steps of the build
+        # read their versions from the persisted index. Evaluation datasets
+        # may be registered after this step, a missing one stays pending.
+        stage_datasets = [
+            elem for elem in data_config["datasets"]
+            if elem.get("ENV_NAME") == stage
+        ]
+        data_assets = DataAssetIndex(ml_client, data_index_file, build_id)
+        data_assets.index_config(stage_datasets)
+        data_assets.resolve(elem["DATASET_NAME"] for elem in experiment_datasets)
+        if evaluate:
+            eval_dataset_names = [
+                data_assets.related_dataset(elem["DATASET_NAME"])
+                for elem in experiment_datasets
+            ]
+            data_assets.resolve(
+                (name for name in eval_dataset_names if name is not None),
+                lazy=True,
+            )
+        dataset_name = [
+            data_assets.data_id(elem["DATASET_NAME"])
+            for elem in experiment_datasets
+        ]
+        logger.info(dataset_name)
+
+    with tracer.span("run_preparation"):
+        mapping_file = open(data_mapping_config)
+        mapping_config = json.load(mapping_file)
+        exp_config_node = mapping_config["experiment"]
+
+        past_runs = []
+        run_names = set()
+        scheduled_runs = []
+
+        flow_hash = hash_flow_directory(flow)
+        run_cache = None
+        if use_run_cache:
+            run_cache = RunCache(pf, run_cache_file)
+            run_cache.load_remote()
+        manifest = None
+        if manifest_file is not None:
+            manifest = RunManifest(manifest_file, resume=resume)
+
+        def find_existing_run(run_key):
+            if manifest is not None:
+                run_name = manifest.resumable_run(run_key)
+                if run_name is not None:
+                    return run_name
+            if run_cache is not None:
+                return run_cache.lookup(run_key)
+            return None
+
+        for data_id in dataset_name:
+            data_ref = data_id.replace("azureml:", "")
+            data_ref = data_ref.split(":")[0]
+            for rule in rules:
+                if(rule != "default"):
+                    # If real rules are passed, update the configs
+                    exp_config_node["rule_id"] = rule
+                    exp_config_node["truth"] = f"${{data.{rule}}}"
+                for point in plan.points:
+                    variant_id = point.variant_id
+                    variant_string = point.variant_string
+                    logger.info(point.assignments)
+
+                    current_run = dict(point.assignments)
+                    current_run["dataset"] = data_ref
+                    current_run["rule"] = rule
+                    if are_dictionaries_similar(current_run, past_runs):
+                        continue
+                    past_runs.append(current_run)
+
+                    point_flow = flow
+                    point_flow_hash = flow_hash
+                    if point.assignments and variant_string is None:
+                        # several nodes deviate from their defaults, run a copy
+                        # of the flow with these variants as defaults.
+                        point_flow = materialize_flow(flow, point)
+                        point_flow_hash = hash_flow_directory(point_flow)
+                    column_mapping = dict(exp_config_node)
+                    run_key = compute_run_key(
+                        point_flow_hash, data_id, variant_string, column_mapping
+                    )
+                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                    if variant_id is not None:
+                        run_name = (
+                            f"{experiment_name}_{variant_id}"
+                            f"_{rule}"
+                            f"_{timestamp}_{data_ref}"
                         )
+                    else:
+                        run_name = f"{experiment_name}_{rule}_{timestamp}_{data_ref}"
+                    run_name = unique_run_name(run_name, run_names)
+
+                    run = Run(
+                        flow=point_flow,
+                        data=data_id,
+                        runtime=runtime,
+                        # un-comment the resources line and
+                        # comment the argument runtime to
+                        # enable automatic runtime.
+                        # Reference: COMPUTE_RUNTIME
+                        # resources={"instance_type": "Standard_E4ds_v4"},
+                        variant=variant_string,
+                        name=run_name,
+                        display_name=run_name,
+                        # runs are submitted after the whole matrix is
+                        # built, so each one needs its own mapping copy.
+                        column_mapping=column_mapping,
+                        tags={
+                            "build_id": build_id,
+                            RUN_HASH_TAG: run_key,
+                            **run_tags(rule, data_ref, variant_id),
+                            },
+                    )
+                    metadata = {
+                        "data_id": data_id,
+                        "data_ref": data_ref,
+                        "rule": rule,
+                    }
+                    if variant_id is None:
+                        run._experiment_name = experiment_name
+                    else:
+                        metadata["variant_id"] = variant_id
+                        metadata["variant_string"] = (
+                            variant_string or json.dumps(point.changed)
+                        )
+                        metadata["variants"] = point.assignments
+                    scheduled_runs.append(
+                        ScheduledRun(
+                            run=run,
+                            metadata=metadata,
+                            run_key=run_key,
+                            existing_run_name=find_existing_run(run_key),
+                        )
+                    )
+
+    with tracer.span("run_execution"):
+        report_writer = None
+        if save_output or save_metric:
+            report_writer = StreamingReportWriter(
+                report_dir="./reports",
+                dataset_name=f"{experiment_name}_result",
+                extra_columns={
+                    "stage": stage,
+                    "experiment_name": experiment_name,
+                    "build": build_id,
+                },
+            )
 
-                        pipeline_job = pf.runs.create_or_update(
-                            run,
-                            stream=True
-                            )
-
-                        run_ids.append(pipeline_job.name)
-                        df_result = None
-                        time.sleep(15)
-                        
-                        if (
-                            pipeline_job.status == "Completed"
-                            or pipeline_job.status == "Finished"
-                        ):
-                            logger.info("job completed")
-                            df_result = pf.get_details(pipeline_job)
-                            if save_output:
-                                dataframes.append(df_result)
-                            if save_metric:
-                                metric_variant = pf.get_metrics(pipeline_job)
-                                metric_variant[variant_id] = variant_string
-                                metric_variant["dataset"] = data_id
-                                metrics.append(metric_variant)
-                            logger.info(df_result.head(10))
-                        else:
-                            raise Exception("Sorry, job failured..")
-            else:
-                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                run = Run(
-                    flow=flow,
-                    data=data_id,
-                    runtime=runtime,
-                    # un-comment the resources line and
-                    # comment the argument runtime to
-                    # enable automatic runtime.
-                    # Reference: COMPUTE_RUNTIME
-                    # resources={"instance_type": "Standard_E4ds_v4"},
-                    name=f"{experiment_name}_{rule}_{timestamp}_{data_ref}",
-                    display_name=f"{experiment_name}_{rule}_{timestamp}_{data_ref}",
-                    column_mapping=exp_config_node,
-                    tags={
-                        "build_id": build_id
-                        },
-                )
-                run._experiment_name = experiment_name
-                pipeline_job = pf.runs.create_or_update(run, stream=True)
-                run_ids.append(pipeline_job.name)
-                time.sleep(15)
-                df_result = None
-        
-                if (pipeline_job.status == "Completed" or
-                        pipeline_job.status == "Finished"):
-
-                    logger.info("job completed")
-                    df_result = pf.get_details(pipeline_job)
-                    if save_output:
-                        dataframes.append(df_result)
-                    if save_metric:
-                        metric_variant = pf.get_metrics(pipeline_job)
-                        metric_variant["dataset"] = data_id
-                        metrics.append(metric_variant)
-                    logger.info(df_result.head(10))
-                else:
-                    raise Exception("Sorry, exiting job with failure..")
-
-        if (save_output or save_metric) and not os.path.exists("./reports"):
-            os.makedirs("./reports")
+        evaluator = None
+        experiment_jobs = {}
+        if evaluate:
+            evaluator = RunEvaluator(
+                flow_to_execute,
+                stage,
+                build_id,
+                config,
+                data_assets,
+                StreamingReportWriter(
+                    report_dir="./reports",
+                    dataset_name=f"{experiment_name}_eval_result",
+                    extra_columns={
+                        "stage": stage,
+                        "experiment_name": experiment_name,
+                        "build": build_id,
+                    },
+                ),
+                local=local_eval,
+                merge_flows=True,
+            )
 
-        if save_output:
-            combined_results_df = pd.concat(dataframes, ignore_index=True)
-            combined_results_df.to_csv(f"./reports/{data_ref}_result.csv")
-            styled_df = combined_results_df.to_html(index=False)
-            with open(f"reports/{data_ref}_result.html", "w") as c_results:
-                c_results.write(styled_df)
-            all_eval_df.append(combined_results_df)
-        if save_metric:
-            combined_metrics_df = pd.DataFrame(metrics)
-            combined_metrics_df.to_csv(
-                f"./reports/{data_ref}_metrics.csv"
+        def evaluation_runs(completed):
+            # evaluate each experiment run as soon as it completed
+            if completed.metadata.get("evaluation"):
+                return []
+            experiment_jobs[completed.job.name] = completed.job
+            eval_runs = []
+            for flow_name in evaluator.flow_names:
+                if evaluator.is_local(flow_name):
+                    with tracer.span(
+                        "eval.local", **{RUN_NAME_ATTRIBUTE: completed.job.name}
+                    ):
+                        name, df_result, metric_variant, eval_metadata = \
+                            evaluator.evaluate_locally(
+                                flow_name,
+                                completed.job,
+                                completed.metadata["rule"],
+                                completed.details,
+                            )
+                        evaluator.add_results(
+                            eval_metadata,
+                            completed.job,
+                            name,
+                            df_result,
+                            metric_variant,
+                        )
+                    continue
+                eval_run, eval_metadata = evaluator.create_eval_run(
+                    flow_name, completed.job, completed.metadata["rule"]
                 )
-
-            html_table_metrics = combined_metrics_df.to_html(
-                index=False
+                eval_runs.append(
+                    ScheduledRun(run=eval_run, metadata=eval_metadata)
                 )
-
-            with open(f"reports/{data_ref}_metrics.html", "w") as full_metric:
-                full_metric.write(html_table_metrics)
-            all_eval_metrics.append(combined_metrics_df)
-
-    if output_file is not None:
-        with open(output_file, "w") as out_file:
-            out_file.write(str(run_ids))
-    logger.info(str(run_ids))
-
-    if save_output:
-        final_results_df = pd.concat(all_eval_df, ignore_index=True)
-        final_results_df["stage"] = stage
-        final_results_df["experiment_name"] = experiment_name
-        final_results_df["build"] = build_id
-        final_results_df.to_csv(
-            f"./reports/{experiment_name}_result.csv"
-            )
-        styled_df = final_results_df.to_html(index=False)
-        with open(f"reports/{experiment_name}_result.html", "w") as results:
-            results.write(styled_df)
-        logger.info("Saved the results in files in reports folder")
-
-    if save_metric:
-        final_metrics_df = pd.concat(
-            all_eval_metrics,
-            ignore_index=True
+            return eval_runs
+
+        scheduler = RunScheduler(
+            pf,
+            max_concurrent_runs=max_concurrent_runs,
+            fetch_details=True,
+            fetch_metrics=save_metric or evaluate,
+            manifest=manifest,
+            tracer=tracer,
+        )
+        for completed in scheduler.run_all(
+            scheduled_runs,
+            follow_up=evaluation_runs if evaluate else None,
+        ):
+            metadata = completed.metadata
+            if metadata.get("evaluation"):
+                with tracer.span(
+                    "report.write_details",
+                    **{RUN_NAME_ATTRIBUTE: completed.job.name},
+                ):
+                    evaluator.add_results(
+                        metadata,
+                        experiment_jobs[metadata["exp_run"]],
+                        completed.job.name,
+                        completed.details,
+                        completed.metrics,
+                    )
+                completed.details = None
+                continue
+            logger.info(completed.details.head(10))
+            if run_cache is not None:
+                run_cache.add(completed.run_key, completed.job.name)
+            if save_output:
+                with tracer.span(
+                    "report.write_details",
+                    **{RUN_NAME_ATTRIBUTE: completed.job.name},
+                ):
+                    report_writer.write_details(
+                        completed.details,
+                        partitions={
+                            "dataset": metadata["data_ref"],
+                            "variant": metadata.get("variant_id", "default"),
+                            "rule": metadata["rule"],
+                        },
+                        run_name=completed.job.name,
+                    )
+            # details are persisted, do not keep them for the whole sweep
+            completed.details = None
+            if save_metric:
+                if "variant_id" in metadata:
+                    completed.metrics[metadata["variant_id"]] = \
+                        metadata["variant_string"]
+                completed.metrics["dataset"] = metadata["data_id"]
+
+    with tracer.span("report_writing"):
+        # reports keep the submission order regardless of completion order
+        run_ids = [scheduled.job.name for scheduled in scheduled_runs]
+        if run_cache is not None:
+            logger.info(
+                f"Run cache: {run_cache.hits} runs reused, "
+                f"{run_cache.misses} runs submitted"
             )
 
-        final_metrics_df.to_csv(
-            f"./reports/{experiment_name}_metrics.csv"
-            )
+        if output_file is not None:
+            with open(output_file, "w") as out_file:
+                out_file.write(str(run_ids))
+        logger.info(str(run_ids))
 
-        html_table_metrics = final_metrics_df.to_html(
-            index=False
+        if save_output:
+            logger.info(
+                f"Saved {report_writer.rows_written} result rows "
+                f"in {report_writer.details_dir}"
             )
 
-        with open(f"reports/{experiment_name}_metrics.html", "w") as f_metrics:
-            f_metrics.write(html_table_metrics)
+        if save_metric:
+            for data_id in dataset_name:
+                data_ref = data_id.replace("azureml:", "")
+                data_ref = data_ref.split(":")[0]
+                report_writer.write_summary(
+                    data_ref,
+                    [
+                        scheduled.metrics for scheduled in scheduled_runs
+                        if scheduled.metadata["data_id"] == data_id
+                    ],
+                )
+            report_writer.write_summary(
+                experiment_name,
+                [scheduled.metrics for scheduled in scheduled_runs],
+            )
+            logger.info("Saved the metrics in files in reports folder")
 
-        logger.info("Saved the metrics in files in reports folder")
+        if evaluator is not None:
+            for flow_name in evaluator.flow_names:
+                evaluator.write_flow_summary(flow_name)
+            evaluator.write_summary()
 
 
 # Define a custom argument type for a list of strings
 def list_of_strings(arg):
     return arg.split(',')
 
+
 def main():
     """
     Run experimentation loop by executing standard Prompt Flows.
@@ -397,19 +595,115 @@ def main():
         required=False,
         type=list_of_strings,
     )
+    parser.add_argument(
+        "--max_concurrent_runs",
+        type=int,
+        help="Maximum number of bulk runs in flight at once",
+        required=False,
+        default=4,
+    )
+    parser.add_argument(
+        "--run_cache_file",
+        type=str,
+        help="a file to persist the index of completed runs",
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "--disable_run_cache",
+        help="Always submit new runs instead of reusing completed ones",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--manifest_file",
+        type=str,
+        help="a JSONL file to record run submissions and completions",
+        required=False,
+        default="run_manifest.jsonl",
+    )
+    parser.add_argument(
+        "--resume",
+        help="Resume the runs recorded in the manifest file",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--design",
+        type=str,
+        help="variant combinations to run",
+        required=False,
+        choices=DESIGNS,
+        default=ONE_AT_A_TIME,
+    )
+    parser.add_argument(
+        "--plan_only",
+        help="Only estimate the designs without submitting runs",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--token_cost_per_1k",
+        type=float,
+        help="cost of 1000 tokens used for the estimates",
+        required=False,
+        default=0.002,
+    )
+    parser.add_argument(
+        "--data_index_file",
+        type=str,
+        help="a file to persist the data asset index of the build",
+        required=False,
+        default=DEFAULT_INDEX_FILE,
+    )
+    parser.add_argument(
+        "--trace_file",
+        type=str,
+        help="a file to export the spans of the job to",
+        required=False,
+        default="./reports/prompt_pipeline_trace.json",
+    )
+    parser.add_argument(
+        "--evaluate",
+        help="evaluate each run as soon as it completes",
+        required=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--local_eval",
+        help="run pure-Python evaluation flows in-process",
+        required=False,
+        action="store_true",
+    )
     args = parser.parse_args()
 
-    prepare_and_execute(
-        args.subscription_id,
-        args.build_id,
-        args.flow_to_execute,
-        args.env_name,
-        args.output_file,
-        args.data_purpose,
-        args.save_output,
-        args.save_metric,
-        args.rules,
-    )
+    tracer = Tracer("prompt_pipeline", args.trace_file)
+    try:
+        prepare_and_execute(
+            args.subscription_id,
+            args.build_id,
+            args.flow_to_execute,
+            args.env_name,
+            args.output_file,
+            args.data_purpose,
+            args.save_output,
+            args.save_metric,
+            args.rules,
+            args.max_concurrent_runs,
+            args.run_cache_file,
+            not args.disable_run_cache,
+            args.manifest_file,
+            args.resume,
+            args.design,
+            args.plan_only,
+            args.token_cost_per_1k,
+            args.data_index_file,
+            tracer=tracer,
+            evaluate=args.evaluate,
+            local_eval=args.local_eval,
+        )
+    finally:
+        tracer.finish()
 
 
 if __name__ == "__main__":
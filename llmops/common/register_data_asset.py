@@ -11,6 +11,10 @@ This argument is required to specify the name of the flow for execution.
 --env_name: The environment name for execution and deployment.
 This argument is required to specify the environment (dev, test, prod)
 for execution or deployment.
+--build_id: The unique identifier for build execution.
+Registered versions are recorded in the data asset index of this build.
+--data_index_file: A file path for the data asset index of the build.
+Defaults to data_assets_index.json.
 """
 
 import argparse
@@ -18,6 +22,7 @@ from azure.ai.ml.entities import Data
 from azure.ai.ml.constants import AssetTypes
 import json
 
+from llmops.common.data_assets import DEFAULT_INDEX_FILE, DataAssetIndex
 from llmops.common.logger import llmops_logger
 from llmops.common.utils.get_clients import get_ml_client
 
@@ -42,6 +47,19 @@ parser.add_argument(
     help="environment name (e.g. dev, test, prod)",
     required=True,
 )
+parser.add_argument(
+    "--build_id",
+    type=str,
+    help="Unique identifier for build execution",
+    required=False,
+)
+parser.add_argument(
+    "--data_index_file",
+    type=str,
+    help="a file to persist the data asset index of the build",
+    required=False,
+    default=DEFAULT_INDEX_FILE,
+)
 
 args = parser.parse_args()
 
@@ -61,6 +79,7 @@ data_purpose = args.data_purpose
 
 
 ml_client = get_ml_client(args.subscription_id, resource_group_name, workspace_name)
+data_assets = DataAssetIndex(ml_client, args.data_index_file, args.build_id)
 
 config_file = open(data_config_path)
 data_config = json.load(config_file)
@@ -81,11 +100,10 @@ for elem in data_config["datasets"]:
                 description=dataset_desc,
                 name=dataset_name,
             )
-            ml_client.data.create_or_update(aml_dataset)
+            registered_dataset = ml_client.data.create_or_update(aml_dataset)
+            data_assets.record(dataset_name, registered_dataset.version)
 
-            aml_dataset_unlabeled = ml_client.data.get(
-                name=dataset_name, label="latest"
-            )
+            logger.info(registered_dataset.version)
+            logger.info(registered_dataset.id)
 
-            logger.info(aml_dataset_unlabeled.latest_version)
-            logger.info(aml_dataset_unlabeled.id)
+data_assets.save()
@@ -0,0 +1,125 @@
+"""
+Streaming report writer for experiment and evaluation outputs.
+
+Run details are appended to a partitioned Parquet dataset as soon as each
+run finishes, so they are never held in memory together. Only the small
+per-run metrics are kept, by the caller, and written as CSV and HTML
+summaries at the end.
+
+Parquet files are laid out with hive-style partitions, e.g.
+reports/experiment/dataset=<name>/variant=<id>/rule=<id>/<run>.parquet
+and can be read back with pandas.read_parquet(path).
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("report_writer")
+
+
+def _partition_value(value: Any) -> str:
+    """Make a value safe to use as a partition directory name."""
+    return re.sub(r"[^A-Za-z0-9_.\-]", "_", str(value))
+
+
+class StreamingReportWriter:
+    """
+    Write run details to partitioned Parquet and metrics to summaries.
+
+    Args:
+        report_dir (str): directory receiving all reports.
+        dataset_name (str): name of the Parquet dataset directory.
+        extra_columns (dict, optional): constant columns added to every
+        details row, e.g. stage, experiment name and build id.
+    """
+
+    def __init__(
+        self,
+        report_dir: str = "./reports",
+        dataset_name: str = "details",
+        extra_columns: Optional[Dict[str, Any]] = None,
+    ):
+        self.report_dir = report_dir
+        self.details_dir = os.path.join(report_dir, dataset_name)
+        self.extra_columns = extra_columns or {}
+        self.rows_written = 0
+        os.makedirs(self.details_dir, exist_ok=True)
+
+    def write_details(
+        self,
+        details: pd.DataFrame,
+        partitions: Dict[str, Any],
+        run_name: str,
+        columns: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """
+        Append the details of one run to the Parquet dataset.
+
+        Args:
+            details (DataFrame): run details as returned by get_details.
+            partitions (dict): ordered partition names and values.
+            run_name (str): name of the run, used as file name.
+            columns (dict, optional): constant columns for this run.
+
+        Returns:
+            str: path of the written Parquet file.
+        """
+        partition_dir = os.path.join(
+            self.details_dir,
+            *[
+                f"{key}={_partition_value(value)}"
+                for key, value in partitions.items()
+            ],
+        )
+        os.makedirs(partition_dir, exist_ok=True)
+
+        details = details.copy()
+        for key, value in {**self.extra_columns, **(columns or {})}.items():
+            details[key] = value
+        details["run_name"] = run_name
+        # partition values are read back as columns, keep both
+        details = details.rename(
+            columns={key: f"{key}_id" for key in partitions if key in details}
+        )
+        # flow outputs can hold mixed types that Parquet cannot store
+        for column in details.columns[details.dtypes == object]:
+            details[column] = details[column].map(
+                lambda value: value if value is None else str(value)
+            )
+
+        file_path = os.path.join(
+            partition_dir, f"{_partition_value(run_name)}.parquet"
+        )
+        details.to_parquet(file_path, index=False)
+        self.rows_written += len(details)
+        logger.info(f"Wrote {len(details)} rows to {file_path}")
+        return file_path
+
+    def write_summary(
+        self, name: str, metrics: List[Dict[str, Any]]
+    ) -> pd.DataFrame:
+        """
+        Write metrics as {name}_metrics.csv and {name}_metrics.html.
+
+        Args:
+            name (str): file name prefix.
+            metrics (list): metrics rows to write, one per run.
+
+        Returns:
+            DataFrame: the written metrics table.
+        """
+        metrics_df = pd.DataFrame(metrics)
+        for key, value in self.extra_columns.items():
+            metrics_df[key] = value
+        metrics_df.to_csv(os.path.join(self.report_dir, f"{name}_metrics.csv"))
+        html_table_metrics = metrics_df.to_html(index=False)
+        with open(
+            os.path.join(self.report_dir, f"{name}_metrics.html"), "w"
+        ) as metrics_file:
+            metrics_file.write(html_table_metrics)
+        return metrics_df
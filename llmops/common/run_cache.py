@@ -0,0 +1,169 @@
+"""
+Content-addressed cache of completed Prompt Flow bulk runs.
+
+A run is identified by a hash of the flow directory contents, the dataset
+name and version, the variant string and the column mapping. Runs are
+tagged with this hash at submission, so a completed run from an earlier
+build can be found again either through the local index file or through
+the tags of recent runs in the workspace, and reused instead of being
+submitted again.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("run_cache")
+
+RUN_HASH_TAG = "run_hash"
+COMPLETED_STATUSES = ("Completed", "Finished")
+IGNORED_DIRECTORIES = ("__pycache__", ".promptflow", ".runs")
+
+
+def hash_flow_directory(flow_path: str) -> str:
+    """
+    Hash the contents of every file in a flow directory.
+
+    Hidden and cache directories are ignored so that local test runs do
+    not change the hash.
+
+    Returns:
+        str: hex digest of the flow contents.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(flow_path):
+        dirs[:] = sorted(
+            d for d in dirs
+            if d not in IGNORED_DIRECTORIES and not d.startswith(".")
+        )
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            relative_path = os.path.relpath(file_path, flow_path)
+            digest.update(relative_path.replace(os.sep, "/").encode("utf-8"))
+            with open(file_path, "rb") as flow_file:
+                for chunk in iter(lambda: flow_file.read(65536), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_run_key(
+    flow_hash: str,
+    data_id: str,
+    variant_string: Optional[str],
+    column_mapping: Dict[str, str],
+) -> str:
+    """
+    Build the cache key of a bulk run.
+
+    Args:
+        flow_hash (str): hash returned by hash_flow_directory.
+        data_id (str): data asset reference including name and version.
+        variant_string (str, optional): variant reference, if any.
+        column_mapping (dict): column mapping passed to the run.
+
+    Returns:
+        str: hex digest identifying the run inputs.
+    """
+    payload = json.dumps(
+        {
+            "flow": flow_hash,
+            "data": data_id,
+            "variant": variant_string or "",
+            "column_mapping": column_mapping,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunCache:
+    """
+    Map run keys to the names of completed runs.
+
+    Args:
+        pf: Prompt Flow client used to validate cached runs.
+        cache_file (str, optional): local JSON index persisted between
+        builds. No local index is kept when not provided.
+    """
+
+    def __init__(self, pf, cache_file: Optional[str] = None):
+        self.pf = pf
+        self.cache_file = cache_file
+        self.index: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        if cache_file is not None and os.path.exists(cache_file):
+            with open(cache_file, "r") as index_file:
+                self.index = json.load(index_file)
+            logger.info(f"Loaded {len(self.index)} cached runs from {cache_file}")
+
+    def load_remote(self, max_results: int = 200):
+        """
+        Index recent workspace runs by their run hash tag.
+
+        Entries found in the local index take precedence.
+
+        Returns:
+            None
+        """
+        try:
+            recent_runs = self.pf.runs.list(max_results=max_results)
+        except Exception as ex:
+            logger.warning(f"Unable to list recent runs for the cache: {ex}")
+            return
+        found = 0
+        for run in recent_runs:
+            run_key = (run.tags or {}).get(RUN_HASH_TAG)
+            if run_key and run.status in COMPLETED_STATUSES:
+                if run_key not in self.index:
+                    self.index[run_key] = run.name
+                    found += 1
+        logger.info(f"Indexed {found} completed runs from the workspace")
+
+    def lookup(self, run_key: str) -> Optional[str]:
+        """
+        Return the name of a completed run for the key, if any.
+
+        Cached runs that no longer exist or did not complete are evicted.
+
+        Returns:
+            str: run name, or None on a cache miss.
+        """
+        run_name = self.index.get(run_key)
+        if run_name is not None:
+            try:
+                run = self.pf.runs.get(run_name)
+            except Exception as ex:
+                logger.info(f"Cached run {run_name} is not available: {ex}")
+                run = None
+            if run is not None and run.status in COMPLETED_STATUSES:
+                self.hits += 1
+                return run_name
+            del self.index[run_key]
+        self.misses += 1
+        return None
+
+    def add(self, run_key: str, run_name: str):
+        """
+        Record a completed run and persist the local index.
+
+        Returns:
+            None
+        """
+        self.index[run_key] = run_name
+        self.save()
+
+    def save(self):
+        """
+        Write the local index to cache_file, if configured.
+
+        Returns:
+            None
+        """
+        if self.cache_file is None:
+            return
+        with open(self.cache_file, "w") as index_file:
+            json.dump(self.index, index_file, indent=2, sort_keys=True)
@@ -0,0 +1,137 @@
+"""
+Indexed lookup of experiment run metadata.
+
+prompt_pipeline tags every run with its rule, dataset and variant. The
+index fetches each run once, concurrently, and groups the runs by these
+tags so that the evaluation loop only visits the runs matching a rule,
+instead of fetching every run for every evaluation flow and rule. Runs
+submitted before the tags existed fall back to their data reference,
+node variant property and name.
+"""
+
+import concurrent.futures
+from typing import Any, Dict, Iterable, List, Optional
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("run_index")
+
+RULE_TAG = "rule"
+DATASET_TAG = "dataset"
+VARIANT_TAG = "variant"
+DEFAULT_VARIANT = "default"
+NODE_VARIANT_PROPERTY = "azureml.promptflow.node_variant"
+
+
+def run_tags(rule: str, dataset: str, variant: Optional[str]) -> Dict[str, str]:
+    """
+    Return the structured tags identifying an experiment run.
+
+    Returns:
+        dict: rule, dataset and variant tags.
+    """
+    return {
+        RULE_TAG: rule,
+        DATASET_TAG: dataset,
+        VARIANT_TAG: variant or DEFAULT_VARIANT,
+    }
+
+
+def _dataset_of(run) -> Optional[str]:
+    data = getattr(run, "data", None)
+    if not data:
+        return None
+    return data.replace("azureml:", "").split(":")[0]
+
+
+def _variant_of(run) -> str:
+    variant_id = (getattr(run, "properties", None) or {}).get(
+        NODE_VARIANT_PROPERTY
+    )
+    if variant_id is None:
+        return DEFAULT_VARIANT
+    start_index = variant_id.find("{") + 1
+    end_index = variant_id.find("}")
+    return variant_id[start_index:end_index].split(".")[-1]
+
+
+class RunIndex:
+    """
+    Runs of an experiment indexed by rule, dataset and variant.
+
+    Args:
+        pf: Prompt Flow client used to fetch the runs.
+    """
+
+    def __init__(self, pf):
+        self.pf = pf
+        self.runs: Dict[str, Any] = {}
+        self.keys: Dict[str, Dict[str, Optional[str]]] = {}
+        self._by_rule: Dict[str, List[str]] = {}
+        self._untagged: List[str] = []
+
+    def load(self, run_names: Iterable[str], max_workers: int = 8):
+        """
+        Fetch the runs concurrently, each one once, and index them.
+
+        Returns:
+            None
+        """
+        names = list(dict.fromkeys(run_names))
+        missing = [name for name in names if name not in self.runs]
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(missing)))
+            ) as executor:
+                for run in executor.map(self.pf.runs.get, missing):
+                    self.add(run)
+        logger.info(
+            f"Indexed {len(self.runs)} runs, {len(self._untagged)} without "
+            f"rule tag"
+        )
+
+    def add(self, run):
+        """
+        Index a run already fetched.
+
+        Returns:
+            None
+        """
+        tags = getattr(run, "tags", None) or {}
+        self.runs[run.name] = run
+        self.keys[run.name] = {
+            RULE_TAG: tags.get(RULE_TAG),
+            DATASET_TAG: tags.get(DATASET_TAG) or _dataset_of(run),
+            VARIANT_TAG: tags.get(VARIANT_TAG) or _variant_of(run),
+        }
+        rule = tags.get(RULE_TAG)
+        if rule is None:
+            self._untagged.append(run.name)
+        else:
+            self._by_rule.setdefault(rule, []).append(run.name)
+
+    def find(
+        self,
+        rule: Optional[str] = None,
+        dataset: Optional[str] = None,
+        variant: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Return the indexed runs matching every given key, in load order.
+
+        Runs without rule tag match a rule contained in their name.
+
+        Returns:
+            list: matching runs.
+        """
+        if rule is None:
+            names = list(self.runs)
+        else:
+            names = set(self._by_rule.get(rule, []))
+            names.update(name for name in self._untagged if rule in name)
+            names = [name for name in self.runs if name in names]
+        return [
+            self.runs[name] for name in names
+            if (dataset is None or self.keys[name][DATASET_TAG] == dataset)
+            and (variant is None or self.keys[name][VARIANT_TAG] == variant)
+        ]
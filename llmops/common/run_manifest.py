@@ -0,0 +1,138 @@
+"""
+Append-only manifest of experiment runs.
+
+The manifest is a JSONL file with one record per run event (submitted,
+completed or failed). It is appended as soon as an event happens, so the
+state of a sweep survives a failure part way through. A later invocation
+can resume the sweep from it and the evaluation step reads the run names
+from it.
+"""
+
+import datetime
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("run_manifest")
+
+SUBMITTED = "submitted"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class RunManifest:
+    """
+    Read and append run events in a JSONL manifest file.
+
+    Args:
+        path (str): manifest file path.
+        resume (bool): keep the events of an existing manifest. When False
+        an existing manifest is truncated.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        if resume and os.path.exists(path):
+            self.runs = load_manifest(path)
+            logger.info(f"Resuming from {len(self.runs)} runs in {path}")
+        else:
+            open(path, "w").close()
+
+    def _append(self, event: str, run_key: str, run_name: str,
+                metadata: Optional[Dict[str, Any]] = None):
+        record = {
+            "event": event,
+            "run_key": run_key,
+            "run_name": run_name,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "metadata": metadata or {},
+        }
+        with open(self.path, "a") as manifest_file:
+            manifest_file.write(json.dumps(record) + "\n")
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        self.runs[run_key] = record
+
+    def record_submitted(self, run_key: str, run_name: str,
+                         metadata: Optional[Dict[str, Any]] = None):
+        """
+        Record that a run was submitted.
+
+        Returns:
+            None
+        """
+        self._append(SUBMITTED, run_key, run_name, metadata)
+
+    def record_completed(self, run_key: str, run_name: str,
+                         metadata: Optional[Dict[str, Any]] = None):
+        """
+        Record that a run completed.
+
+        Returns:
+            None
+        """
+        self._append(COMPLETED, run_key, run_name, metadata)
+
+    def record_failed(self, run_key: str, run_name: str,
+                      metadata: Optional[Dict[str, Any]] = None):
+        """
+        Record that a run failed.
+
+        Returns:
+            None
+        """
+        self._append(FAILED, run_key, run_name, metadata)
+
+    def resumable_run(self, run_key: str) -> Optional[str]:
+        """
+        Return the run to re-attach to for the key, if any.
+
+        Completed runs are reused and submitted runs are still in progress;
+        failed runs are submitted again.
+
+        Returns:
+            str: run name, or None if the run has to be submitted.
+        """
+        record = self.runs.get(run_key)
+        if record is None or record["event"] == FAILED:
+            return None
+        return record["run_name"]
+
+
+def load_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the latest event of every run in a manifest, keyed by run key.
+
+    Returns:
+        dict: latest manifest record per run key, in first-seen order.
+    """
+    runs = {}
+    with open(path, "r") as manifest_file:
+        for line in manifest_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a crash can leave a partially written last line
+                logger.warning(f"Skipping malformed manifest line: {line}")
+                continue
+            runs[record["run_key"]] = record
+    return runs
+
+
+def read_completed_runs(path: str) -> List[Dict[str, Any]]:
+    """
+    Return the latest record of every completed run in a manifest.
+
+    Returns:
+        list: manifest records of completed runs.
+    """
+    return [
+        record for record in load_manifest(path).values()
+        if record["event"] == COMPLETED
+    ]
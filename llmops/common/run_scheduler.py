@@ -0,0 +1,256 @@
+"""
+Bounded-concurrency scheduler for Prompt Flow bulk runs.
+
+This module submits a matrix of Prompt Flow runs to AML at once,
+keeping at most a configured number of them in flight, and collects
+details and metrics for each run as soon as it finishes. In-flight runs
+are tracked together by a single RunCompletionWaiter polling loop.
+"""
+
+import collections
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from promptflow.entities import Run
+
+from llmops.common.logger import llmops_logger
+from llmops.common.run_manifest import RunManifest
+from llmops.common.run_waiter import (
+    RunCompletionWaiter,
+    RunDetailsError,
+    RunWaitResult,
+)
+from llmops.common.tracing import RUN_NAME_ATTRIBUTE, Tracer
+
+logger = llmops_logger("run_scheduler")
+
+
+@dataclass
+class ScheduledRun:
+    """
+    A Prompt Flow run together with the metadata used for reporting.
+
+    Args:
+        run (Run): the run definition to submit.
+        metadata (dict): free-form values (dataset, variant, rule, ...)
+        carried alongside the run and used when building reports.
+        run_key (str, optional): identifier of the run inputs, used by the
+        run cache and the run manifest. Runs without key, e.g. evaluation
+        runs, are not recorded in the manifest.
+        existing_run_name (str, optional): name of an earlier run with the
+        same inputs, either completed or still in progress. It is tracked
+        instead of submitting run.
+    """
+
+    run: Run
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    run_key: Optional[str] = None
+    existing_run_name: Optional[str] = None
+    job: Optional[Run] = None
+    details: Any = None
+    metrics: Optional[Dict[str, Any]] = None
+    waited_seconds: Optional[float] = None
+    submitted_at: Optional[float] = None
+    submit_seconds: Optional[float] = None
+
+
+class RunScheduler:
+    """
+    Submit and track many Prompt Flow runs with bounded concurrency.
+
+    Args:
+        pf: Prompt Flow client used for submission and result download.
+        max_concurrent_runs (int): maximum number of runs in flight.
+        fetch_details (bool): download run details once a run completes.
+        fetch_metrics (bool): download run metrics once a run completes.
+        manifest (RunManifest, optional): manifest appended after every
+        keyed run submission and completion.
+        tracer (Tracer, optional): tracer receiving the submission, queueing,
+        execution and download spans of every run.
+        waiter_options: keyword arguments for RunCompletionWaiter.
+    """
+
+    def __init__(
+        self,
+        pf,
+        max_concurrent_runs: int = 4,
+        fetch_details: bool = True,
+        fetch_metrics: bool = True,
+        manifest: Optional[RunManifest] = None,
+        tracer: Optional[Tracer] = None,
+        **waiter_options,
+    ):
+        if max_concurrent_runs < 1:
+            raise ValueError("max_concurrent_runs must be at least 1")
+        self.pf = pf
+        self.max_concurrent_runs = max_concurrent_runs
+        self.fetch_details = fetch_details
+        self.fetch_metrics = fetch_metrics
+        self.manifest = manifest
+        self.tracer = tracer or Tracer("run_scheduler")
+        self.waiter_options = waiter_options
+
+    def _submit(self, scheduled: ScheduledRun):
+        """
+        Submit a single run without waiting for it.
+
+        Runs with an existing_run_name are not submitted, the existing run
+        is tracked instead.
+
+        Returns:
+            None
+        """
+        scheduled.submitted_at = time.time()
+        if scheduled.existing_run_name is not None:
+            scheduled.job = self.pf.runs.get(scheduled.existing_run_name)
+            logger.info(f"{scheduled.job.name} re-attached")
+        else:
+            scheduled.job = self.pf.runs.create_or_update(scheduled.run)
+            logger.info(f"{scheduled.job.name} submitted")
+        scheduled.submit_seconds = time.time() - scheduled.submitted_at
+        if self.manifest is not None and scheduled.run_key is not None:
+            self.manifest.record_submitted(
+                scheduled.run_key, scheduled.job.name, scheduled.metadata
+            )
+
+    def _record(self, scheduled: ScheduledRun, result: RunWaitResult):
+        """
+        Append the outcome of a keyed run to the manifest.
+
+        Returns:
+            None
+        """
+        if self.manifest is not None and scheduled.run_key is not None:
+            record = (
+                self.manifest.record_completed if result.completed
+                else self.manifest.record_failed
+            )
+            record(scheduled.run_key, result.name, scheduled.metadata)
+
+    def _collect(self, scheduled: ScheduledRun, result: RunWaitResult):
+        """
+        Record the waiter outcome of a run and download its metrics.
+
+        Returns:
+            None
+        """
+        self._record(scheduled, result)
+        if not result.completed:
+            raise Exception(
+                f"Sorry, run {result.name} failed with {result.status}.."
+            )
+        scheduled.job = result.run
+        scheduled.waited_seconds = result.waited_seconds
+        if self.fetch_details:
+            scheduled.details = result.details
+        metrics_started = time.time()
+        if self.fetch_metrics:
+            scheduled.metrics = self.pf.get_metrics(result.run)
+        self._trace_run(scheduled, result, metrics_started)
+
+    def _trace_run(self, scheduled: ScheduledRun, result: RunWaitResult,
+                   metrics_started: float):
+        """
+        Record the phases of a finished run as spans.
+
+        Queueing and execution boundaries are observed by the waiter, so
+        they are only as precise as its polling interval.
+
+        Returns:
+            None
+        """
+        attributes = {RUN_NAME_ATTRIBUTE: result.name, "run.status": result.status}
+        attributes.update(
+            {f"run.{key}": value for key, value in scheduled.metadata.items()
+             if isinstance(value, (str, int, float, bool))}
+        )
+        end = time.time()
+        run_span = self.tracer.record_span(
+            "run", scheduled.submitted_at, end, **attributes
+        )
+        terminal_at = result.terminal_at or result.finished_at
+        running_at = result.running_at or terminal_at
+        phases = [
+            ("run.submit", scheduled.submitted_at,
+             scheduled.submitted_at + scheduled.submit_seconds),
+            ("run.queue", result.tracked_at, running_at),
+            ("run.execute", running_at, terminal_at),
+            ("run.details_download", terminal_at, result.finished_at),
+            ("run.metrics_download", metrics_started, end),
+        ]
+        for name, start, stop in phases:
+            self.tracer.record_span(
+                name, start, stop, parent_id=run_span.span_id,
+                **{RUN_NAME_ATTRIBUTE: result.name}
+            )
+
+    def run_all(
+        self,
+        scheduled_runs: Iterable[ScheduledRun],
+        follow_up: Optional[
+            Callable[[ScheduledRun], Iterable[ScheduledRun]]
+        ] = None,
+    ) -> Iterator[ScheduledRun]:
+        """
+        Submit every run and yield each one as soon as it completes.
+
+        Runs are submitted while fewer than max_concurrent_runs are in
+        flight, and all in-flight runs are polled in a single loop. The
+        first failed run stops the scheduler and the error is raised.
+
+        Args:
+            scheduled_runs (Iterable[ScheduledRun]): runs to submit.
+            follow_up (callable, optional): called with every completed
+            run, returns runs depending on it, e.g. its evaluation runs.
+            They are submitted ahead of the runs still pending and yielded
+            as well once they complete.
+
+        Returns:
+            Iterator[ScheduledRun]: completed runs in completion order.
+        """
+        pending = collections.deque(scheduled_runs)
+        logger.info(
+            f"Scheduling {len(pending)} runs with at most "
+            f"{self.max_concurrent_runs} in flight"
+        )
+        waiter = RunCompletionWaiter(
+            self.pf,
+            fetch_details=self.fetch_details,
+            **self.waiter_options,
+        )
+        # several scheduled runs can resolve to the same existing run, e.g.
+        # a cache hit reused for two variants, so runs in flight are keyed
+        # by their scheduling index and the run is tracked once for all.
+        in_flight: Dict[int, ScheduledRun] = {}
+        by_name: Dict[str, list] = collections.defaultdict(list)
+        index = 0
+        while pending or in_flight:
+            while pending and len(in_flight) < self.max_concurrent_runs:
+                scheduled = pending.popleft()
+                self._submit(scheduled)
+                in_flight[index] = scheduled
+                if not by_name[scheduled.job.name]:
+                    waiter.track(scheduled.job.name)
+                by_name[scheduled.job.name].append(index)
+                index += 1
+
+            try:
+                finished = waiter.wait_next()
+                failure = None
+            except RunDetailsError as error:
+                # the runs that finished earlier in the same poll are
+                # collected before the failure stops the scheduler
+                finished = error.finished
+                failure = error
+            for result in finished:
+                for scheduled_index in by_name.pop(result.name):
+                    scheduled = in_flight.pop(scheduled_index)
+                    self._collect(scheduled, result)
+                    if follow_up is not None:
+                        pending.extendleft(reversed(list(follow_up(scheduled))))
+                    yield scheduled
+            if failure is not None:
+                for scheduled_index in by_name.pop(failure.result.name):
+                    self._record(in_flight.pop(scheduled_index), failure.result)
+                raise failure
@@ -0,0 +1,268 @@
+"""
+Adaptive completion waiter for Prompt Flow runs.
+
+This module polls the status of one or many Prompt Flow runs in a single
+loop using exponential backoff with jitter. A run is only reported as done
+once it reached a terminal state and, for completed runs, once its details
+can be downloaded. The time each run spent waiting is recorded. A completed
+run whose details still cannot be downloaded after max_details_attempts is
+reported as failed with the last download error.
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("run_waiter")
+
+COMPLETED_STATUSES = ("Completed", "Finished")
+FAILED_STATUSES = ("Failed", "Canceled", "Cancelled")
+QUEUED_STATUSES = (
+    "NotStarted", "Queued", "Preparing", "Provisioning", "Starting"
+)
+
+
+class RunDetailsError(RuntimeError):
+    """
+    Raised when the details of a completed run cannot be downloaded.
+
+    Args:
+        result (RunWaitResult): the run, finished as failed.
+        finished (List[RunWaitResult]): the other runs that finished in the
+        same poll.
+    """
+
+    def __init__(self, message: str, result, finished):
+        super().__init__(message)
+        self.result = result
+        self.finished = finished
+
+
+@dataclass
+class RunWaitResult:
+    """
+    Outcome of waiting for a single run.
+
+    Args:
+        name (str): run name.
+        status (str): last observed run status.
+        run: the run object returned by the last status poll.
+        details: run details, downloaded once the run completed.
+        waited_seconds (float): time between tracking and completion.
+        polls (int): number of status polls issued for the run.
+        tracked_at (float): unix time the waiter started tracking the run.
+        running_at (float, optional): unix time the run was first seen
+        running, None if it was never observed running.
+        terminal_at (float, optional): unix time the run was first seen in
+        a terminal state.
+        finished_at (float, optional): unix time the run was reported done,
+        after its details were downloaded.
+    """
+
+    name: str
+    status: str
+    run: Any = None
+    details: Any = None
+    waited_seconds: float = 0.0
+    polls: int = 0
+    tracked_at: Optional[float] = None
+    running_at: Optional[float] = None
+    terminal_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def completed(self) -> bool:
+        """Return True if the run finished successfully."""
+        return self.status in COMPLETED_STATUSES
+
+
+@dataclass
+class _TrackedRun:
+    name: str
+    started: float
+    next_poll: float
+    delay: float
+    polls: int = 0
+    status: str = "NotStarted"
+    run: Any = None
+    details_attempts: int = 0
+    tracked_at: Optional[float] = None
+    running_at: Optional[float] = None
+    terminal_at: Optional[float] = None
+
+
+class RunCompletionWaiter:
+    """
+    Poll many runs in one loop until each of them is done.
+
+    Args:
+        pf: Prompt Flow client used to query run status and details.
+        initial_delay (float): seconds between the first polls of a run.
+        max_delay (float): upper bound for the delay between polls.
+        multiplier (float): backoff factor applied after every poll.
+        jitter (float): relative random spread applied to each delay.
+        timeout (float, optional): maximum seconds to wait for any run.
+        fetch_details (bool): keep polling completed runs until their
+        details can be downloaded.
+        max_details_attempts (int): downloads of the details of a completed
+        run before it is reported as failed.
+    """
+
+    def __init__(
+        self,
+        pf,
+        initial_delay: float = 2.0,
+        max_delay: float = 60.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.25,
+        timeout: Optional[float] = None,
+        fetch_details: bool = True,
+        max_details_attempts: int = 10,
+    ):
+        self.pf = pf
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.timeout = timeout
+        self.fetch_details = fetch_details
+        self.max_details_attempts = max_details_attempts
+        self._tracked: Dict[str, _TrackedRun] = {}
+
+    @property
+    def pending(self) -> int:
+        """Return the number of runs still being waited for."""
+        return len(self._tracked)
+
+    def track(self, run_name: str):
+        """
+        Start waiting for a run. The first poll happens immediately.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        self._tracked[run_name] = _TrackedRun(
+            name=run_name,
+            started=now,
+            next_poll=now,
+            delay=self.initial_delay,
+            tracked_at=time.time(),
+        )
+
+    def _schedule_next_poll(self, tracked: _TrackedRun, now: float):
+        spread = random.uniform(1 - self.jitter, 1 + self.jitter)
+        tracked.next_poll = now + tracked.delay * spread
+        tracked.delay = min(self.max_delay, tracked.delay * self.multiplier)
+
+    def _finish(self, tracked: _TrackedRun, now: float, details=None):
+        del self._tracked[tracked.name]
+        result = RunWaitResult(
+            name=tracked.name,
+            status=tracked.status,
+            run=tracked.run,
+            details=details,
+            waited_seconds=now - tracked.started,
+            polls=tracked.polls,
+            tracked_at=tracked.tracked_at,
+            running_at=tracked.running_at,
+            terminal_at=tracked.terminal_at,
+            finished_at=time.time(),
+        )
+        logger.info(
+            f"{result.name} {result.status} after waiting "
+            f"{result.waited_seconds:.1f}s ({result.polls} polls)"
+        )
+        return result
+
+    def poll(self) -> List[RunWaitResult]:
+        """
+        Poll every run that is due and return the ones that are done.
+
+        Returns:
+            List[RunWaitResult]: runs that finished during this poll.
+        """
+        finished = []
+        for tracked in list(self._tracked.values()):
+            now = time.monotonic()
+            if tracked.next_poll > now:
+                continue
+            if self.timeout is not None and now - tracked.started > self.timeout:
+                raise TimeoutError(
+                    f"Run {tracked.name} did not finish within "
+                    f"{self.timeout}s (last status {tracked.status})"
+                )
+
+            tracked.polls += 1
+            tracked.run = self.pf.runs.get(tracked.name)
+            tracked.status = tracked.run.status
+            terminal = tracked.status in FAILED_STATUSES + COMPLETED_STATUSES
+            if (
+                tracked.running_at is None
+                and tracked.status not in QUEUED_STATUSES
+                and not terminal
+            ):
+                tracked.running_at = time.time()
+            if terminal and tracked.terminal_at is None:
+                tracked.terminal_at = time.time()
+
+            if tracked.status in FAILED_STATUSES:
+                finished.append(self._finish(tracked, time.monotonic()))
+            elif tracked.status in COMPLETED_STATUSES:
+                if not self.fetch_details:
+                    finished.append(self._finish(tracked, time.monotonic()))
+                    continue
+                tracked.details_attempts += 1
+                try:
+                    details = self.pf.get_details(tracked.run)
+                except Exception as ex:
+                    if tracked.details_attempts >= self.max_details_attempts:
+                        tracked.status = "Failed"
+                        result = self._finish(tracked, time.monotonic())
+                        raise RunDetailsError(
+                            f"Details of run {tracked.name} could not be "
+                            f"downloaded after {tracked.details_attempts} "
+                            f"attempts: {ex}",
+                            result,
+                            finished,
+                        ) from ex
+                    logger.info(f"{tracked.name} details not ready yet: {ex}")
+                    self._schedule_next_poll(tracked, time.monotonic())
+                    continue
+                finished.append(self._finish(tracked, time.monotonic(), details))
+            else:
+                self._schedule_next_poll(tracked, now)
+        return finished
+
+    def wait_next(self) -> List[RunWaitResult]:
+        """
+        Block until at least one tracked run is done.
+
+        Returns:
+            List[RunWaitResult]: runs that finished, empty if none tracked.
+        """
+        while self._tracked:
+            finished = self.poll()
+            if finished:
+                return finished
+            next_poll = min(t.next_poll for t in self._tracked.values())
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+        return []
+
+    def wait_all(self, run_names: Iterable[str]) -> Dict[str, RunWaitResult]:
+        """
+        Track the given runs and block until all of them are done.
+
+        Returns:
+            Dict[str, RunWaitResult]: results keyed by run name.
+        """
+        for run_name in run_names:
+            self.track(run_name)
+        results = {}
+        while self._tracked:
+            for result in self.wait_next():
+                results[result.name] = result
+        return results
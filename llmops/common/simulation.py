@@ -0,0 +1,248 @@
+"""
+Offline simulation of the Prompt Flow and AML clients.
+
+SimulatedPFClient and SimulatedMLClient implement the subset of PFClient
+and MLClient used by prompt_pipeline and prompt_eval. Runs move through
+NotStarted, Running and a terminal state on the wall clock, following
+latencies drawn from configurable lognormal distributions, and fail with a
+configurable probability. Details are synthetic data frames of a
+configurable size. No Azure access is needed, which allows measuring the
+orchestration code without spending workspace quota.
+"""
+
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("simulation")
+
+NODE_VARIANT_PROPERTY = "azureml.promptflow.node_variant"
+
+
+@dataclass
+class SimulationConfig:
+    """
+    Behaviour of the simulated workspace.
+
+    Args:
+        submit_latency (float): mean seconds a run submission takes.
+        queue_latency (float): mean seconds a run waits before running.
+        execute_latency (float): mean seconds a run is running.
+        details_latency (float): mean seconds after completion before the
+        details of a run can be downloaded.
+        latency_sigma (float): sigma of the lognormal latency distributions,
+        0 makes every latency equal to its mean.
+        failure_rate (float): probability of a run ending Failed.
+        detail_rows (int): rows of the details of every run.
+        detail_chars (int): characters of the text column of every row.
+        seed (int, optional): seed of the random generator.
+    """
+
+    submit_latency: float = 0.05
+    queue_latency: float = 0.5
+    execute_latency: float = 2.0
+    details_latency: float = 0.0
+    latency_sigma: float = 0.5
+    failure_rate: float = 0.0
+    detail_rows: int = 100
+    detail_chars: int = 200
+    seed: Optional[int] = None
+
+
+class SimulatedRun:
+    """
+    A run whose status follows a precomputed timeline.
+
+    Args:
+        run: the submitted promptflow Run entity.
+        created_at (float): unix time of the submission.
+        queue_seconds (float): seconds spent queued.
+        execute_seconds (float): seconds spent running.
+        details_seconds (float): seconds until details are available.
+        failed (bool): whether the run ends Failed.
+    """
+
+    def __init__(self, run, created_at: float, queue_seconds: float,
+                 execute_seconds: float, details_seconds: float,
+                 failed: bool):
+        self.name = run.name
+        self.display_name = getattr(run, "display_name", None) or run.name
+        self.flow = getattr(run, "flow", None)
+        self.data = getattr(run, "data", None)
+        self.variant = getattr(run, "variant", None)
+        self.column_mapping = getattr(run, "column_mapping", None)
+        self.tags = dict(getattr(run, "tags", None) or {})
+        parent = getattr(run, "run", None)
+        self.run = getattr(parent, "name", parent)
+        self.properties = {}
+        if self.variant:
+            self.properties[NODE_VARIANT_PROPERTY] = self.variant
+        self.created_at = created_at
+        self.queue_seconds = queue_seconds
+        self.execute_seconds = execute_seconds
+        self.details_seconds = details_seconds
+        self.failed = failed
+
+    @property
+    def service_seconds(self) -> float:
+        """Return the seconds the service spends on the run."""
+        return self.queue_seconds + self.execute_seconds
+
+    @property
+    def terminal_at(self) -> float:
+        """Return the unix time the run reaches a terminal state."""
+        return self.created_at + self.service_seconds
+
+    @property
+    def status(self) -> str:
+        """Return the status of the run at the current time."""
+        now = time.time()
+        if now < self.created_at + self.queue_seconds:
+            return "NotStarted"
+        if now < self.terminal_at:
+            return "Running"
+        return "Failed" if self.failed else "Completed"
+
+
+class _SimulatedRuns:
+    def __init__(self, client: "SimulatedPFClient"):
+        self._client = client
+
+    def create_or_update(self, run, stream: bool = False, **kwargs):
+        return self._client._submit(run, stream)
+
+    def get(self, name: str):
+        self._client.status_calls += 1
+        return self._client._run(name)
+
+    def list(self, max_results: int = 50, **kwargs):
+        with self._client._lock:
+            runs = list(self._client.runs_by_name.values())
+        runs.sort(key=lambda run: run.created_at, reverse=True)
+        return runs[:max_results]
+
+
+class _SimulatedData:
+    def __init__(self):
+        self.versions: Dict[str, int] = {}
+        self.calls = 0
+
+    def get(self, name: str, label: Optional[str] = None,
+            version: Optional[str] = None):
+        self.calls += 1
+        return SimpleNamespace(
+            name=name, version=str(version or self.versions.get(name, 1))
+        )
+
+    def create_or_update(self, data):
+        self.calls += 1
+        version = self.versions.get(data.name, 0) + 1
+        self.versions[data.name] = version
+        return SimpleNamespace(name=data.name, version=str(version))
+
+
+class SimulatedMLClient:
+    """MLClient stand-in resolving every data asset to a version."""
+
+    def __init__(self):
+        self.data = _SimulatedData()
+
+
+class SimulatedPFClient:
+    """
+    PFClient stand-in whose runs follow simulated latencies.
+
+    Args:
+        config (SimulationConfig, optional): behaviour of the simulation.
+        ml_client (SimulatedMLClient, optional): client of the data assets.
+    """
+
+    def __init__(self, config: Optional[SimulationConfig] = None,
+                 ml_client: Optional[SimulatedMLClient] = None):
+        self.config = config or SimulationConfig()
+        self.ml_client = ml_client or SimulatedMLClient()
+        self.runs = _SimulatedRuns(self)
+        self.runs_by_name: Dict[str, SimulatedRun] = {}
+        self.status_calls = 0
+        self.details_calls = 0
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    def _latency(self, mean: float) -> float:
+        sigma = self.config.latency_sigma
+        if mean <= 0 or sigma <= 0:
+            return max(0.0, mean)
+        # mu of the lognormal distribution with the requested mean
+        return self._random.lognormvariate(
+            math.log(mean) - sigma ** 2 / 2, sigma
+        )
+
+    def _submit(self, run, stream: bool) -> SimulatedRun:
+        with self._lock:
+            if run.name in self.runs_by_name:
+                # the service rejects the name of an existing run
+                raise Exception(f"Run name {run.name!r} already exists")
+            submit_seconds = self._latency(self.config.submit_latency)
+            simulated = SimulatedRun(
+                run,
+                created_at=time.time() + submit_seconds,
+                queue_seconds=self._latency(self.config.queue_latency),
+                execute_seconds=self._latency(self.config.execute_latency),
+                details_seconds=self._latency(self.config.details_latency),
+                failed=self._random.random() < self.config.failure_rate,
+            )
+            self.runs_by_name[simulated.name] = simulated
+        time.sleep(submit_seconds)
+        if stream:
+            time.sleep(max(0.0, simulated.terminal_at - time.time()))
+        return simulated
+
+    def _run(self, name: str) -> SimulatedRun:
+        try:
+            return self.runs_by_name[name]
+        except KeyError:
+            raise Exception(f"Run {name} not found") from None
+
+    @property
+    def simulated_runs(self) -> List[SimulatedRun]:
+        """Return every run submitted to the simulation."""
+        with self._lock:
+            return list(self.runs_by_name.values())
+
+    def get_details(self, run) -> pd.DataFrame:
+        """Return synthetic details once the run completed."""
+        self.details_calls += 1
+        run = self._run(getattr(run, "name", run))
+        if run.status != "Completed":
+            raise Exception(f"Run {run.name} is {run.status}")
+        if time.time() < run.terminal_at + run.details_seconds:
+            raise Exception(f"Details of {run.name} are not available yet")
+        rows = self.config.detail_rows
+        rng = random.Random(run.name)
+        text = "x" * self.config.detail_chars
+        return pd.DataFrame(
+            {
+                "inputs.line_number": range(rows),
+                "inputs.query": [text] * rows,
+                "outputs.violation": [
+                    str(rng.random() < 0.5) for _ in range(rows)
+                ],
+            }
+        )
+
+    def get_metrics(self, run) -> Dict[str, float]:
+        """Return synthetic metrics of a run."""
+        run = self._run(getattr(run, "name", run))
+        rng = random.Random(run.name)
+        return {
+            "accuracy": round(rng.uniform(0.5, 1.0), 4),
+            "f1_score": round(rng.uniform(0.5, 1.0), 4),
+        }
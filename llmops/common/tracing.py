@@ -0,0 +1,265 @@
+"""
+Lightweight span tracing for the experiment and evaluation pipelines.
+
+Spans are recorded in memory and exported to a local JSON file following
+the OpenTelemetry OTLP/JSON layout (resourceSpans/scopeSpans/spans), which
+can be loaded by OpenTelemetry tooling. A summary of where time went per
+phase and per run can be logged at the end of a job.
+"""
+
+import contextlib
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from llmops.common.logger import llmops_logger
+
+logger = llmops_logger("tracing")
+
+RUN_NAME_ATTRIBUTE = "run.name"
+
+
+@dataclass
+class Span:
+    """
+    A finished or in-progress span.
+
+    Args:
+        name (str): phase name, e.g. "data_asset_lookup" or "run.execute".
+        span_id (str): 16 hex characters span identifier.
+        parent_id (str, optional): identifier of the parent span.
+        start_ns (int): start time in unix nanoseconds.
+        end_ns (int, optional): end time in unix nanoseconds.
+        attributes (dict): span attributes.
+        error (str, optional): error message if the span failed.
+    """
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Return the span duration in seconds."""
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    """
+    Record spans of one job and export them.
+
+    Args:
+        service_name (str): name reported as the service.name resource.
+        trace_file (str, optional): file the spans are exported to.
+    """
+
+    def __init__(self, service_name: str, trace_file: Optional[str] = None):
+        self.service_name = service_name
+        self.trace_file = trace_file
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @property
+    def current_span_id(self) -> Optional[str]:
+        """Return the id of the innermost active span of this thread."""
+        stack = self._stack()
+        return stack[-1].span_id if stack else None
+
+    def _add(self, span: Span) -> Span:
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Time a block of code as a span nested in the active span.
+
+        Returns:
+            Span: the recorded span.
+        """
+        span = self._add(
+            Span(
+                name=name,
+                span_id=secrets.token_hex(8),
+                parent_id=self.current_span_id,
+                start_ns=time.time_ns(),
+                attributes=attributes,
+            )
+        )
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except Exception as ex:
+            span.error = str(ex)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            stack.pop()
+
+    def record_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        parent_id: Optional[str] = None,
+        **attributes,
+    ) -> Span:
+        """
+        Record a span measured elsewhere, e.g. from run status timestamps.
+
+        Args:
+            name (str): phase name.
+            start (float): start time in unix seconds.
+            end (float): end time in unix seconds.
+            parent_id (str, optional): parent span, defaults to the
+            active span of this thread.
+
+        Returns:
+            Span: the recorded span.
+        """
+        return self._add(
+            Span(
+                name=name,
+                span_id=secrets.token_hex(8),
+                parent_id=parent_id or self.current_span_id,
+                start_ns=int(start * 1e9),
+                end_ns=int(end * 1e9),
+                attributes=attributes,
+            )
+        )
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Return the spans in the OTLP/JSON layout."""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or time.time_ns()),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)}
+                    for key, value in span.attributes.items()
+                ],
+                "status": (
+                    {"code": 2, "message": span.error}
+                    if span.error is not None else {"code": 1}
+                ),
+            }
+            if span.parent_id is not None:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "llmops"}, "spans": spans}
+                    ],
+                }
+            ]
+        }
+
+    def export(self):
+        """
+        Write the spans to trace_file, if configured.
+
+        Returns:
+            None
+        """
+        if self.trace_file is None:
+            return
+        trace_dir = os.path.dirname(self.trace_file)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+        with open(self.trace_file, "w") as trace:
+            json.dump(self.to_otlp(), trace)
+        logger.info(f"Saved {len(self.spans)} spans in {self.trace_file}")
+
+    def summary(self) -> str:
+        """
+        Build text tables of time spent per phase and per run.
+
+        Returns:
+            str: the formatted summary.
+        """
+        phases: Dict[str, List[float]] = {}
+        runs: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            phases.setdefault(span.name, []).append(span.duration)
+            run_name = span.attributes.get(RUN_NAME_ATTRIBUTE)
+            if run_name is not None:
+                run_phases = runs.setdefault(run_name, {})
+                run_phases[span.name] = \
+                    run_phases.get(span.name, 0.0) + span.duration
+
+        lines = [f"{'phase':<32}{'count':>7}{'total_s':>11}{'max_s':>10}"]
+        for name, durations in phases.items():
+            lines.append(
+                f"{name:<32}{len(durations):>7}"
+                f"{sum(durations):>11.1f}{max(durations):>10.1f}"
+            )
+
+        run_phase_names = sorted({n for p in runs.values() for n in p})
+        if runs:
+            lines.append("")
+            lines.append(
+                f"{'run':<48}"
+                + "".join(f"{name:>16}" for name in run_phase_names)
+            )
+            for run_name, run_phases in runs.items():
+                lines.append(
+                    f"{run_name[:47]:<48}"
+                    + "".join(
+                        f"{run_phases.get(name, 0.0):>16.1f}"
+                        for name in run_phase_names
+                    )
+                )
+        return "\n".join(lines)
+
+    def finish(self):
+        """
+        Export the spans and log the summary.
+
+        Returns:
+            None
+        """
+        self.export()
+        logger.info("Time spent per phase and per run:\n" + self.summary())
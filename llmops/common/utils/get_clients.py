@@ -1,35 +1,144 @@
+"""
+Process-wide Azure credential and client pool.
+
+Credentials and clients are created once per process and shared by every
+caller. Setting the LLMOPS_TOKEN_CACHE environment variable to a file path
+additionally caches access tokens on disk, so the CI steps of one build
+authenticate once instead of once per step. The cache file holds bearer
+tokens: point it at a build-scoped temporary location only.
+"""
+
+import json
+import os
+import threading
+import time
+
 from azure.ai.ml import MLClient
+from azure.core.credentials import AccessToken
 from azure.identity import DefaultAzureCredential
 from azure.ai.ml._azure_environments import _get_default_cloud_name, EndpointURLS, _get_cloud, AzureEnvironments
 from promptflow.azure import PFClient
 
+TOKEN_CACHE_ENV = "LLMOPS_TOKEN_CACHE"
+# tokens expiring sooner than this are refreshed
+TOKEN_REFRESH_MARGIN = 300
+
+_lock = threading.RLock()
+_credential = None
+_ml_clients = {}
+_pf_clients = {}
+
+
+class CachedTokenCredential:
+    """
+    Credential wrapper caching access tokens in memory and optionally on disk.
+
+    Args:
+        credential: the credential used to acquire new tokens.
+        cache_file (str, optional): file shared between processes of a build.
+    """
+
+    def __init__(self, credential, cache_file=None):
+        self._credential = credential
+        self._cache_file = cache_file
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def _read_disk_cache(self):
+        if not self._cache_file or not os.path.exists(self._cache_file):
+            return {}
+        try:
+            with open(self._cache_file, "r") as cache:
+                return json.load(cache)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_disk_cache(self, key, token):
+        if not self._cache_file:
+            return
+        entries = self._read_disk_cache()
+        entries[key] = {"token": token.token, "expires_on": token.expires_on}
+        temp_file = f"{self._cache_file}.{os.getpid()}.tmp"
+        file_descriptor = os.open(
+            temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(file_descriptor, "w") as cache:
+            json.dump(entries, cache)
+        os.replace(temp_file, self._cache_file)
+
+    def get_token(self, *scopes, **kwargs):
+        """Return a cached token for the scopes or acquire a new one."""
+        if kwargs.get("claims"):
+            return self._credential.get_token(*scopes, **kwargs)
+
+        key = json.dumps([sorted(scopes), kwargs.get("tenant_id")])
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None:
+                entry = self._read_disk_cache().get(key)
+                if entry is not None:
+                    token = AccessToken(entry["token"], entry["expires_on"])
+            if token is None or token.expires_on - TOKEN_REFRESH_MARGIN < time.time():
+                token = self._credential.get_token(*scopes, **kwargs)
+                self._write_disk_cache(key, token)
+            self._tokens[key] = token
+            return token
+
+    def close(self):
+        """Close the wrapped credential."""
+        close = getattr(self._credential, "close", None)
+        if close is not None:
+            close()
+
+
 def get_credential():
-    cloud_name = _get_default_cloud_name()
-    if cloud_name != AzureEnvironments.ENV_DEFAULT:
-        cloud = _get_cloud(cloud=cloud_name)
-        authority = cloud.get(EndpointURLS.ACTIVE_DIRECTORY_ENDPOINT)
-        credential = DefaultAzureCredential(authority=authority, exclude_shared_token_cache_credential=True)
-    else:
-        credential = DefaultAzureCredential()
-        
-    return credential
+    """Return the process-wide credential, creating it on first use."""
+    global _credential
+    with _lock:
+        if _credential is not None:
+            return _credential
+
+        cloud_name = _get_default_cloud_name()
+        if cloud_name != AzureEnvironments.ENV_DEFAULT:
+            cloud = _get_cloud(cloud=cloud_name)
+            authority = cloud.get(EndpointURLS.ACTIVE_DIRECTORY_ENDPOINT)
+            credential = DefaultAzureCredential(authority=authority, exclude_shared_token_cache_credential=True)
+        else:
+            credential = DefaultAzureCredential()
+
+        _credential = CachedTokenCredential(
+            credential, os.environ.get(TOKEN_CACHE_ENV)
+        )
+        return _credential
+
 
 def get_ml_client(subscription_id, resource_group_name, workspace_name):
-    ml_client = MLClient(
-        get_credential(),
-        subscription_id,
-        resource_group_name,
-        workspace_name
-    )
+    """Return the shared MLClient of a workspace."""
+    key = (subscription_id, resource_group_name, workspace_name)
+    with _lock:
+        if key not in _ml_clients:
+            _ml_clients[key] = MLClient(
+                get_credential(),
+                subscription_id,
+                resource_group_name,
+                workspace_name
+            )
+        return _ml_clients[key]
 
-    return ml_client
 
 def get_pf_client(subscription_id, resource_group_name, workspace_name):
-    pf = PFClient(
-        get_credential(),
-        subscription_id,
-        resource_group_name,
-        workspace_name
-    )
-
-    return pf
\ No newline at end of file
+    """Return the shared PFClient of a workspace."""
+    key = (subscription_id, resource_group_name, workspace_name)
+    with _lock:
+        if key not in _pf_clients:
+            # reuse the pooled MLClient instead of building a second one
+            _pf_clients[key] = PFClient(
+                get_credential(),
+                subscription_id,
+                resource_group_name,
+                workspace_name,
+                ml_client=get_ml_client(
+                    subscription_id, resource_group_name, workspace_name
+                ),
+            )
+        return _pf_clients[key]
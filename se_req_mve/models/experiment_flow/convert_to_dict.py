@@ -7,19 +7,51 @@ from utils.logger import llmops_logger
 logger = llmops_logger()
 
 
+def is_violation(verdict) -> bool:
+    return str(verdict).lower() in [
+        "yes",
+        "correct",
+        "true",
+    ]
+
+
 @tool
 def convert_to_dict(input_str: str) -> dict:
-    """Converts the raw text output from the LLM into a dictionary."""
+    """Converts the raw text output from the LLM into a dictionary.
+
+    A verdict map keyed by rule ID, as returned by multi-rule variants,
+    or a verdict array with requirement IDs, as returned by packed
+    variants, is parsed into "violations", and "violation" is True if any
+    verdict is a violation."""
     try:
         response = json.loads(input_str)
-        assert "violation" in response
-        response["violation"] = response["violation"].lower() in [
-            "yes",
-            "correct",
-            "true",
-        ]
-        return response
+        if isinstance(response, list):
+            # packed prompts answer with one verdict per requirement ID,
+            # malformed items are left out to be retried
+            violations = {
+                str(item["id"]): is_violation(item["violation"])
+                for item in response
+                if isinstance(item, dict) and "id" in item and "violation" in item
+            }
+            return {"violation": any(violations.values()), "violations": violations}
+
+        if "violation" in response:
+            response["violation"] = is_violation(response["violation"])
+            response["violations"] = {}
+            return response
+
+        assert response and all(
+            isinstance(verdict, (str, bool)) for verdict in response.values()
+        )
+        violations = {
+            rule_id: is_violation(verdict) for rule_id, verdict in response.items()
+        }
+        return {"violation": any(violations.values()), "violations": violations}
 
     except Exception as e:
         logger.error("The input is not valid, error: {}".format(e))
-        return {"violation": None, "reason": "Failed to parse LLM output."}
\ No newline at end of file
+        return {
+            "violation": None,
+            "violations": None,
+            "reason": "Failed to parse LLM output.",
+        }
@@ -0,0 +1,122 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from numpy import percentile
+
+
+class CallTimer:
+    """Times the attempts of one LLM call: the queue wait until the call is
+    admitted by the in-flight semaphore and the rate limiter, then the
+    request latency."""
+
+    def __init__(self):
+        self.queue_wait = 0.0
+        self.latency = 0.0
+        self.attempts = 0
+        self._mark = time.monotonic()
+
+    def queued(self):
+        self._mark = time.monotonic()
+
+    def sent(self):
+        now = time.monotonic()
+        self.queue_wait += now - self._mark
+        self._mark = now
+
+    def done(self):
+        self.latency += time.monotonic() - self._mark
+        self.attempts += 1
+
+
+class CallStats:
+    """Records every LLM call of an experiment and aggregates their latency,
+    queue wait and tokens. Token counts are estimated from text lengths, as
+    flow outputs carry no token usage.
+
+    Parameters
+    ----------
+    path: Optional[str] = None
+        JSONL file the raw record of each call is appended to as it
+        completes. Records are not kept if None.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.latencies: List[float] = []
+        self.queue_waits: List[float] = []
+        self.calls = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._file = open(path, "w", buffering=1) if path else None
+
+    def record(
+        self,
+        lines: List[int],
+        replicate: int,
+        timer: Optional[CallTimer] = None,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ):
+        """Records a call of the lines at the dataset indexes `lines`, or a
+        cache hit if it has no timer."""
+        record = {
+            "lines": lines,
+            "replicate": replicate,
+            "cache_hit": timer is None,
+            "queue_wait": 0.0,
+            "latency": 0.0,
+            "retries": 0,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        if timer is None:
+            self.cache_hits += 1
+        else:
+            record.update(
+                queue_wait=timer.queue_wait,
+                latency=timer.latency,
+                retries=max(timer.attempts - 1, 0),
+            )
+            self.calls += 1
+            self.retries += record["retries"]
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.latencies.append(timer.latency)
+            self.queue_waits.append(timer.queue_wait)
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+
+    def summary(self, elapsed: float) -> Dict[str, float]:
+        """Latency and queue wait percentiles in seconds, tokens and
+        throughput over `elapsed` seconds of the calls made."""
+
+        def percentiles(name, values):
+            return {
+                f"{name}_p{q}": float(percentile(values, q)) if values else None
+                for q in (50, 95, 99)
+            }
+
+        total_tokens = self.prompt_tokens + self.completion_tokens
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            **percentiles("latency", self.latencies),
+            **percentiles("queue_wait", self.queue_waits),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": total_tokens,
+            "calls_per_second": self.calls / elapsed if elapsed else 0.0,
+            "tokens_per_second": total_tokens / elapsed if elapsed else 0.0,
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
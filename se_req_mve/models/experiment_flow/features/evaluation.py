@@ -1,5 +1,7 @@
-from typing import List
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
+from numpy import array
 from promptflow import log_metric
 from sklearn.metrics import (
     accuracy_score,
@@ -37,6 +39,61 @@ def calculate_metrics(predictions: List, truth: List) -> dict:
     return metrics
 
 
+@dataclass
+class ConfusionCounts:
+    """Running confusion-matrix counts of a replicate, updated one
+    prediction at a time so its metrics need no list of predictions.
+    Predictions without an answer are counted apart."""
+
+    tp: int = 0
+    fp: int = 0
+    fn: int = 0
+    tn: int = 0
+    unanswered: int = 0
+
+    def add(self, prediction: Optional[bool], truth):
+        if prediction is None:
+            self.unanswered += 1
+        elif bool(truth):
+            if prediction:
+                self.tp += 1
+            else:
+                self.fn += 1
+        elif prediction:
+            self.fp += 1
+        else:
+            self.tn += 1
+
+    def metrics(self) -> dict:
+        """Computes the metrics of calculate_metrics from the counts."""
+        if self.unanswered:
+            logger.warning(f"{self.unanswered} predictions without an answer")
+
+        def ratio(numerator, denominator):
+            return numerator / denominator if denominator else 0.0
+
+        # balanced accuracy averages the recall of the classes in the truth
+        positives, negatives = self.tp + self.fn, self.tn + self.fp
+        class_recalls = [
+            ratio(hits, total)
+            for hits, total in ((self.tp, positives), (self.tn, negatives))
+            if total
+        ]
+        metrics = {
+            "recall": ratio(self.tp, positives),
+            "precision": ratio(self.tp, self.tp + self.fp),
+            "f1": ratio(2 * self.tp, 2 * self.tp + self.fp + self.fn),
+            "accuracy_score": ratio(self.tp + self.tn, positives + negatives),
+            "balanced_accuracy_score": ratio(sum(class_recalls), len(class_recalls)),
+            "confusion_matrix": str(
+                array([[self.tn, self.fp], [self.fn, self.tp]])
+            ).replace("\n", ","),
+        }
+        for metric_name, val in metrics.items():
+            log_metric(metric_name, val)
+        return metrics
+
+
 def sanitize_prediction(prediction_str: str) -> bool:
     """Boolean cast on input string."""
     if isinstance(prediction_str, str):
@@ -46,3 +103,19 @@ def sanitize_prediction(prediction_str: str) -> bool:
     else:
         logger.warning(f"Got None for: {prediction_str}")
         return None
+
+
+def sanitize_predictions(
+    predictions: Dict[str, str], rule_ids: List[str]
+) -> Optional[Dict[str, bool]]:
+    """Boolean cast on each verdict of a verdict map keyed by rule ID.
+    Returns None unless every rule got a verdict."""
+    if not isinstance(predictions, dict):
+        logger.warning(f"Got no verdict map for: {predictions}")
+        return None
+    verdicts = {
+        rule_id: sanitize_prediction(predictions.get(rule_id)) for rule_id in rule_ids
+    }
+    if any(verdict is None for verdict in verdicts.values()):
+        return None
+    return verdicts
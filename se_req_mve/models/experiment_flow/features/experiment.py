@@ -1,18 +1,75 @@
+import asyncio
 import concurrent.futures
 import json
 import time as t
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from services.aoai_client import CredentialsAOAI, get_promptflow_client
 from utils.logger import llmops_logger
+from utils.rule_catalog import load_catalog
 
-from .evaluation import calculate_metrics, sanitize_prediction
-from .experiment_output import ExperimentOutput, Replicate
+from .call_stats import CallStats, CallTimer
+from .evaluation import (
+    ConfusionCounts,
+    calculate_metrics,
+    sanitize_prediction,
+    sanitize_predictions,
+)
+from .experiment_output import ExperimentOutput, Replicate, results_dir
+from .flow_files import flow_file, load_flow
+from .packing import PackingStats, make_packs, process_pack_async
+from .prediction_sink import PredictionSink
+from .rate_limiter import RateLimiter, estimate_tokens
+from .response_cache import ResponseCache, flow_fingerprint
+from .retry_policy import RetryPolicy
+from ..utils.json_validation import is_valid_experiment
+from ..utils.metrics import ci_width
 
 logger = llmops_logger()
 
 
-def process_flow(
+def _read_rules(model_path: str, input_data_path: str, rule_id: str) -> List[dict]:
+    return load_catalog(flow_file(model_path, input_data_path)).rules_for(rule_id)
+
+
+def _token_estimates(
+    model_path: str, input_data_path: str, rule_id: str, variant: str
+) -> Tuple[int, int]:
+    """Estimates the prompt tokens of a classification call without the
+    query, and its maximum completion tokens."""
+    flow = load_flow(model_path)
+    node = flow["node_variants"]["classify_with_llm"]["variants"][variant]["node"]
+    with open(flow_file(model_path, node["source"]["path"], flow)) as prompt_file:
+        template = prompt_file.read()
+    rules = _read_rules(model_path, input_data_path, rule_id)
+    return (
+        estimate_tokens(template) + estimate_tokens(json.dumps(rules)),
+        node["inputs"].get("max_tokens", 0),
+    )
+
+
+def _flow_settings(
+    model_path: str,
+    input_data_path: str,
+    rule_id: str,
+    variant: str,
+    cache: Optional[ResponseCache],
+) -> Tuple[int, int, str]:
+    """Token estimates and response cache scope of a rule and variant."""
+    prompt_tokens, completion_tokens = _token_estimates(
+        model_path, input_data_path, rule_id, variant
+    )
+    cache_scope = ""
+    if cache is not None:
+        cache_scope = ResponseCache.key(
+            flow=flow_fingerprint(model_path, variant),
+            rule=_read_rules(model_path, input_data_path, rule_id),
+        )
+    return prompt_tokens, completion_tokens, cache_scope
+
+
+async def process_flow_async(
     pf,
     line,
     query_id,
@@ -22,40 +79,399 @@ def process_flow(
     model_path,
     input_data_path,
     runs,
+    limiter: Optional[RateLimiter] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cache: Optional[ResponseCache] = None,
+    cache_scope: str = "",
     retry=5,
+    first_replicate: int = 0,
+    policy: Optional[RetryPolicy] = None,
+    call_stats: Optional[CallStats] = None,
+    line_index: int = 0,
 ):
+    """Runs the replicates of one line concurrently, each LLM call admitted
+    by the rate limiter and counted against the in-flight calls semaphore.
+    Failed calls are retried by the retry policy and unparsable answers
+    are asked again up to `retry` times.
+    Responses already in the cache for the same flow, rule, query and
+    replicate index are reused without calling the LLM.
+    Each call of a replicate, or its cache hit, is recorded in `call_stats`
+    for the line at `line_index` in the dataset.
+
+    A comma-separated `rule_id` classifies the line against all the rules
+    in a single call and each result is a verdict map keyed by rule."""
+    limiter = limiter or RateLimiter()
+    semaphore = semaphore or asyncio.Semaphore(runs)
+    policy = policy or RetryPolicy()
+    rule_ids = rule_id.split(",")
     inputs = {
         "query": line[f"{query_id}"],
-        "truth": line[f"{rule_id}"],
+        "truth": any(line[r] for r in rule_ids),
         "rule_id": rule_id,
         "data_file": input_data_path,
     }
-    results = []
 
-    while len(results) < runs:
+    def parse(output):
+        if len(rule_ids) > 1:
+            return sanitize_predictions(output.get(result_key, None), rule_ids)
+        return sanitize_prediction(output.get(result_key, None))
+
+    tokens = prompt_tokens + estimate_tokens(inputs["query"])
+
+    async def call(timer):
+        timer.queued()
+        async with semaphore:
+            await limiter.acquire(tokens + completion_tokens)
+            timer.sent()
+            try:
+                return await asyncio.to_thread(
+                    pf.test,
+                    flow=model_path,
+                    inputs=inputs,
+                    variant=f"${{classify_with_llm.{variant}}}",
+                )
+            finally:
+                timer.done()
+
+    async def replicate(index):
+        key = None
+        if cache is not None:
+            key = cache.key(scope=cache_scope, query=inputs["query"], replicate=index)
+            cached = cache.get(key)
+            if cached is not None:
+                if call_stats is not None:
+                    call_stats.record([line_index], index)
+                return parse(cached)
+
         result = None
         count = 0
+        delay = policy.base_delay
+        timer = CallTimer()
+        sent_tokens, answer_tokens = 0, 0
         while result is None and count < retry:
-            flow_result = pf.test(
-                flow=model_path,
-                inputs=inputs,
-                variant=f"${{classify_with_llm.{variant}}}",
-            )
+            flow_result = await policy.run(lambda: call(timer))
+            sent_tokens += tokens
+            answer_tokens += estimate_tokens(json.dumps(flow_result.get("output")))
 
-            result = sanitize_prediction(
-                flow_result.get("output").get(result_key, None)
-            )
+            result = parse(flow_result.get("output"))
 
             if result is None:
                 count += 1
-                wait_time = 2**count
-                t.sleep(wait_time)
+                delay = policy.parse_error_delay(delay)
+                await asyncio.sleep(delay)
+            elif cache is not None:
+                cache.put(key, flow_result.get("output"))
 
         if count > retry:
             logger.warning(f'Failed to get answer {count} times for: {line["text"]}')
 
-        results.append(result)
-    return results
+        if call_stats is not None:
+            call_stats.record([line_index], index, timer, sent_tokens, answer_tokens)
+        return result
+
+    # gather keeps the replicate order whatever order the calls finish in
+    return list(await asyncio.gather(*[replicate(first_replicate + index) for index in range(runs)]))
+
+
+def process_flow(
+    pf,
+    line,
+    query_id,
+    rule_id,
+    variant,
+    result_key,
+    model_path,
+    input_data_path,
+    runs,
+    retry=5,
+):
+    return asyncio.run(
+        process_flow_async(
+            pf,
+            line,
+            query_id,
+            rule_id,
+            variant,
+            result_key,
+            model_path,
+            input_data_path,
+            runs,
+            retry=retry,
+        )
+    )
+
+
+async def _run_bounded(coroutines, limit: int):
+    """Awaits the coroutines with at most `limit` of them pending, creating
+    the next ones only as earlier ones finish."""
+    pending = set()
+    for coroutine in coroutines:
+        if len(pending) >= limit:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        pending.add(asyncio.ensure_future(coroutine))
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, return_when=asyncio.FIRST_EXCEPTION
+        )
+        for task in done:
+            task.result()
+
+
+async def _process_lines(
+    pf,
+    data,
+    query_id,
+    rule_id,
+    variant,
+    result_key,
+    model_path,
+    input_data_path,
+    runs,
+    workers,
+    limiter: RateLimiter,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cache: Optional[ResponseCache],
+    cache_scope: str,
+    first_replicate: int = 0,
+    policy: Optional[RetryPolicy] = None,
+    sink: Optional[PredictionSink] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    call_stats: Optional[CallStats] = None,
+):
+    if semaphore is None:
+        # pf.test blocks, so in-flight calls each hold a thread of the pool
+        asyncio.get_running_loop().set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(workers)
+        )
+        semaphore = asyncio.Semaphore(workers)
+
+    def process(line_index, line):
+        return process_flow_async(
+            pf,
+            line,
+            query_id,
+            rule_id,
+            variant,
+            result_key,
+            model_path,
+            input_data_path,
+            runs,
+            limiter=limiter,
+            semaphore=semaphore,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cache=cache,
+            cache_scope=cache_scope,
+            first_replicate=first_replicate,
+            policy=policy,
+            call_stats=call_stats,
+            line_index=line_index,
+        )
+
+    if sink is None:
+        return await asyncio.gather(*[process(*line) for line in enumerate(data)])
+
+    async def stream(line_index, line):
+        results = await process(line_index, line)
+        for replicate_index, prediction in enumerate(results, first_replicate):
+            sink.write(
+                replicate_index, line_index, line["text"], prediction, line[rule_id]
+            )
+
+    # twice as many lines as calls in flight keep the pool busy
+    await _run_bounded(
+        (stream(line_index, line) for line_index, line in enumerate(data)),
+        2 * workers,
+    )
+
+
+async def _process_packs(
+    pf,
+    data,
+    query_id,
+    rule_id,
+    variant,
+    result_key,
+    model_path,
+    input_data_path,
+    runs,
+    workers,
+    limiter: RateLimiter,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cache: Optional[ResponseCache],
+    cache_scope: str,
+    pack_size: int,
+    stats: PackingStats,
+    first_replicate: int = 0,
+    policy: Optional[RetryPolicy] = None,
+    sink: Optional[PredictionSink] = None,
+    call_stats: Optional[CallStats] = None,
+):
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(workers)
+    )
+    semaphore = asyncio.Semaphore(workers)
+    packs = make_packs(data, pack_size)
+    stats.unpacked_prompt_tokens += runs * sum(
+        prompt_tokens + estimate_tokens(line[query_id]) for line in data
+    )
+
+    def process(pack, replicate_index):
+        return process_pack_async(
+            pf,
+            pack,
+            query_id,
+            rule_id,
+            variant,
+            result_key,
+            model_path,
+            input_data_path,
+            replicate_index,
+            limiter=limiter,
+            semaphore=semaphore,
+            stats=stats,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cache=cache,
+            cache_scope=cache_scope,
+            policy=policy,
+            call_stats=call_stats,
+        )
+
+    if sink is not None:
+
+        async def stream(pack, replicate_index):
+            results = await process(pack, replicate_index)
+            for (line_index, line), prediction in zip(pack, results):
+                sink.write(
+                    replicate_index, line_index, line["text"], prediction, line[rule_id]
+                )
+
+        await _run_bounded(
+            (
+                stream(pack, first_replicate + replicate_index)
+                for pack in packs
+                for replicate_index in range(runs)
+            ),
+            2 * workers,
+        )
+        return None
+
+    pack_results = await asyncio.gather(
+        *[
+            process(pack, first_replicate + replicate_index)
+            for pack in packs
+            for replicate_index in range(runs)
+        ]
+    )
+    # pack_results holds the replicates of the first pack, then the next
+    predictions = [[] for _ in data]
+    for pack_index, pack in enumerate(packs):
+        for replicate_index in range(runs):
+            results = pack_results[pack_index * runs + replicate_index]
+            for (line_index, _), result in zip(pack, results):
+                predictions[line_index].append(result)
+    return predictions
+
+
+def _predict(
+    data,
+    pf_model_path,
+    input_data_path,
+    query_id,
+    rule_id,
+    aoai_creds,
+    runs,
+    result_key,
+    workers,
+    variant,
+    requests_per_minute,
+    tokens_per_minute,
+    cache,
+    pack_size=1,
+    packing_stats=None,
+    first_replicate=0,
+    retry_policy=None,
+    sink=None,
+    call_stats=None,
+    pf=None,
+    limiter=None,
+):
+    """Runs the replicates of every line and returns their predictions, or
+    None if they are streamed to `sink`. A promptflow client and a rate
+    limiter are created unless given, e.g. shared by successive calls."""
+    retry_policy = retry_policy or RetryPolicy()
+    if pf is None:
+        pf, _ = get_promptflow_client(**(aoai_creds.__dict__))
+    limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+    prompt_tokens, completion_tokens, cache_scope = _flow_settings(
+        pf_model_path, input_data_path, rule_id, variant, cache
+    )
+
+    logger.info(
+        f"Starting {runs} Runs for {rule_id} with {workers} concurrent calls, "
+        f"{requests_per_minute or 'unlimited'} RPM, "
+        f"{tokens_per_minute or 'unlimited'} TPM"
+    )
+
+    if pack_size > 1:
+        return asyncio.run(
+            _process_packs(
+                pf,
+                data,
+                query_id,
+                rule_id,
+                variant,
+                result_key,
+                pf_model_path,
+                input_data_path,
+                runs,
+                workers,
+                limiter,
+                prompt_tokens,
+                completion_tokens,
+                cache,
+                cache_scope,
+                pack_size,
+                packing_stats if packing_stats is not None else PackingStats(),
+                first_replicate,
+                retry_policy,
+                sink,
+                call_stats,
+            )
+        )
+
+    return asyncio.run(
+        _process_lines(
+            pf,
+            data,
+            query_id,
+            rule_id,
+            variant,
+            result_key,
+            pf_model_path,
+            input_data_path,
+            runs,
+            workers,
+            limiter,
+            prompt_tokens,
+            completion_tokens,
+            cache,
+            cache_scope,
+            first_replicate,
+            retry_policy,
+            sink,
+            call_stats=call_stats,
+        )
+    )
 
 
 def run_flow(
@@ -69,47 +485,212 @@ def run_flow(
     result_key: str,
     workers: int = 6,
     variant: str = "variant_0",
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    pack_size: int = 1,
+    packing_stats: Optional[PackingStats] = None,
+    first_replicate: int = 0,
+    retry_policy: Optional[RetryPolicy] = None,
+    sink: Optional[PredictionSink] = None,
+    call_stats: Optional[CallStats] = None,
+    data: Optional[List[dict]] = None,
+    pf=None,
+    limiter: Optional[RateLimiter] = None,
 ):
-    data_file = open(dataset_path)
-    data = json.load(data_file)
+    """Runs the replicates of a rule over the dataset. With a `sink`, the
+    predictions are streamed to it as lines complete and the metrics come
+    from its running counts: only the metrics are returned, with None in
+    place of the predictions, truth and lines.
+
+    The dataset is read from dataset_path unless its lines are given in
+    `data`. A promptflow client `pf` and a rate `limiter` shared by
+    successive calls keep the RPM/TPM budget across them."""
+    if data is None:
+        with open(dataset_path) as data_file:
+            data = json.load(data_file)
 
     prediction = []
     truth = []
 
-    pf, _ = get_promptflow_client(**(aoai_creds.__dict__))
+    predictions = _predict(
+        data,
+        pf_model_path,
+        input_data_path,
+        query_id,
+        rule_id,
+        aoai_creds,
+        runs,
+        result_key,
+        workers,
+        variant,
+        requests_per_minute,
+        tokens_per_minute,
+        cache,
+        pack_size,
+        packing_stats,
+        first_replicate,
+        retry_policy,
+        sink,
+        call_stats,
+        pf,
+        limiter,
+    )
 
-    logger.info(f"Starting {runs} Runs for {rule_id} with {workers} workers")
+    if sink is not None:
+        metrics = [
+            sink.metrics(replicate_index)
+            for replicate_index in range(first_replicate, first_replicate + runs)
+        ]
+        return metrics, None, None, None
 
-    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
-        futures = [
-            executor.submit(
-                process_flow,
-                pf,
-                line,
-                query_id,
-                rule_id,
-                variant,
-                result_key,
-                pf_model_path,
-                input_data_path,
-                runs,
+    metrics = []
+    truth = [line[rule_id] for line in data]
+    lines = [line["text"] for line in data]
+
+    for replicate_index in range(runs):
+        prediction = [p[replicate_index] for p in predictions]
+        metrics.append(calculate_metrics(prediction, truth))
+
+    return metrics, predictions, truth, lines
+
+
+def run_multi_rule_flow(
+    dataset_path: str,
+    pf_model_path: str,
+    input_data_path: str,
+    query_id: str,
+    rule_ids: List[str],
+    aoai_creds: CredentialsAOAI,
+    runs: int,
+    result_key: str = "violations",
+    workers: int = 6,
+    variant: str = "hypothesis_multi",
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    call_stats: Optional[CallStats] = None,
+):
+    """Classifies every line against all `rule_ids` with one LLM call per
+    replicate, then fans the verdict maps out into per-rule predictions.
+    A line whose verdict map could not be parsed is unanswered, None, for
+    every rule and left out of the metrics.
+
+    Returns the (metrics, predictions, truth, lines) of run_flow per rule.
+    """
+    with open(dataset_path) as data_file:
+        data = json.load(data_file)
+
+    verdicts = _predict(
+        data,
+        pf_model_path,
+        input_data_path,
+        query_id,
+        ",".join(rule_ids),
+        aoai_creds,
+        runs,
+        result_key,
+        workers,
+        variant,
+        requests_per_minute,
+        tokens_per_minute,
+        cache,
+        retry_policy=retry_policy,
+        call_stats=call_stats,
+    )
+
+    lines = [line["text"] for line in data]
+    outputs = {}
+    for rule_id in rule_ids:
+        truth = [line[rule_id] for line in data]
+        # a replicate whose verdict map never parsed leaves its line
+        # unanswered for every rule
+        predictions = [
+            [
+                None if replicate is None else replicate.get(rule_id)
+                for replicate in line_verdicts
+            ]
+            for line_verdicts in verdicts
+        ]
+        metrics = []
+        for replicate_index in range(runs):
+            counts = ConfusionCounts()
+            for line_predictions, line_truth in zip(predictions, truth):
+                counts.add(line_predictions[replicate_index], line_truth)
+            metrics.append(counts.metrics())
+        outputs[rule_id] = (metrics, predictions, truth, lines)
+    return outputs
+
+
+def _experiment_output(
+    experiment_name,
+    pf_model_path,
+    dataset_path,
+    rule_id,
+    num_runs,
+    elapsed,
+    start_time,
+    flow_output,
+    output_dir,
+    output_predictions,
+    cache_stats,
+    packing_stats=None,
+    stopping=None,
+    retry_stats=None,
+    sink=None,
+    call_stats=None,
+) -> ExperimentOutput:
+    """Builds the ExperimentOutput of a rule and writes it to files. The
+    predictions streamed to a sink are already in its files."""
+    metrics, predictions, truth, lines = flow_output
+    replicates = list()
+    for replicate_idx in range(num_runs):
+        replicates += [
+            Replicate(
+                metrics=metrics[replicate_idx],
+                predictions=None
+                if predictions is None
+                else [run[replicate_idx] for run in predictions],
             )
-            for line in data
         ]
-        concurrent.futures.wait(futures)
 
-        metrics = []
-        truth = [line[rule_id] for line in data]
-        lines = [line["text"] for line in data]
-        predictions = [f.result() for f in futures]
+    # Build an ExperimentOutput dataclass object to return
+    args = {
+        "experiment_name": experiment_name,
+        "model_name": pf_model_path.split("/")[-1],
+        "dataset_ver": dataset_path.split("/")[-1],
+        "rule_name": rule_id,
+        "num_runs": num_runs,
+        "run_time": elapsed,
+        "pf_client": None,
+        "_start_time": start_time,
+        "replicates": replicates,
+    }
+    if cache_stats is not None:
+        args["cache_stats"] = cache_stats
+    if packing_stats is not None:
+        args["packing_stats"] = packing_stats.to_dict()
+    if stopping is not None:
+        args["stopping"] = stopping
+    if retry_stats is not None:
+        args["retry_stats"] = retry_stats
+    if call_stats is not None:
+        args["call_stats"] = call_stats
 
-        for replicate_index in range(runs):
-            prediction = [p[replicate_index] for p in predictions]
-            metrics.append(calculate_metrics(prediction, truth))
+    exper_out = ExperimentOutput(**args)
+    if sink is not None:
+        exper_out.predictions_dir = sink.predictions_dir
 
-        data_file.close()
+    # write outputs to files
+    exper_out.to_files(
+        metrics_output_dir=output_dir,
+        predictions_output=output_predictions and sink is None,
+        truth=truth,
+        lines=lines,
+    )
 
-    return metrics, predictions, truth, lines
+    return exper_out
 
 
 def run_experiment(
@@ -126,6 +707,15 @@ def run_experiment(
     num_workers: int = 6,
     variant: str = "variant_0",
     output_predictions: bool = True,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    pack_size: int = 1,
+    max_runs: Optional[int] = None,
+    ci_metric: str = "f1",
+    ci_threshold: float = 0.05,
+    stream_predictions: bool = False,
     start_time: datetime = datetime.now().strftime("%Y%m%d%H%M"),
 ) -> ExperimentOutput:
     """Runs an experiment given a dataset, a prediction model, and
@@ -158,10 +748,11 @@ def run_experiment(
         Key to the json response from the LLM to use as the prediction.
 
     num_runs: int
-        Number of replicate runs to execute in this experiment.
+        Number of replicate runs to execute in this experiment, or the
+        minimum number of replicates in adaptive mode.
 
     num_workers: int = 6,
-        Number of workers for flow.
+        Maximum number of LLM calls in flight at once.
 
     variant: str = "variant_0",
         Name of the llm variant to run in the PF flow.
@@ -173,6 +764,56 @@ def run_experiment(
     output_predictions: bool = False
         Flag for serializing predictions to output_dir.
 
+    requests_per_minute: Optional[int] = None
+        Requests per minute quota of the LLM deployment. Calls are delayed
+        to stay within it. Not limited if None.
+
+    tokens_per_minute: Optional[int] = None
+        Tokens per minute quota of the LLM deployment. The tokens of each
+        call are estimated from the prompt, rule and max_tokens of the
+        variant. Not limited if None.
+
+    cache: Optional[ResponseCache] = None
+        Cache of flow responses reused across experiments. Each replicate
+        index has its own entry so replicates stay distinct samples. The
+        hits and misses of this experiment are saved with its metrics.
+
+    retry_policy: Optional[RetryPolicy] = None
+        Retry policy of the LLM calls, whose circuit breaker is shared by
+        every call made with it. A default policy is used if None. The
+        retries of this experiment are saved with its metrics.
+
+    pack_size: int = 1
+        Number of requirements classified together in one prompt. Above 1,
+        a packing variant such as "hypothesis_packed" of
+        models/batched_flow must be used with result_key "violations", and
+        its max_tokens must fit pack_size verdicts. The calls and the estimated prompt tokens saved by
+        packing are saved with the metrics.
+
+    max_runs: Optional[int] = None
+        Enables the adaptive mode when set. After num_runs replicates (at
+        least 2), replicates are added one at a time until the width of the
+        95% confidence interval of the mean of `ci_metric` is at most
+        `ci_threshold`, or until max_runs replicates. The replicates used
+        and the final width are saved with the metrics.
+
+    ci_metric: str = "f1"
+        Metric whose confidence interval stops the adaptive mode.
+
+    ci_threshold: float = 0.05
+        Confidence interval width below which the adaptive mode stops.
+
+    stream_predictions: bool = False
+        Streams the predictions of each replicate to its file as lines
+        complete and computes the metrics from running confusion-matrix
+        counts, so memory stays flat with the dataset size and an
+        interrupted run keeps its predictions. The replicates of the
+        returned ExperimentOutput then hold no predictions.
+
+    The latency, queue wait, retries and estimated tokens of every LLM call
+    are aggregated in the call_stats of the metrics. With output_predictions,
+    the record of each call is saved to runs/calls.jsonl.
+
     start_time: datetime
         Sets the starttime for the run so multiple runs will be put in the same directory.
 
@@ -186,10 +827,28 @@ def run_experiment(
     """
 
     start = t.time()
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    retry_policy = retry_policy or RetryPolicy()
+    retries = retry_policy.stats()
+    packing_stats = PackingStats() if pack_size > 1 else None
+    if max_runs is not None:
+        num_runs = max(num_runs, 2)
+    predictions_dir = f"{results_dir(output_dir, experiment_name, rule_id)}/runs"
+    sink = None
+    if stream_predictions:
+        sink = PredictionSink(predictions_dir if output_predictions else None)
+    call_stats = CallStats(
+        f"{predictions_dir}/calls.jsonl" if output_predictions else None
+    )
+    # adaptive replicates are added by further run_flow calls, which share
+    # the dataset, the client and the rate limiter budget
+    with open(dataset_path) as data_file:
+        data = json.load(data_file)
+    pf, _ = get_promptflow_client(**(aoai_creds.__dict__))
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
 
-    replicates = list()
-    # for replicate_idx in range(num_runs):
-    metrics, predictions, truth, lines = run_flow(
+    flow_arguments = dict(
         dataset_path=dataset_path,
         pf_model_path=pf_model_path,
         input_data_path=input_data_path,
@@ -198,41 +857,345 @@ def run_experiment(
         result_key=result_key,
         aoai_creds=aoai_creds,
         workers=num_workers,
-        runs=num_runs,
         variant=variant,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        cache=cache,
+        retry_policy=retry_policy,
+        pack_size=pack_size,
+        packing_stats=packing_stats,
+        sink=sink,
+        call_stats=call_stats,
+        data=data,
+        pf=pf,
+        limiter=limiter,
     )
+    metrics, predictions, truth, lines = run_flow(runs=num_runs, **flow_arguments)
 
-    for replicate_idx in range(num_runs):
-        replicates += [
-            Replicate(
-                metrics=metrics[replicate_idx],
-                predictions=[run[replicate_idx] for run in predictions],
+    stopping = None
+    if max_runs is not None:
+        width = ci_width([m[ci_metric] for m in metrics])
+        while width > ci_threshold and len(metrics) < max_runs:
+            logger.info(
+                f"{ci_metric} CI width {width:.3f} > {ci_threshold} after "
+                f"{len(metrics)} replicates for {rule_id}"
             )
-        ]
+            more_metrics, more_predictions, _, _ = run_flow(
+                runs=1, first_replicate=len(metrics), **flow_arguments
+            )
+            metrics += more_metrics
+            if predictions is not None:
+                predictions = [p + q for p, q in zip(predictions, more_predictions)]
+            width = ci_width([m[ci_metric] for m in metrics])
+        stopping = {
+            "metric": ci_metric,
+            "ci_width": width,
+            "ci_threshold": ci_threshold,
+            "min_runs": num_runs,
+            "max_runs": max_runs,
+            "converged": width <= ci_threshold,
+        }
+        num_runs = len(metrics)
+    if sink is not None:
+        sink.close()
+    call_stats.close()
+    flow_output = (metrics, predictions, truth, lines)
 
     elapsed = t.time() - start
+    cache_stats = None
+    if cache is not None:
+        cache_stats = {
+            "hits": cache.hits - hits,
+            "misses": cache.misses - misses,
+        }
+    retry_stats = {k: v - retries[k] for k, v in retry_policy.stats().items()}
 
-    # Build an ExperimentOutput dataclass object to return
-    args = {
-        "experiment_name": experiment_name,
-        "model_name": pf_model_path.split("/")[-1],
-        "dataset_ver": dataset_path.split("/")[-1],
-        "rule_name": rule_id,
-        "num_runs": num_runs,
-        "run_time": elapsed,
-        "pf_client": None,
-        "_start_time": start_time,
-        "replicates": replicates,
+    return _experiment_output(
+        experiment_name,
+        pf_model_path,
+        dataset_path,
+        rule_id,
+        num_runs,
+        elapsed,
+        start_time,
+        flow_output,
+        output_dir,
+        output_predictions,
+        cache_stats,
+        packing_stats,
+        stopping,
+        retry_stats,
+        sink,
+        call_stats.summary(elapsed),
+    )
+
+
+def run_multi_rule_experiment(
+    dataset_path: str,
+    pf_model_path: str,
+    input_data_path: str,
+    aoai_creds: CredentialsAOAI,
+    rule_ids: List[str],
+    experiment_name: str = "hypothesis000",
+    query_id: str = "text",
+    result_key: str = "violations",
+    output_dir: str = "experiment_outputs",
+    num_runs: int = 1,
+    num_workers: int = 6,
+    variant: str = "hypothesis_multi",
+    output_predictions: bool = True,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    start_time: datetime = datetime.now().strftime("%Y%m%d%H%M"),
+) -> Dict[str, ExperimentOutput]:
+    """Runs an experiment for several rules at once. Each requirement is
+    classified against all the rules in one prompt by a multi-rule variant
+    and its verdict map is fanned back out into per-rule predictions, so a
+    line costs one LLM call per replicate instead of one per rule.
+
+    Parameters
+    ----------
+    pf_model_path: str
+        Path to a flow with multi-rule variants, e.g. models/batched_flow.
+        The standard flow has none, so its CI sweep does not run them.
+
+    rule_ids: List[str]
+        Keys in the dataset for the truth of each rule, also the rule IDs
+        in the rules datafile.
+
+    result_key: str = "violations"
+        Key to the verdict map keyed by rule ID in the flow output.
+
+    variant: str = "hypothesis_multi",
+        Name of the multi-rule llm variant to run in the PF flow.
+
+    The other parameters are those of run_experiment.
+
+    Return
+    ------
+    Dict[str, ExperimentOutput]
+        The ExperimentOutput of each rule, written to the same files as a
+        run_experiment call for that rule. run_time, cache_stats and
+        call_stats are those of the shared run, whose call records are not
+        saved.
+    """
+
+    start = t.time()
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    retry_policy = retry_policy or RetryPolicy()
+    retries = retry_policy.stats()
+    call_stats = CallStats()
+
+    flow_outputs = run_multi_rule_flow(
+        dataset_path=dataset_path,
+        pf_model_path=pf_model_path,
+        input_data_path=input_data_path,
+        query_id=query_id,
+        rule_ids=rule_ids,
+        result_key=result_key,
+        aoai_creds=aoai_creds,
+        workers=num_workers,
+        runs=num_runs,
+        variant=variant,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        cache=cache,
+        retry_policy=retry_policy,
+        call_stats=call_stats,
+    )
+
+    elapsed = t.time() - start
+    cache_stats = None
+    if cache is not None:
+        cache_stats = {
+            "hits": cache.hits - hits,
+            "misses": cache.misses - misses,
+        }
+    retry_stats = {k: v - retries[k] for k, v in retry_policy.stats().items()}
+
+    return {
+        rule_id: _experiment_output(
+            experiment_name,
+            pf_model_path,
+            dataset_path,
+            rule_id,
+            num_runs,
+            elapsed,
+            start_time,
+            flow_outputs[rule_id],
+            output_dir,
+            output_predictions,
+            cache_stats,
+            retry_stats=retry_stats,
+            call_stats=call_stats.summary(elapsed),
+        )
+        for rule_id in rule_ids
     }
 
-    exper_out = ExperimentOutput(**args)
 
-    # write outputs to files
-    exper_out.to_files(
-        metrics_output_dir=output_dir,
-        predictions_output=output_predictions,
-        truth=truth,
-        lines=lines,
+def run_campaign(
+    experiment: Dict,
+    aoai_creds: CredentialsAOAI,
+    variants: Optional[List[str]] = None,
+    experiment_name: str = "campaign000",
+    output_dir: str = "experiment_outputs",
+    num_workers: int = 6,
+    output_predictions: bool = True,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    retry_policy: Optional[RetryPolicy] = None,
+    start_time: datetime = datetime.now().strftime("%Y%m%d%H%M"),
+) -> Dict[str, Dict[str, ExperimentOutput]]:
+    """Runs the experiment of every rule of an experiment spec with every
+    variant on one shared pool. The lines and replicates of all the rules
+    and variants are scheduled together against the same `num_workers`
+    in-flight calls and rate limits, so the pool never ramps down between
+    experiments.
+
+    Parameters
+    ----------
+    experiment: Dict
+        Experiment spec checked by utils.json_validation.is_valid_experiment:
+        dataset_path, pf_model_path, input_data_path, num_runs, query_id,
+        rule_ids, result_key and variant.
+
+    variants: Optional[List[str]] = None
+        Names of the llm variants to run in the PF flow. Only the variant
+        of the spec is run if None.
+
+    experiment_name: str = "campaign000"
+        Name of the campaign for output.
+
+    The other parameters are those of run_experiment.
+
+    Return
+    ------
+    Dict[str, Dict[str, ExperimentOutput]]
+        The ExperimentOutput of each rule by variant, written under
+        `{output_dir}/results/{experiment_name}/{variant}/{rule}` like a
+        run_experiment call named "{experiment_name}/{variant}".
+        run_time, cache_stats and retry_stats are those of the campaign,
+        call_stats those of the rule and variant.
+    """
+    if not is_valid_experiment(experiment):
+        logger.error(f"Invalid experiment spec: {experiment}")
+        raise ValueError("Invalid experiment spec")
+    variants = variants or [experiment["variant"]]
+    rule_ids = experiment["rule_ids"]
+    pf_model_path = experiment["pf_model_path"]
+    input_data_path = experiment["input_data_path"]
+    runs = experiment["num_runs"]
+
+    start = t.time()
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    retry_policy = retry_policy or RetryPolicy()
+    retries = retry_policy.stats()
+
+    with open(experiment["dataset_path"]) as data_file:
+        data = json.load(data_file)
+    pf, _ = get_promptflow_client(**(aoai_creds.__dict__))
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    experiments = [(variant, rule_id) for variant in variants for rule_id in rule_ids]
+    # each variant is an experiment of the campaign, so a campaign never
+    # shares its results directory with a stand-alone experiment
+    variant_names = {variant: f"{experiment_name}/{variant}" for variant in variants}
+    settings = [
+        _flow_settings(pf_model_path, input_data_path, rule_id, variant, cache)
+        for variant, rule_id in experiments
+    ]
+    all_call_stats = [
+        CallStats(
+            f"{results_dir(output_dir, variant_names[variant], rule_id)}"
+            "/runs/calls.jsonl"
+            if output_predictions
+            else None
+        )
+        for variant, rule_id in experiments
+    ]
+
+    logger.info(
+        f"Starting {runs} Runs for {len(rule_ids)} rules x {len(variants)} "
+        f"variants with {num_workers} concurrent calls, "
+        f"{requests_per_minute or 'unlimited'} RPM, "
+        f"{tokens_per_minute or 'unlimited'} TPM"
     )
 
-    return exper_out
+    async def process_all():
+        # pf.test blocks, so in-flight calls each hold a thread of the pool
+        asyncio.get_running_loop().set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(num_workers)
+        )
+        semaphore = asyncio.Semaphore(num_workers)
+        return await asyncio.gather(
+            *[
+                _process_lines(
+                    pf,
+                    data,
+                    experiment["query_id"],
+                    rule_id,
+                    variant,
+                    experiment["result_key"],
+                    pf_model_path,
+                    input_data_path,
+                    runs,
+                    num_workers,
+                    limiter,
+                    prompt_tokens,
+                    completion_tokens,
+                    cache,
+                    cache_scope,
+                    policy=retry_policy,
+                    semaphore=semaphore,
+                    call_stats=call_stats,
+                )
+                for (variant, rule_id), (
+                    prompt_tokens,
+                    completion_tokens,
+                    cache_scope,
+                ), call_stats in zip(experiments, settings, all_call_stats)
+            ]
+        )
+
+    all_predictions = asyncio.run(process_all())
+
+    elapsed = t.time() - start
+    cache_stats = None
+    if cache is not None:
+        cache_stats = {
+            "hits": cache.hits - hits,
+            "misses": cache.misses - misses,
+        }
+    retry_stats = {k: v - retries[k] for k, v in retry_policy.stats().items()}
+
+    lines = [line["text"] for line in data]
+    outputs = {variant: {} for variant in variants}
+    for (variant, rule_id), predictions, call_stats in zip(
+        experiments, all_predictions, all_call_stats
+    ):
+        call_stats.close()
+        truth = [line[rule_id] for line in data]
+        metrics = [
+            calculate_metrics([p[replicate_index] for p in predictions], truth)
+            for replicate_index in range(runs)
+        ]
+        outputs[variant][rule_id] = _experiment_output(
+            variant_names[variant],
+            pf_model_path,
+            experiment["dataset_path"],
+            rule_id,
+            runs,
+            elapsed,
+            start_time,
+            (metrics, predictions, truth, lines),
+            output_dir,
+            output_predictions,
+            cache_stats,
+            retry_stats=retry_stats,
+            call_stats=call_stats.summary(elapsed),
+        )
+    return outputs
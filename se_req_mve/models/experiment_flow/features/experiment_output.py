@@ -10,6 +10,11 @@ from promptflow import PFClient
 from ..utils.metrics import average_metrics
 
 
+def results_dir(metrics_output_dir: str, experiment_name: str, rule_name: str) -> str:
+    """Directory of the metrics and predictions of a rule in an experiment."""
+    return f"{metrics_output_dir}/results/{experiment_name}/{rule_name}"
+
+
 @dataclass
 class Replicate:
     """Contains data for a replicate run
@@ -18,7 +23,7 @@ class Replicate:
         Metrics from the replciate run.
 
     predictions: [bool]
-        Prediction outputs
+        Prediction outputs, None if they were streamed to files
 
     """
 
@@ -74,6 +79,23 @@ class ExperimentOutput:
     predictions_dir: Optional[str] = None
         Output directory that stores experiment predictions.
 
+    cache_stats: Optional[Dict[str, int]] = None
+        Response cache hits and misses of the experiment, if a cache was used.
+
+    packing_stats: Optional[Dict[str, float]] = None
+        Calls and estimated prompt token savings of packed experiments.
+
+    stopping: Optional[Dict] = None
+        Confidence interval reached by adaptive experiments, whose
+        num_runs is the number of replicates actually used.
+
+    retry_stats: Optional[Dict[str, int]] = None
+        Retries of the LLM calls of the experiment by kind of failure.
+
+    call_stats: Optional[Dict[str, float]] = None
+        Latency and queue wait percentiles, throughput and estimated tokens
+        of the LLM calls of the experiment.
+
     """
 
     experiment_name: str
@@ -89,6 +111,11 @@ class ExperimentOutput:
     all_metrics: Dict[str, List[float]] = None
     metrics_file: Optional[str] = None
     predictions_dir: Optional[str] = None
+    cache_stats: Optional[Dict[str, int]] = None
+    packing_stats: Optional[Dict[str, float]] = None
+    stopping: Optional[Dict] = None
+    retry_stats: Optional[Dict[str, int]] = None
+    call_stats: Optional[Dict[str, float]] = None
 
     def __post_init__(self):
         """Parse replicates to build self.all_metrics and self.mean_metrics
@@ -112,8 +139,8 @@ class ExperimentOutput:
         will not be serialized to files.
 
         """
-        output_dir_for_exprmt = (
-            f"{metrics_output_dir}/results/{self.experiment_name}/{self.rule_name}"
+        output_dir_for_exprmt = results_dir(
+            metrics_output_dir, self.experiment_name, self.rule_name
         )
         os.makedirs(output_dir_for_exprmt, exist_ok=True)
 
@@ -146,6 +173,11 @@ class ExperimentOutput:
                         "run_time",
                         "num_runs",
                         "predictions_dir",
+                        "cache_stats",
+                        "packing_stats",
+                        "stopping",
+                        "retry_stats",
+                        "call_stats",
                     ]
                 },
                 f,
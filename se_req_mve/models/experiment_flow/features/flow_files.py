@@ -0,0 +1,30 @@
+import os
+from typing import Optional
+
+import yaml
+
+
+def load_flow(model_path: str) -> dict:
+    """The flow.dag.yaml of a flow directory."""
+    with open(os.path.join(model_path, "flow.dag.yaml")) as flow_file:
+        return yaml.safe_load(flow_file)
+
+
+def flow_file(model_path: str, path: str, flow: Optional[dict] = None) -> str:
+    """Local path of a file of the flow, relative to the flow directory.
+
+    A file the flow directory does not hold is looked up in the
+    additional_includes of the flow, which promptflow copies to the root of
+    the flow snapshot, e.g. "utils/logger.py" in "../experiment_flow/utils".
+    """
+    local_path = os.path.join(model_path, path)
+    if os.path.exists(local_path):
+        return local_path
+    if flow is None:
+        flow = load_flow(model_path)
+    head, *rest = os.path.normpath(path).split(os.sep)
+    for include in flow.get("additional_includes") or []:
+        include = os.path.normpath(include)
+        if os.path.basename(include) == head:
+            return os.path.join(model_path, include, *rest)
+    return local_path
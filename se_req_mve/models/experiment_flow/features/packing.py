@@ -0,0 +1,196 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from utils.logger import llmops_logger
+
+from .call_stats import CallStats, CallTimer
+from .evaluation import sanitize_prediction
+from .rate_limiter import RateLimiter, estimate_tokens
+from .response_cache import ResponseCache
+from .retry_policy import RetryPolicy
+
+logger = llmops_logger()
+
+
+@dataclass
+class PackingStats:
+    """Calls and estimated prompt tokens of a packed experiment.
+
+    calls: int
+        LLM calls made, retries included.
+
+    splits: int
+        Packs split in two because an item of the pack got no verdict.
+
+    prompt_tokens: int
+        Prompt tokens sent in packs, retries included.
+
+    unpacked_prompt_tokens: int
+        Prompt tokens the same lines cost with one requirement per call.
+    """
+
+    calls: int = 0
+    splits: int = 0
+    prompt_tokens: int = 0
+    unpacked_prompt_tokens: int = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        savings = 0.0
+        if self.unpacked_prompt_tokens:
+            savings = 1 - self.prompt_tokens / self.unpacked_prompt_tokens
+        return {
+            "calls": self.calls,
+            "splits": self.splits,
+            "prompt_tokens": self.prompt_tokens,
+            "unpacked_prompt_tokens": self.unpacked_prompt_tokens,
+            "token_savings": round(savings, 4),
+        }
+
+
+def make_packs(data: List[dict], pack_size: int) -> List[List[Tuple[int, dict]]]:
+    """Groups the lines in packs of `pack_size`, each line with its index in
+    the dataset, which is its stable item ID in the prompt."""
+    lines = list(enumerate(data))
+    return [lines[i : i + pack_size] for i in range(0, len(lines), pack_size)]
+
+
+async def process_pack_async(
+    pf,
+    pack: List[Tuple[int, dict]],
+    query_id,
+    rule_id,
+    variant,
+    result_key,
+    model_path,
+    input_data_path,
+    replicate_index: int,
+    limiter: RateLimiter,
+    semaphore: asyncio.Semaphore,
+    stats: PackingStats,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cache: Optional[ResponseCache] = None,
+    cache_scope: str = "",
+    retry=5,
+    policy: Optional[RetryPolicy] = None,
+    call_stats: Optional[CallStats] = None,
+    attempt=0,
+) -> List[Optional[bool]]:
+    """Classifies the lines of a pack in one call and demultiplexes the
+    verdict map keyed by item ID back to the lines, in pack order.
+
+    Failed calls are retried by the retry policy. Items without a verdict
+    are retried: a failed pack is split in two halves classified
+    separately, down to single items, which are retried with backoff up
+    to `retry` times like unpacked lines. Each call, or its cache hit, is
+    recorded in `call_stats` for the lines of the pack.
+    """
+    policy = policy or RetryPolicy()
+    items = [{"id": str(index), "text": line[query_id]} for index, line in pack]
+    inputs = {
+        "query": items[0]["text"],
+        "truth": any(line[rule_id] for _, line in pack),
+        "rule_id": rule_id,
+        "data_file": input_data_path,
+        "requirements": items,
+    }
+    tokens = prompt_tokens + sum(estimate_tokens(item["text"]) for item in items)
+
+    key = None
+    output = None
+    if cache is not None:
+        key = cache.key(
+            scope=cache_scope,
+            queries=[item["text"] for item in items],
+            replicate=replicate_index,
+        )
+        output = cache.get(key)
+        if output is not None and call_stats is not None:
+            call_stats.record([index for index, _ in pack], replicate_index)
+    if output is None:
+        timer = CallTimer()
+
+        async def call():
+            timer.queued()
+            async with semaphore:
+                await limiter.acquire(tokens + completion_tokens)
+                stats.calls += 1
+                stats.prompt_tokens += tokens
+                timer.sent()
+                try:
+                    return await asyncio.to_thread(
+                        pf.test,
+                        flow=model_path,
+                        inputs=inputs,
+                        variant=f"${{classify_with_llm.{variant}}}",
+                    )
+                finally:
+                    timer.done()
+
+        output = (await policy.run(call) or {}).get("output")
+        if call_stats is not None:
+            call_stats.record(
+                [index for index, _ in pack],
+                replicate_index,
+                timer,
+                tokens,
+                estimate_tokens(json.dumps(output)),
+            )
+
+    # a missing or malformed output has no verdicts, the pack is split
+    if not isinstance(output, dict):
+        output = {}
+    verdicts = output.get(result_key, None)
+    if not isinstance(verdicts, dict):
+        verdicts = {}
+    results = [sanitize_prediction(verdicts.get(item["id"])) for item in items]
+    failed = [i for i, result in enumerate(results) if result is None]
+    if not failed:
+        if cache is not None:
+            cache.put(key, output)
+        return results
+
+    arguments = (
+        query_id,
+        rule_id,
+        variant,
+        result_key,
+        model_path,
+        input_data_path,
+        replicate_index,
+        limiter,
+        semaphore,
+        stats,
+        prompt_tokens,
+        completion_tokens,
+        cache,
+        cache_scope,
+        retry,
+        policy,
+        call_stats,
+    )
+    if len(pack) == 1:
+        if attempt + 1 >= retry:
+            logger.warning(f"Failed to get answer {retry} times for: {items[0]['text']}")
+            return results
+        await asyncio.sleep(policy.parse_error_delay(policy.base_delay * 2**attempt))
+        return await process_pack_async(pf, pack, *arguments, attempt=attempt + 1)
+
+    if len(failed) < len(pack):
+        # keep the verdicts received, only the failed items are packed again
+        retried = await process_pack_async(
+            pf, [pack[i] for i in failed], *arguments
+        )
+        for i, result in zip(failed, retried):
+            results[i] = result
+        return results
+
+    stats.splits += 1
+    half = len(pack) // 2
+    left, right = await asyncio.gather(
+        process_pack_async(pf, pack[:half], *arguments),
+        process_pack_async(pf, pack[half:], *arguments),
+    )
+    return left + right
@@ -0,0 +1,58 @@
+import json
+import os
+from typing import Dict, Optional, TextIO
+
+from .evaluation import ConfusionCounts
+
+
+class PredictionSink:
+    """Streams predictions to one JSONL file per replicate as lines complete
+    and keeps running confusion-matrix counts of each replicate, so neither
+    the predictions nor their metrics are held in memory.
+
+    Records are flushed line by line: the predictions of an interrupted run
+    are kept. Lines finish in any order, so each record holds the index of
+    its line in the dataset next to the line, prediction and truth columns
+    of the predictions files.
+
+    Parameters
+    ----------
+    predictions_dir: Optional[str] = None
+        Directory of the replicate_NNN.jsonl files. Created if it does not
+        exist. Only the counts are kept if None.
+    """
+
+    def __init__(self, predictions_dir: Optional[str] = None):
+        if predictions_dir:
+            os.makedirs(predictions_dir, exist_ok=True)
+        self.predictions_dir = predictions_dir
+        self.counts: Dict[int, ConfusionCounts] = {}
+        self._files: Dict[int, TextIO] = {}
+
+    def write(self, replicate_index: int, line_index: int, line, prediction, truth):
+        counts = self.counts.setdefault(replicate_index, ConfusionCounts())
+        counts.add(prediction, truth)
+        if self.predictions_dir is None:
+            return
+        if replicate_index not in self._files:
+            self._files[replicate_index] = open(
+                f"{self.predictions_dir}/replicate_{replicate_index:03}.jsonl",
+                "w",
+                buffering=1,
+            )
+        record = {
+            "index": line_index,
+            "line": line,
+            "prediction": prediction,
+            "truth": truth,
+        }
+        self._files[replicate_index].write(json.dumps(record, default=str) + "\n")
+
+    def metrics(self, replicate_index: int) -> dict:
+        """Metrics of a replicate from its running counts."""
+        return self.counts.get(replicate_index, ConfusionCounts()).metrics()
+
+    def close(self):
+        for predictions_file in self._files.values():
+            predictions_file.close()
+        self._files = {}
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import Optional
+
+# rough size of an English token for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens of a text from its length."""
+    return len(str(text)) // CHARS_PER_TOKEN + 1
+
+
+class TokenBucket:
+    """A bucket refilled continuously up to a per-minute capacity.
+
+    Parameters
+    ----------
+    per_minute: int
+        Capacity of the bucket and amount refilled every minute.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds to wait until `amount` is available."""
+        self._refill()
+        # a single request larger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Limits LLM calls to a requests-per-minute and tokens-per-minute quota.
+
+    Calls are admitted in arrival order, each one once both buckets hold
+    enough capacity for it. A limit left to None is not enforced.
+
+    Parameters
+    ----------
+    requests_per_minute: Optional[int] = None
+        Requests per minute (RPM) quota of the deployment.
+
+    tokens_per_minute: Optional[int] = None
+        Tokens per minute (TPM) quota of the deployment.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._lock = None
+        self._loop = None
+
+    async def acquire(self, tokens: int = 0):
+        """Waits until a call consuming `tokens` tokens fits in the quota."""
+        if self.requests is None and self.tokens is None:
+            return
+        # a limiter shared by successive event loops needs a lock per loop
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                delay = 0.0
+                if self.requests is not None:
+                    delay = max(delay, self.requests.delay(1))
+                if self.tokens is not None:
+                    delay = max(delay, self.tokens.delay(tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
@@ -0,0 +1,182 @@
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set
+
+from .flow_files import flow_file, load_flow
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+)
+"""
+
+
+def _imported_modules(model_path: str, flow: dict, source: str) -> List[str]:
+    """Paths, relative to the flow directory, of the flow modules that a
+    Python source imports, e.g. utils/rule_catalog.py."""
+    with open(flow_file(model_path, source, flow), "rb") as source_file:
+        tree = ast.parse(source_file.read())
+    source_dir = os.path.dirname(source)
+    candidates = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            parts = [alias.name.split(".") for alias in node.names]
+            base = ""
+        elif isinstance(node, ast.ImportFrom):
+            module = (node.module or "").split(".") if node.module else []
+            # the imported names may be submodules of the imported package
+            parts = [module] + [module + [alias.name] for alias in node.names]
+            base = ""
+            if node.level:
+                base = source_dir
+                for _ in range(node.level - 1):
+                    base = os.path.dirname(base)
+        else:
+            continue
+        for module_parts in parts:
+            if not module_parts:
+                continue
+            path = os.path.join(base, *module_parts)
+            candidates += [path + ".py", os.path.join(path, "__init__.py")]
+    return [
+        os.path.normpath(path)
+        for path in candidates
+        if os.path.isfile(flow_file(model_path, path, flow))
+    ]
+
+
+def _flow_sources(model_path: str, flow: dict, sources: List[str]) -> List[str]:
+    """The sources and, recursively, the flow modules they import."""
+    found: Set[str] = set()
+    pending = [os.path.normpath(source) for source in sources]
+    while pending:
+        source = pending.pop()
+        if source in found:
+            continue
+        found.add(source)
+        if source.endswith(".py"):
+            pending += _imported_modules(model_path, flow, source)
+    return sorted(found)
+
+
+def flow_fingerprint(model_path: str, variant: str) -> str:
+    """Hashes everything of a flow variant that shapes its response: the
+    LLM node settings (deployment, max_tokens, temperature, ...), its
+    prompt template, the code of the Python nodes and the flow modules
+    they import, included from other directories or not."""
+    flow = load_flow(model_path)
+    node = flow["node_variants"]["classify_with_llm"]["variants"][variant]["node"]
+    sources = [node["source"]["path"]] + [
+        n["source"]["path"] for n in flow["nodes"] if n.get("type") == "python"
+    ]
+    digest = hashlib.sha256(json.dumps(node, sort_keys=True).encode())
+    for source in _flow_sources(model_path, flow, sources):
+        digest.update(source.replace(os.sep, "/").encode())
+        with open(flow_file(model_path, source, flow), "rb") as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of flow responses, stored in SQLite.
+
+    When the cache is opened and closed, entries older than `max_age_days`
+    are dropped and, above `max_entries`, the least recently used entries
+    are evicted. Expired entries are never returned.
+
+    Parameters
+    ----------
+    path: str
+        Path to the SQLite database file. Created if it does not exist.
+
+    max_entries: Optional[int] = None
+        Maximum number of cached responses. Not limited if None.
+
+    max_age_days: Optional[float] = None
+        Maximum age of a cached response in days. Not limited if None.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+    ):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute(SCHEMA)
+        self.evict()
+
+    @staticmethod
+    def key(**parts) -> str:
+        """Content address of a request made of JSON-serializable parts."""
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Returns the cached response of `key`, or None on a miss."""
+        row = self._db.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and not self._expired(row[1]):
+            self.hits += 1
+            self._db.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict):
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, default=str), now, now),
+        )
+        self._db.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        if self.max_age_days is None:
+            return False
+        return time.time() - created_at > self.max_age_days * 86400
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones."""
+        if self.max_age_days is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.max_age_days * 86400,),
+            )
+        if self.max_entries is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+        self._db.commit()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts since the cache was opened."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self):
+        self.evict()
+        self._db.close()
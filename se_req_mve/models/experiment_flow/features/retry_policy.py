@@ -0,0 +1,194 @@
+import asyncio
+import random
+import re
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from utils.logger import llmops_logger
+
+logger = llmops_logger()
+
+THROTTLED = "throttled"
+SERVER_ERROR = "server_error"
+TRANSIENT = "transient"
+FATAL = "fatal"
+PARSE_ERROR = "parse_error"
+
+THROTTLED_PATTERN = re.compile(
+    r"(error code|status(?: code)?)\D{0,3}429|ratelimit|rate limit|too many requests", re.I
+)
+RETRY_AFTER_PATTERN = re.compile(r"retry after (\d+(?:\.\d+)?) ?(ms|milliseconds?|s|seconds?)?", re.I)
+
+T = TypeVar("T")
+
+
+def _errors(error: BaseException):
+    """The error and the errors it was raised from, as promptflow wraps
+    the errors of the LLM client."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for err in _errors(error):
+        response = getattr(err, "response", None)
+        for status in (
+            getattr(err, "status_code", None),
+            getattr(err, "http_status", None),
+            getattr(response, "status_code", None),
+        ):
+            if isinstance(status, int):
+                return status
+    return None
+
+
+def classify_error(error: BaseException) -> str:
+    """Classifies a failed LLM call as throttled (429), server error (5xx),
+    fatal (other 4xx, never retried) or transient (timeouts, connection
+    errors and anything else)."""
+    status = _status_code(error)
+    text = " ".join(f"{type(e).__name__} {e}" for e in _errors(error))
+    if status == 429 or THROTTLED_PATTERN.search(text):
+        return THROTTLED
+    if status is not None and status >= 500:
+        return SERVER_ERROR
+    if status is not None and 400 <= status < 500:
+        return FATAL
+    return TRANSIENT
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait before retrying, from the Retry-After or
+    retry-after-ms header of the response, or from the error message."""
+    for err in _errors(error):
+        headers = getattr(getattr(err, "response", None), "headers", None)
+        headers = headers or getattr(err, "headers", None) or {}
+        headers = {str(k).lower(): v for k, v in dict(headers).items()}
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except ValueError:
+            pass
+        match = RETRY_AFTER_PATTERN.search(str(err))
+        if match:
+            seconds = float(match.group(1))
+            unit = (match.group(2) or "s").lower()
+            return seconds / 1000 if unit.startswith("m") else seconds
+    return None
+
+
+class CircuitBreaker:
+    """Pauses every call of the engine while the deployment is saturated.
+
+    A throttled call opens the breaker for its Retry-After delay. After
+    `failure_threshold` throttled calls in a row, it stays open for at
+    least `cooldown` seconds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.trips = 0
+
+    def trip(self, seconds: float):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            seconds = max(seconds, self.cooldown)
+        if time.monotonic() + seconds > self.open_until:
+            self.open_until = time.monotonic() + seconds
+            self.trips += 1
+
+    def reset(self):
+        self.consecutive_failures = 0
+
+    async def wait(self):
+        """Waits until the breaker is closed, however often it reopens."""
+        while True:
+            delay = self.open_until - time.monotonic()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+
+class RetryPolicy:
+    """Retries LLM calls according to the kind of failure.
+
+    Throttled calls trip the shared circuit breaker for the Retry-After
+    delay, server and transient errors back off with decorrelated jitter,
+    and fatal errors are raised at once.
+
+    Parameters
+    ----------
+    max_attempts: int = 6
+        Attempts of a call before its last error is raised.
+
+    base_delay: float = 1.0
+        Smallest backoff delay in seconds.
+
+    max_delay: float = 60.0
+        Largest backoff delay in seconds.
+
+    breaker: Optional[CircuitBreaker] = None
+        Breaker shared by every call made with this policy.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = {THROTTLED: 0, SERVER_ERROR: 0, TRANSIENT: 0, PARSE_ERROR: 0}
+
+    def next_delay(self, previous: float) -> float:
+        """Decorrelated jitter: a random delay between the base delay and
+        three times the previous one, capped at max_delay."""
+        upper = max(self.base_delay, previous * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def parse_error_delay(self, previous: float) -> float:
+        """Counts a response that could not be parsed and returns the delay
+        before asking again."""
+        self.retries[PARSE_ERROR] += 1
+        return self.next_delay(previous)
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `attempt()` until it succeeds, retrying failed calls."""
+        delay = self.base_delay
+        for attempt_index in range(1, self.max_attempts + 1):
+            await self.breaker.wait()
+            try:
+                result = await attempt()
+            except Exception as error:
+                kind = classify_error(error)
+                if kind == FATAL or attempt_index == self.max_attempts:
+                    raise
+                self.retries[kind] += 1
+                delay = self.next_delay(delay)
+                if kind == THROTTLED:
+                    delay = retry_after(error) or delay
+                    self.breaker.trip(delay)
+                else:
+                    await asyncio.sleep(delay)
+                logger.warning(
+                    f"LLM call {kind} ({error}), retry {attempt_index} in {delay:.1f}s"
+                )
+                continue
+            self.breaker.reset()
+            return result
+
+    def stats(self) -> Dict[str, int]:
+        """Retries by kind of failure and circuit breaker trips."""
+        return dict(self.retries, breaker_trips=self.breaker.trips)
@@ -1,7 +1,7 @@
-import json
-
 from promptflow import tool
 
+from utils.rule_catalog import load_catalog
+
 
 # flake8: noqa
 @tool
@@ -10,17 +10,17 @@ def prepare_rule_data(data_file: str, rule_id: str) -> str:
     Parameters
     -------
     rule_id: str
-        ID of the rule, case-sensitive. e.g., "r3"
+        ID of the rule, case-sensitive. e.g., "r3". Several comma-separated
+        IDs, e.g. "r3,r7", select a set of rules for multi-rule variants.
 
     Output
     ------
     str
         Text representation of rule data. This will be passed into
-        the LLM prompt as rule context.
+        the LLM prompt as rule context. The data of every selected rule
+        is under "rules", and their pre-rendered rule lines and examples
+        under "fragments". Rules are served from the catalog compiled
+        once per rules file content, not read again for every line.
 
     """
-    with open(data_file, "r") as f:
-        rules = json.load(f)
-
-        rule_dict = [my_rule for my_rule in rules if my_rule["id"] == rule_id][0]
-        return rule_dict
+    return load_catalog(data_file).select(rule_id)
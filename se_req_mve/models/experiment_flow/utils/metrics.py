@@ -5,7 +5,8 @@ import os
 from typing import List
 
 import pandas as pd
-from numpy import mean, random, std
+from numpy import inf, mean, random, sqrt, std
+from scipy.stats import t
 
 from utils.logger import llmops_logger
 
@@ -25,6 +26,14 @@ def average_metrics(all_metrics_list: List):
     return all_metrics, mean_metrics
 
 
+def ci_width(values: List[float], confidence: float = 0.95) -> float:
+    """Width of the Student's t confidence interval of the mean of values."""
+    n = len(values)
+    if n < 2:
+        return inf
+    return float(2 * t.ppf((1 + confidence) / 2, n - 1) * std(values, ddof=1) / sqrt(n))
+
+
 def collect_mean_metrics_for_all_rules(
     experiment_results_folder: str,
     serialize_to_file: bool = True,
@@ -0,0 +1,98 @@
+"""Compiled catalog of the rules files of the flow."""
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Tuple
+
+# catalogs by file digest, and digests by file path, mtime and size, so a
+# file is read and hashed again only when it changes
+_catalogs: Dict[str, "RuleCatalog"] = {}
+_digests: Dict[Tuple[str, int, int], str] = {}
+_lock = threading.Lock()
+
+
+def _render_examples(rule: dict) -> str:
+    return "".join(
+        f"TEXT: {example.get('requirement')}\nOUTPUT: {example.get('violation')}\n"
+        for example in rule.get("examples", [])
+    )
+
+
+class RuleCatalog:
+    """Rules of a rules file indexed by ID, with their static prompt
+    fragments rendered once: the "{id}: {definition}" line of multi-rule
+    prompts and the TEXT/OUTPUT block of their examples. Every fragment
+    line ends with a newline, as the prompt templates render it.
+
+    Parameters
+    ----------
+    rules: List[dict]
+        Rules as stored in the rules file, each with a unique "id".
+
+    digest: str
+        SHA-256 of the rules file the catalog was compiled from.
+    """
+
+    def __init__(self, rules: List[dict], digest: str):
+        self.digest = digest
+        self.rules = {rule["id"]: rule for rule in rules}
+        self.fragments = {
+            rule["id"]: {
+                "rule_line": f"{rule['id']}: {rule['definition']}\n",
+                "examples": _render_examples(rule),
+            }
+            for rule in rules
+        }
+        self._selections: Dict[str, dict] = {}
+
+    def get(self, rule_id: str) -> dict:
+        try:
+            return self.rules[rule_id]
+        except KeyError:
+            raise KeyError(f"Unknown rule ID: {rule_id}") from None
+
+    def rules_for(self, rule_id: str) -> List[dict]:
+        """Rules of a comma-separated list of rule IDs, in order."""
+        return [self.get(my_id) for my_id in rule_id.split(",")]
+
+    def select(self, rule_id: str) -> dict:
+        """Rule data of a comma-separated list of rule IDs as output by the
+        prepare_rule node, built once per list."""
+        if rule_id not in self._selections:
+            rule_dicts = self.rules_for(rule_id)
+            if len(rule_dicts) == 1:
+                rule_dict = dict(rule_dicts[0])
+            else:
+                rule_dict = {
+                    "id": rule_id,
+                    "definition": "\n".join(r["definition"] for r in rule_dicts),
+                }
+            rule_dict["rules"] = rule_dicts
+            rule_dict["fragments"] = {
+                "rule_lines": "".join(
+                    self.fragments[r["id"]]["rule_line"] for r in rule_dicts
+                ),
+                "examples": "".join(
+                    self.fragments[r["id"]]["examples"] for r in rule_dicts
+                ),
+            }
+            self._selections[rule_id] = rule_dict
+        return dict(self._selections[rule_id])
+
+
+def load_catalog(path: str) -> RuleCatalog:
+    """Returns the catalog of a rules file, compiled once per file content
+    and shared by every line and flow run of the process."""
+    stat = os.stat(path)
+    file_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        digest = _digests.get(file_key)
+        if digest is None:
+            with open(path, "rb") as rules_file:
+                content = rules_file.read()
+            digest = hashlib.sha256(content).hexdigest()
+            _digests[file_key] = digest
+            if digest not in _catalogs:
+                _catalogs[digest] = RuleCatalog(json.loads(content), digest)
+        return _catalogs[digest]
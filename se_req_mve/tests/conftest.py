@@ -0,0 +1,14 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(TESTS_DIR))
+MODELS_DIR = os.path.join(REPO_ROOT, "se_req_mve", "models")
+FLOW_DIR = os.path.join(MODELS_DIR, "experiment_flow")
+
+# llmops is imported from the repository root, the experiment flow features
+# as the experiment_flow package and its nodes and utils from the flow
+# directory, as promptflow runs them
+for path in (REPO_ROOT, MODELS_DIR, FLOW_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
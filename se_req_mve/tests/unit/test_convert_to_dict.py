@@ -0,0 +1,58 @@
+"""Test for the convert_to_dict node of experiment_flow"""
+
+import pytest
+
+pytest.importorskip("promptflow")
+
+from convert_to_dict import convert_to_dict  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "verdict, violation",
+    [("yes", True), ("Correct", True), ("true", True), ("no", False), (False, False)],
+)
+def test_single_rule_output(verdict, violation):
+    output = convert_to_dict(f'{{"violation": "{verdict}", "reason": "vague"}}')
+
+    assert output == {"violation": violation, "reason": "vague", "violations": {}}
+
+
+def test_multi_rule_output():
+    output = convert_to_dict('{"R1": "yes", "R2": "no", "R3": false}')
+
+    assert output == {
+        "violation": True,
+        "violations": {"R1": True, "R2": False, "R3": False},
+    }
+
+
+def test_multi_rule_output_without_violation():
+    output = convert_to_dict('{"R1": "no", "R2": "no"}')
+
+    assert output == {"violation": False, "violations": {"R1": False, "R2": False}}
+
+
+@pytest.mark.parametrize(
+    "input_str", ["not json", "{}", '{"R1": {"violation": "yes"}}', "null"]
+)
+def test_invalid_output(input_str):
+    output = convert_to_dict(input_str)
+
+    assert output["violation"] is None
+    assert output["violations"] is None
+
+
+def test_packed_output():
+    output = convert_to_dict(
+        '[{"id": "0", "violation": "no"}, {"id": 1, "violation": "yes"}]'
+    )
+
+    assert output == {"violation": True, "violations": {"0": False, "1": True}}
+
+
+def test_packed_output_leaves_out_malformed_items():
+    output = convert_to_dict(
+        '[{"id": "0", "violation": "no"}, {"id": "1"}, "yes", {"violation": "yes"}]'
+    )
+
+    assert output == {"violation": False, "violations": {"0": False}}
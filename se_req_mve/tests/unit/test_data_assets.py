@@ -0,0 +1,97 @@
+"""Test for llmops.common.data_assets"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from llmops.common.data_assets import DataAssetIndex
+
+
+class FakeData:
+    """Data assets of a workspace, by name and latest version."""
+
+    def __init__(self, versions):
+        self.versions = dict(versions)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, name, label=None):
+        with self._lock:
+            self.calls.append(name)
+        if name not in self.versions:
+            raise Exception(f"Data asset {name} not found")
+        return SimpleNamespace(name=name, version=self.versions[name])
+
+
+def ml_client(**versions):
+    return SimpleNamespace(data=FakeData(versions))
+
+
+@pytest.fixture
+def index_file(tmp_path):
+    return str(tmp_path / "data_assets_index.json")
+
+
+def test_resolve_fetches_each_missing_asset_once(index_file):
+    client = ml_client(train=3, test=1)
+    index = DataAssetIndex(client, index_file, build_id="42")
+
+    data_ids = index.resolve(["train", "test", "train"])
+
+    assert data_ids == ["azureml:train:3", "azureml:test:1", "azureml:train:3"]
+    assert sorted(client.data.calls) == ["test", "train"]
+    assert index.data_id("train") == "azureml:train:3"
+    assert len(client.data.calls) == 2
+
+
+def test_recorded_version_is_not_fetched(index_file):
+    client = ml_client(train=3)
+    index = DataAssetIndex(client, index_file, build_id="42")
+
+    index.record("train", 4)
+
+    assert index.resolve(["train"]) == ["azureml:train:4"]
+    assert client.data.calls == []
+
+
+def test_index_is_shared_by_the_steps_of_a_build(index_file):
+    index = DataAssetIndex(ml_client(train=3), index_file, build_id="42")
+    index.index_config(
+        [
+            {"DATASET_NAME": "train"},
+            {"DATASET_NAME": "test", "RELATED_EXP_DATASET": "train"},
+        ]
+    )
+    index.resolve(["train"])
+
+    later_step = DataAssetIndex(ml_client(), index_file, build_id="42")
+    assert later_step.data_id("train") == "azureml:train:3"
+    assert later_step.related_dataset("train") == "test"
+    assert later_step.ml_client.data.calls == []
+
+    next_build = DataAssetIndex(ml_client(train=5), index_file, build_id="43")
+    assert next_build.versions == {}
+    assert next_build.data_id("train") == "azureml:train:5"
+
+
+def test_lazy_resolution_leaves_unregistered_assets_pending(index_file):
+    client = ml_client(train=3)
+    index = DataAssetIndex(client, index_file, build_id="42")
+
+    data_ids = index.resolve(["train", "test"], lazy=True)
+
+    assert data_ids == ["azureml:train:3", None]
+    assert index.pending == {"test"}
+
+    # the evaluation dataset is registered by a later step
+    client.data.versions["test"] = 2
+    assert index.data_id("test") == "azureml:test:2"
+    assert index.pending == set()
+
+
+def test_unregistered_asset_fails_without_lazy(index_file):
+    index = DataAssetIndex(ml_client(), index_file, build_id="42")
+
+    with pytest.raises(Exception, match="test not found"):
+        index.resolve(["test"])
@@ -0,0 +1,97 @@
+"""Test for experiment_flow.features.evaluation"""
+
+import json
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("promptflow")
+
+from experiment_flow.features.evaluation import (  # noqa: E402
+    ConfusionCounts,
+    calculate_metrics,
+)
+from experiment_flow.features.prediction_sink import PredictionSink  # noqa: E402
+
+NUMERIC_METRICS = [
+    "recall",
+    "precision",
+    "f1",
+    "accuracy_score",
+    "balanced_accuracy_score",
+]
+
+
+def counts_of(predictions, truth):
+    counts = ConfusionCounts()
+    for prediction, line_truth in zip(predictions, truth):
+        counts.add(prediction, line_truth)
+    return counts
+
+
+def random_lines(seed, size=50):
+    rng = random.Random(seed)
+    predictions = [rng.random() < 0.4 for _ in range(size)]
+    truth = [int(rng.random() < 0.3) for _ in range(size)]
+    return predictions, truth
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_counts_match_calculate_metrics(seed):
+    predictions, truth = random_lines(seed)
+
+    expected = calculate_metrics(predictions, truth)
+    metrics = counts_of(predictions, truth).metrics()
+
+    for name in NUMERIC_METRICS:
+        assert metrics[name] == pytest.approx(expected[name])
+    assert metrics["confusion_matrix"] == expected["confusion_matrix"]
+
+
+# sklearn warns about the class missing from the truth or the predictions
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize(
+    "predictions, truth",
+    [
+        ([False, False, False], [0, 0, 0]),
+        ([True, False, True], [1, 1, 1]),
+        ([True, True], [0, 0]),
+        ([False, False], [1, 0]),
+    ],
+)
+def test_counts_match_calculate_metrics_without_a_class(predictions, truth):
+    expected = calculate_metrics(predictions, truth)
+    metrics = counts_of(predictions, truth).metrics()
+
+    for name in NUMERIC_METRICS:
+        assert metrics[name] == pytest.approx(expected[name])
+
+
+def test_unanswered_predictions_are_left_out():
+    counts = counts_of([True, None, False, None], [1, 1, 0, 0])
+
+    assert counts.unanswered == 2
+    assert counts.metrics() == calculate_metrics([True, False], [1, 0])
+
+
+def test_prediction_sink_streams_replicates(tmp_path):
+    sink = PredictionSink(str(tmp_path / "predictions"))
+    predictions, truth = random_lines(0, size=10)
+    for index, (prediction, line_truth) in enumerate(zip(predictions, truth)):
+        sink.write(0, index, {"text": f"line {index}"}, prediction, line_truth)
+    sink.write(1, 3, {"text": "line 3"}, None, 1)
+    sink.close()
+
+    with open(tmp_path / "predictions" / "replicate_000.jsonl") as replicate_file:
+        records = [json.loads(line) for line in replicate_file]
+    assert [record["prediction"] for record in records] == predictions
+    assert records[3] == {
+        "index": 3,
+        "line": {"text": "line 3"},
+        "prediction": predictions[3],
+        "truth": truth[3],
+    }
+    assert sink.metrics(0) == calculate_metrics(predictions, truth)
+    assert sink.counts[1].unanswered == 1
@@ -0,0 +1,78 @@
+"""Test for llmops.common.experiment_planner"""
+
+import itertools
+
+import pytest
+
+from llmops.common.experiment_planner import (
+    FRACTIONAL_FACTORIAL,
+    FULL_FACTORIAL,
+    ONE_AT_A_TIME,
+    FlowVariants,
+    enumerate_design,
+)
+
+
+@pytest.fixture
+def flow_variants():
+    return FlowVariants(
+        defaults={"classify": "c0", "prepare": "p0", "convert": "v0"},
+        variants={
+            "classify": ["c0", "c1", "c2"],
+            "prepare": ["p0", "p1"],
+            "convert": ["v0", "v1", "v2"],
+        },
+    )
+
+
+def test_pairwise_design_covers_every_pair(flow_variants):
+    points = enumerate_design(flow_variants, FRACTIONAL_FACTORIAL)
+
+    covered = {
+        pair
+        for point in points
+        for pair in itertools.combinations(sorted(point.assignments.items()), 2)
+    }
+    nodes = sorted(flow_variants.variants)
+    for node_a, node_b in itertools.combinations(nodes, 2):
+        for variant_a in flow_variants.variants[node_a]:
+            for variant_b in flow_variants.variants[node_b]:
+                assert ((node_a, variant_a), (node_b, variant_b)) in covered
+
+
+def test_pairwise_design_is_smaller_than_full_factorial(flow_variants):
+    pairwise = enumerate_design(flow_variants, FRACTIONAL_FACTORIAL)
+    full = enumerate_design(flow_variants, FULL_FACTORIAL)
+
+    assert len(full) == 18
+    assert len(pairwise) < len(full)
+    assert len({tuple(sorted(p.assignments.items())) for p in pairwise}) == len(
+        pairwise
+    )
+
+
+def test_pairwise_design_starts_with_baseline(flow_variants):
+    points = enumerate_design(flow_variants, FRACTIONAL_FACTORIAL)
+
+    assert points[0].assignments == flow_variants.defaults
+    assert points[0].changed == {}
+
+
+def test_one_at_a_time_changes_one_node(flow_variants):
+    points = enumerate_design(flow_variants, ONE_AT_A_TIME)
+
+    # the baseline is shared by the three nodes
+    assert len(points) == 1 + 2 + 1 + 2
+    assert all(len(point.changed) <= 1 for point in points)
+
+
+def test_flow_without_variants_has_one_point():
+    points = enumerate_design(FlowVariants(), FRACTIONAL_FACTORIAL)
+
+    assert len(points) == 1
+    assert points[0].variant_id is None
+
+
+def test_unknown_design_is_rejected(flow_variants):
+    with pytest.raises(ValueError):
+        enumerate_design(flow_variants, "latin_square")
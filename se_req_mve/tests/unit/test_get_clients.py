@@ -0,0 +1,145 @@
+"""Test for llmops.common.utils.get_clients"""
+
+import json
+import os
+import stat
+import time
+
+import pytest
+
+pytest.importorskip("azure.identity")
+pytest.importorskip("promptflow.azure")
+
+from azure.core.credentials import AccessToken  # noqa: E402
+
+from llmops.common.utils import get_clients  # noqa: E402
+from llmops.common.utils.get_clients import (  # noqa: E402
+    TOKEN_REFRESH_MARGIN,
+    CachedTokenCredential,
+)
+
+SCOPE = "https://management.azure.com/.default"
+
+
+class FakeCredential:
+    """Issues numbered tokens valid for `lifetime` seconds."""
+
+    def __init__(self, lifetime=3600):
+        self.lifetime = lifetime
+        self.calls = []
+
+    def get_token(self, *scopes, **kwargs):
+        self.calls.append((scopes, kwargs))
+        return AccessToken(
+            f"token_{len(self.calls)}", int(time.time()) + self.lifetime
+        )
+
+
+class FakeClient:
+    def __init__(self, credential, *args, **kwargs):
+        self.credential = credential
+        self.args = args
+        self.kwargs = kwargs
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """An empty client pool building fake clients."""
+    monkeypatch.setattr(get_clients, "_credential", None)
+    monkeypatch.setattr(get_clients, "_ml_clients", {})
+    monkeypatch.setattr(get_clients, "_pf_clients", {})
+    monkeypatch.setattr(
+        get_clients, "DefaultAzureCredential", lambda **kwargs: FakeCredential()
+    )
+    monkeypatch.setattr(get_clients, "MLClient", FakeClient)
+    monkeypatch.setattr(get_clients, "PFClient", FakeClient)
+    monkeypatch.delenv(get_clients.TOKEN_CACHE_ENV, raising=False)
+
+
+def test_clients_are_pooled_per_workspace(pool):
+    workspace = ("subscription", "group", "workspace")
+
+    ml_client = get_clients.get_ml_client(*workspace)
+    pf_client = get_clients.get_pf_client(*workspace)
+
+    assert get_clients.get_ml_client(*workspace) is ml_client
+    assert get_clients.get_pf_client(*workspace) is pf_client
+    # the PFClient reuses the pooled MLClient and the shared credential
+    assert pf_client.kwargs["ml_client"] is ml_client
+    assert pf_client.credential is ml_client.credential
+    assert isinstance(ml_client.credential, CachedTokenCredential)
+
+    other = get_clients.get_ml_client("subscription", "group", "other")
+    assert other is not ml_client
+    assert other.credential is ml_client.credential
+
+
+def test_token_is_reused_until_close_to_expiry():
+    credential = FakeCredential(lifetime=3600)
+    cached = CachedTokenCredential(credential)
+
+    first = cached.get_token(SCOPE)
+
+    assert cached.get_token(SCOPE) is first
+    assert len(credential.calls) == 1
+    # other scopes and tenants have their own token
+    cached.get_token(SCOPE, tenant_id="tenant")
+    assert len(credential.calls) == 2
+
+    credential.lifetime = TOKEN_REFRESH_MARGIN - 1
+    cached = CachedTokenCredential(credential)
+    expiring = cached.get_token(SCOPE)
+
+    assert cached.get_token(SCOPE).token != expiring.token
+    assert len(credential.calls) == 4
+
+
+def test_claims_challenges_bypass_the_cache():
+    credential = FakeCredential()
+    cached = CachedTokenCredential(credential)
+    cached.get_token(SCOPE)
+
+    cached.get_token(SCOPE, claims='{"access_token": {}}')
+
+    assert len(credential.calls) == 2
+
+
+def test_disk_cache_is_private_and_shared_between_processes(tmp_path):
+    cache_file = str(tmp_path / "token_cache.json")
+    credential = FakeCredential()
+
+    token = CachedTokenCredential(credential, cache_file).get_token(SCOPE)
+
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ["token_cache.json"]
+    # a later step of the build reads the token back from disk
+    other_step = FakeCredential()
+    reloaded = CachedTokenCredential(other_step, cache_file).get_token(SCOPE)
+    assert reloaded.token == token.token
+    assert reloaded.expires_on == token.expires_on
+    assert other_step.calls == []
+
+
+def test_expired_disk_token_is_refreshed_and_rewritten(tmp_path):
+    cache_file = tmp_path / "token_cache.json"
+    key = json.dumps([[SCOPE], None])
+    cache_file.write_text(
+        json.dumps({key: {"token": "stale", "expires_on": int(time.time())}})
+    )
+    credential = FakeCredential()
+
+    token = CachedTokenCredential(credential, str(cache_file)).get_token(SCOPE)
+
+    assert token.token == "token_1"
+    assert json.loads(cache_file.read_text())[key]["token"] == "token_1"
+
+
+def test_unreadable_disk_cache_is_ignored(tmp_path):
+    cache_file = tmp_path / "token_cache.json"
+    cache_file.write_text("{not json")
+    credential = FakeCredential()
+
+    token = CachedTokenCredential(credential, str(cache_file)).get_token(SCOPE)
+
+    assert token.token == "token_1"
+    assert len(credential.calls) == 1
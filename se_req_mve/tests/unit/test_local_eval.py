@@ -0,0 +1,88 @@
+"""Test for llmops.common.local_eval"""
+
+import os
+
+import pytest
+
+pytest.importorskip("promptflow")
+pytest.importorskip("sklearn")
+
+import pandas as pd  # noqa: E402
+from promptflow.executor import FlowExecutor  # noqa: E402
+
+from llmops.common.local_eval import LocalEvalFlow, is_local_flow  # noqa: E402
+
+MODELS = os.path.join(os.path.dirname(__file__), "..", "..", "models")
+EVALUATION_FLOW = os.path.join(MODELS, "evaluation")
+COLUMN_MAPPING = {
+    "truth": "${data.r18}",
+    "prediction": "${run.outputs.violation}",
+}
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame(
+        {
+            "text": [f"requirement {line}" for line in range(6)],
+            "r18": [True, False, True, False, True, False],
+        }
+    )
+
+
+@pytest.fixture
+def run_details():
+    # lines of a bulk run complete out of order, line 3 failed
+    return pd.DataFrame(
+        {
+            "inputs.line_number": [4, 0, 2, 1, 5],
+            "outputs.violation": ["true", "yes", "no", "no", "Yes"],
+        }
+    )
+
+
+def reference_evaluation(data, run_details):
+    """Outputs and metrics of the evaluation flow run by promptflow."""
+    executor = FlowExecutor.create(
+        os.path.join(EVALUATION_FLOW, "flow.dag.yaml"), connections={}
+    )
+    inputs = [
+        {"truth": bool(data["r18"][line]), "prediction": prediction}
+        for line, prediction in zip(
+            run_details["inputs.line_number"], run_details["outputs.violation"]
+        )
+    ]
+    results = [
+        executor.exec_line(line_inputs, index=index)
+        for index, line_inputs in enumerate(inputs)
+    ]
+    aggregation = executor.exec_aggregation(
+        {name: [line[name] for line in inputs] for name in inputs[0]},
+        {
+            reference: [result.aggregation_inputs[reference] for result in results]
+            for reference in results[0].aggregation_inputs
+        },
+    )
+    return [result.output["correct"] for result in results], aggregation.metrics
+
+
+def test_evaluation_flow_runs_locally():
+    assert is_local_flow(EVALUATION_FLOW)
+    # LLM nodes need the remote runtime
+    assert not is_local_flow(os.path.join(MODELS, "experiment_flow"))
+
+
+def test_matches_the_evaluation_flow_run_by_promptflow(data, run_details):
+    expected_correct, expected_metrics = reference_evaluation(data, run_details)
+
+    details, metrics = LocalEvalFlow(EVALUATION_FLOW).run(
+        COLUMN_MAPPING, data, run_details
+    )
+
+    assert list(details["outputs.correct"]) == expected_correct
+    assert metrics == pytest.approx(expected_metrics)
+    assert list(details["inputs.line_number"]) == [4, 0, 2, 1, 5]
+    assert list(details["inputs.truth"]) == [True, True, True, False, False]
+    assert list(details["inputs.prediction"]) == list(
+        run_details["outputs.violation"]
+    )
@@ -0,0 +1,104 @@
+"""Test for experiment_flow.features.experiment"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("promptflow")
+pytest.importorskip("sklearn")
+
+from convert_to_dict import convert_to_dict  # noqa: E402
+from experiment_flow.features import experiment  # noqa: E402
+from experiment_flow.features.retry_policy import RetryPolicy  # noqa: E402
+
+BATCHED_FLOW = "../batched_flow"
+RULE_IDS = ["r3", "r7"]
+
+
+class FakePFClient:
+    """Answers each call with `answer(query)`, the raw LLM output, parsed
+    by the convert_to_dict node as the flow does."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    def test(self, flow, inputs, variant):
+        self.calls.append((flow, inputs, variant))
+        return {"output": convert_to_dict(self.answer(inputs["query"]))}
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    lines = [
+        {"text": "The pump shall start.", "r3": 0, "r7": 1},
+        {"text": "The valve shall be fast.", "r3": 1, "r7": 0},
+        {"text": "The system shall be nice.", "r3": 1, "r7": 1},
+    ]
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps(lines))
+    return str(path)
+
+
+@pytest.fixture
+def flow_dir(monkeypatch):
+    # the flow paths of the engine are relative to the flow directory
+    monkeypatch.chdir(experiment.__file__.rsplit("/features/", 1)[0])
+
+
+def use_client(monkeypatch, pf):
+    monkeypatch.setattr(experiment, "get_promptflow_client", lambda **k: (pf, None))
+
+
+def run_multi_rule_flow(dataset, runs=2):
+    return experiment.run_multi_rule_flow(
+        dataset,
+        BATCHED_FLOW,
+        "incose_rules.json",
+        "text",
+        RULE_IDS,
+        SimpleNamespace(),
+        runs,
+        retry_policy=RetryPolicy(base_delay=0, max_delay=0),
+    )
+
+
+def test_multi_rule_flow_fans_out_verdict_maps(monkeypatch, dataset, flow_dir):
+    pf = FakePFClient(lambda query: '{"r3": "yes", "r7": "no"}')
+    use_client(monkeypatch, pf)
+
+    outputs = run_multi_rule_flow(dataset)
+
+    # one call per line and replicate for both rules
+    assert len(pf.calls) == 3 * 2
+    assert {inputs["rule_id"] for _, inputs, _ in pf.calls} == {"r3,r7"}
+    metrics, predictions, truth, lines = outputs["r3"]
+    assert predictions == [[True, True]] * 3
+    assert truth == [0, 1, 1]
+    assert metrics[0]["recall"] == 1.0
+    assert outputs["r7"][1] == [[False, False]] * 3
+
+
+def test_multi_rule_flow_leaves_unparsable_lines_unanswered(
+    monkeypatch, dataset, flow_dir
+):
+    def answer(query):
+        if query == "The valve shall be fast.":
+            return "I cannot classify this requirement."
+        return '{"r3": "yes", "r7": "yes"}'
+
+    use_client(monkeypatch, FakePFClient(answer))
+
+    outputs = run_multi_rule_flow(dataset)
+
+    for rule_id in RULE_IDS:
+        assert outputs[rule_id][1] == [[True, True], [None, None], [True, True]]
+    # the unanswered line is left out of the metrics: r3 is violated by the
+    # third line only, r7 by the first and the third
+    for replicate_metrics in outputs["r3"][0]:
+        assert replicate_metrics["accuracy_score"] == 0.5
+        assert replicate_metrics["confusion_matrix"] == "[[0 1], [0 1]]"
+    for replicate_metrics in outputs["r7"][0]:
+        assert replicate_metrics["accuracy_score"] == 1.0
+        assert replicate_metrics["confusion_matrix"] == "[[0 0], [0 2]]"
@@ -0,0 +1,130 @@
+"""Test for experiment_flow.features.packing"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+pytest.importorskip("promptflow")
+
+from experiment_flow.features.packing import (  # noqa: E402
+    PackingStats,
+    make_packs,
+    process_pack_async,
+)
+from experiment_flow.features.rate_limiter import RateLimiter  # noqa: E402
+from experiment_flow.features.response_cache import ResponseCache  # noqa: E402
+from experiment_flow.features.retry_policy import RetryPolicy  # noqa: E402
+
+
+class FakePFClient:
+    """Answers each call with the verdicts `answer` gives for the item IDs
+    of the call, and records the item IDs of every call."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = []
+
+    def test(self, flow, inputs, variant):
+        ids = [item["id"] for item in inputs["requirements"]]
+        self.calls.append(ids)
+        return {"output": self.answer(len(self.calls), ids)}
+
+
+def all_verdicts(call, ids):
+    return {"violations": {item_id: "yes" for item_id in ids}}
+
+
+def process(pf, pack, stats=None, **kwargs):
+    async def run():
+        return await process_pack_async(
+            pf,
+            pack,
+            "text",
+            "r7",
+            "hypothesis_packed",
+            "violations",
+            "model_path",
+            "rules.json",
+            0,
+            RateLimiter(),
+            asyncio.Semaphore(4),
+            stats if stats is not None else PackingStats(),
+            policy=RetryPolicy(base_delay=0, max_delay=0),
+            **kwargs,
+        )
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def pack():
+    data = [{"text": f"requirement {i}", "r7": i % 2 == 0} for i in range(4)]
+    return make_packs(data, 4)[0]
+
+
+def test_make_packs_keeps_dataset_indexes():
+    packs = make_packs([{"text": "a"}, {"text": "b"}, {"text": "c"}], 2)
+
+    assert packs == [[(0, {"text": "a"}), (1, {"text": "b"})], [(2, {"text": "c"})]]
+
+
+def test_verdicts_are_demultiplexed_in_pack_order(pack):
+    def answer(call, ids):
+        return {"violations": {"3": "yes", "1": "no", "0": "no", "2": "yes"}}
+
+    pf = FakePFClient(answer)
+    stats = PackingStats()
+
+    assert process(pf, pack, stats) == [False, False, True, True]
+    assert pf.calls == [["0", "1", "2", "3"]]
+    assert (stats.calls, stats.splits) == (1, 0)
+
+
+def test_only_items_without_verdict_are_packed_again(pack):
+    def answer(call, ids):
+        if call == 1:
+            return {"violations": {"0": "yes", "2": "no"}}
+        return all_verdicts(call, ids)
+
+    pf = FakePFClient(answer)
+    stats = PackingStats()
+
+    assert process(pf, pack, stats) == [True, True, False, True]
+    assert pf.calls == [["0", "1", "2", "3"], ["1", "3"]]
+    assert stats.splits == 0
+
+
+@pytest.mark.parametrize("output", [{}, None, "no verdicts", {"violations": "yes"}])
+def test_pack_without_verdicts_is_split(pack, output):
+    def answer(call, ids):
+        return output if call == 1 else all_verdicts(call, ids)
+
+    pf = FakePFClient(answer)
+    stats = PackingStats()
+
+    assert process(pf, pack, stats) == [True] * 4
+    assert pf.calls[0] == ["0", "1", "2", "3"]
+    assert sorted(pf.calls[1:]) == [["0", "1"], ["2", "3"]]
+    assert (stats.calls, stats.splits) == (3, 1)
+
+
+def test_single_item_is_retried_up_to_retry_times(pack):
+    pf = FakePFClient(lambda call, ids: {"violations": {}})
+
+    assert process(pf, pack[:1], retry=3) == [None]
+    assert pf.calls == [["0"]] * 3
+
+
+def test_complete_packs_are_cached(tmp_path, pack):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    pf = FakePFClient(all_verdicts)
+
+    first = process(pf, pack, cache=cache, cache_scope="scope")
+    second = process(pf, pack, cache=cache, cache_scope="scope")
+
+    assert first == second == [True] * 4
+    assert len(pf.calls) == 1
+    assert cache.hits == 1
+    cache.close()
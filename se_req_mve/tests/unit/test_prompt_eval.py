@@ -0,0 +1,139 @@
+"""Test for llmops.common.prompt_eval"""
+
+import json
+import os
+
+import pytest
+
+pytest.importorskip("promptflow")
+pytest.importorskip("azure.ai.ml")
+pytest.importorskip("pyarrow")
+
+import pandas as pd  # noqa: E402
+
+from llmops.common import prompt_eval, prompt_pipeline  # noqa: E402
+from llmops.common.orchestration_benchmark import (  # noqa: E402
+    STAGE,
+    USE_CASE,
+    rule_names,
+    write_use_case,
+)
+from llmops.common.prompt_eval import merge_flow_results  # noqa: E402
+from llmops.common.simulation import (  # noqa: E402
+    SimulatedPFClient,
+    SimulationConfig,
+)
+
+EXPERIMENT_NAME = f"{USE_CASE}_{STAGE}"
+
+
+def test_merge_flow_results_joins_flows_by_line():
+    merged = merge_flow_results(
+        {
+            "accuracy": pd.DataFrame(
+                {
+                    "inputs.line_number": [1, 0],
+                    "inputs.truth": [True, False],
+                    "outputs.correct": [True, False],
+                }
+            ),
+            "groundedness": pd.DataFrame(
+                {
+                    "inputs.line_number": [0, 2],
+                    "outputs.score": [4, 5],
+                }
+            ),
+        }
+    )
+
+    assert list(merged.columns) == [
+        "line_number",
+        "accuracy.outputs.correct",
+        "groundedness.outputs.score",
+    ]
+    assert list(merged["line_number"]) == [0, 1, 2]
+    assert list(merged["groundedness.outputs.score"].fillna(-1)) == [4, -1, 5]
+
+
+@pytest.fixture
+def use_case(tmp_path, monkeypatch):
+    """A synthetic use case with two evaluation flows."""
+    monkeypatch.chdir(tmp_path)
+    write_use_case(variants=2, rules=1, rows=3)
+    config_path = f"{USE_CASE}/llmops_config.json"
+    with open(config_path) as config_file:
+        config = json.load(config_file)
+    config["envs"][0]["EVALUATION_FLOW_PATH"] = \
+        "flows/evaluation,flows/evaluation_b"
+    with open(config_path, "w") as config_file:
+        json.dump(config, config_file)
+    mapping_path = f"{USE_CASE}/configs/mapping_config.json"
+    with open(mapping_path) as mapping_file:
+        mapping = json.load(mapping_file)
+    mapping["evaluation"]["evaluation_b"] = mapping["evaluation"]["evaluation"]
+    with open(mapping_path, "w") as mapping_file:
+        json.dump(mapping, mapping_file)
+    os.makedirs(f"{USE_CASE}/flows/evaluation_b")
+    with open(f"{USE_CASE}/flows/evaluation/flow.dag.yaml") as flow_file:
+        flow = flow_file.read()
+    with open(f"{USE_CASE}/flows/evaluation_b/flow.dag.yaml", "w") as flow_file:
+        flow_file.write(flow)
+
+
+@pytest.fixture
+def pf():
+    return SimulatedPFClient(
+        SimulationConfig(
+            submit_latency=0, queue_latency=0, execute_latency=0,
+            latency_sigma=0, detail_rows=3, seed=0,
+        )
+    )
+
+
+def test_fan_out_evaluates_each_run_with_all_flows_at_once(use_case, pf):
+    prompt_pipeline.prepare_and_execute(
+        subscription_id="simulated",
+        build_id="1",
+        flow_to_execute=USE_CASE,
+        stage=STAGE,
+        output_file=None,
+        data_purpose="training_data",
+        save_output=False,
+        save_metric=False,
+        rules=rule_names(1),
+        use_run_cache=False,
+        manifest_file="run_manifest.jsonl",
+        pf=pf,
+        ml_client=pf.ml_client,
+    )
+    experiment_runs = [run.name for run in pf.simulated_runs]
+
+    prompt_eval.prepare_and_execute(
+        subscription_id="simulated",
+        build_id="1",
+        stage=STAGE,
+        run_id=None,
+        data_purpose="test_data",
+        flow_to_execute=USE_CASE,
+        rules=rule_names(1),
+        manifest_file="run_manifest.jsonl",
+        pf=pf,
+        fan_out=True,
+    )
+
+    eval_runs = pf.simulated_runs[len(experiment_runs):]
+    # both flows of a run are submitted before the next run is evaluated
+    assert [run.run for run in eval_runs] == [
+        name for name in experiment_runs for _ in range(2)
+    ]
+    assert {os.path.basename(run.flow) for run in eval_runs[:2]} == {
+        "evaluation", "evaluation_b"
+    }
+
+    merged = pd.read_parquet(f"reports/{EXPERIMENT_NAME}_eval_merged")
+    assert sorted(merged["exp_run"].astype(str).unique()) == \
+        sorted(experiment_runs)
+    assert len(merged) == 3 * len(experiment_runs)
+    assert {
+        "evaluation.outputs.violation", "evaluation_b.outputs.violation"
+    } <= set(merged.columns)
@@ -0,0 +1,98 @@
+"""Test for llmops.common.prompt_pipeline"""
+
+import os
+
+import pytest
+
+pytest.importorskip("promptflow")
+pytest.importorskip("azure.ai.ml")
+
+from llmops.common import prompt_pipeline  # noqa: E402
+from llmops.common.orchestration_benchmark import (  # noqa: E402
+    STAGE,
+    USE_CASE,
+    rule_names,
+    write_use_case,
+)
+from llmops.common.prompt_pipeline import unique_run_name  # noqa: E402
+from llmops.common.simulation import (  # noqa: E402
+    SimulatedPFClient,
+    SimulationConfig,
+)
+
+
+def test_unique_run_name_suffixes_names_taken_in_the_matrix():
+    run_names = set()
+
+    names = [
+        unique_run_name("exp_variant_0_r3_20240101_120000_data", run_names)
+        for _ in range(3)
+    ]
+
+    assert names == [
+        "exp_variant_0_r3_20240101_120000_data",
+        "exp_variant_0_r3_20240101_120000_data_1",
+        "exp_variant_0_r3_20240101_120000_data_2",
+    ]
+    assert run_names == set(names)
+
+
+@pytest.fixture
+def use_case(tmp_path, monkeypatch):
+    """A synthetic use case with two variants, in the working directory."""
+    monkeypatch.chdir(tmp_path)
+    write_use_case(variants=2, rules=1, rows=3)
+
+
+@pytest.fixture
+def pf():
+    return SimulatedPFClient(
+        SimulationConfig(
+            submit_latency=0, queue_latency=0, execute_latency=0,
+            latency_sigma=0, detail_rows=3, seed=0,
+        )
+    )
+
+
+def execute(pf, **options):
+    prompt_pipeline.prepare_and_execute(
+        subscription_id="simulated",
+        build_id="1",
+        flow_to_execute=USE_CASE,
+        stage=STAGE,
+        output_file="run_ids.txt",
+        data_purpose="training_data",
+        save_output=True,
+        save_metric=True,
+        rules=rule_names(1),
+        use_run_cache=False,
+        pf=pf,
+        ml_client=pf.ml_client,
+        **options,
+    )
+
+
+def test_evaluate_submits_evaluation_after_each_experiment_run(use_case, pf):
+    execute(pf, evaluate=True, max_concurrent_runs=1)
+
+    runs = pf.simulated_runs
+    experiment_runs = [run for run in runs if run.run is None]
+    eval_runs = [run for run in runs if run.run is not None]
+    assert len(experiment_runs) == 2
+    # every experiment run is evaluated as soon as it completed, ahead of
+    # the experiment runs still pending
+    assert [run.run for run in runs[1::2]] == [run.name for run in runs[::2]]
+    assert {run.run for run in eval_runs} == {
+        run.name for run in experiment_runs
+    }
+    eval_reports = os.path.join("reports", f"{USE_CASE}_{STAGE}_eval_result")
+    assert os.listdir(eval_reports)
+
+
+def test_without_evaluate_only_experiment_runs_are_submitted(use_case, pf):
+    execute(pf)
+
+    assert [run.run for run in pf.simulated_runs] == [None, None]
+    assert not os.path.exists(
+        os.path.join("reports", f"{USE_CASE}_{STAGE}_eval_result")
+    )
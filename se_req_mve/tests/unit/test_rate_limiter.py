@@ -0,0 +1,122 @@
+"""Test for experiment_flow.features.rate_limiter"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from experiment_flow.features import rate_limiter
+from experiment_flow.features.rate_limiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(
+        rate_limiter,
+        "asyncio",
+        SimpleNamespace(
+            sleep=clock.sleep,
+            Lock=asyncio.Lock,
+            get_running_loop=asyncio.get_running_loop,
+        ),
+    )
+    return clock
+
+
+def test_bucket_starts_full(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.delay(60) == 0
+
+
+def test_bucket_refills_at_its_per_minute_rate(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+
+    assert bucket.delay(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.delay(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.delay(1) == 0
+
+
+def test_bucket_refills_up_to_its_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.take(10)
+    clock.now += 3600
+
+    assert bucket.delay(60) == 0
+    bucket.take(60)
+    assert bucket.delay(1) == pytest.approx(1.0)
+
+
+def test_bucket_serves_amounts_larger_than_capacity_from_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.take(1)
+
+    assert bucket.delay(600) == pytest.approx(1.0)
+    clock.now += 1
+    assert bucket.delay(600) == 0
+    bucket.take(600)
+    assert bucket.level == 0
+
+
+def test_limiter_without_limits_never_waits(clock):
+    limiter = RateLimiter()
+
+    async def acquire_all():
+        for _ in range(100):
+            await limiter.acquire(1000)
+
+    asyncio.run(acquire_all())
+
+    assert clock.sleeps == []
+
+
+def test_limiter_enforces_requests_per_minute(clock):
+    limiter = RateLimiter(requests_per_minute=2)
+
+    async def acquire_all():
+        for _ in range(4):
+            await limiter.acquire()
+
+    asyncio.run(acquire_all())
+
+    # two requests fit in the bucket, each next one waits 30s
+    assert clock.now == pytest.approx(60)
+
+
+def test_limiter_enforces_tokens_per_minute(clock):
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=600)
+
+    async def acquire_all():
+        await limiter.acquire(600)
+        await limiter.acquire(300)
+
+    asyncio.run(acquire_all())
+
+    assert clock.now == pytest.approx(30)
+
+
+def test_limiter_can_be_shared_by_successive_event_loops(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+
+    asyncio.run(limiter.acquire())
+    asyncio.run(limiter.acquire())
+
+    assert limiter.requests.level == pytest.approx(58)
@@ -0,0 +1,93 @@
+"""Test for experiment_flow.features.response_cache"""
+
+import os
+import shutil
+
+import pytest
+
+from experiment_flow.features.response_cache import ResponseCache, flow_fingerprint
+
+FLOW_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "..", "models", "experiment_flow"
+)
+
+
+@pytest.fixture
+def flow_dir(tmp_path):
+    path = tmp_path / "experiment_flow"
+    shutil.copytree(FLOW_DIR, path, ignore=shutil.ignore_patterns("__pycache__"))
+    return path
+
+
+def append_line(path):
+    with open(path, "a") as source_file:
+        source_file.write("\n# changed\n")
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "prompts/hypothesis001.jinja2",
+        "prepare_rule.py",
+        "convert_to_dict.py",
+        "utils/rule_catalog.py",
+        "utils/logger.py",
+    ],
+)
+def test_fingerprint_changes_with_flow_code(flow_dir, source):
+    fingerprint = flow_fingerprint(str(flow_dir), "hypothesis001")
+
+    append_line(flow_dir / source)
+
+    assert flow_fingerprint(str(flow_dir), "hypothesis001") != fingerprint
+
+
+@pytest.mark.parametrize(
+    "source", ["prompts/hypothesis002.jinja2", "features/experiment.py"]
+)
+def test_fingerprint_ignores_code_outside_the_variant(flow_dir, source):
+    fingerprint = flow_fingerprint(str(flow_dir), "hypothesis001")
+
+    append_line(flow_dir / source)
+
+    assert flow_fingerprint(str(flow_dir), "hypothesis001") == fingerprint
+
+
+def test_fingerprint_changes_with_node_settings(flow_dir):
+    fingerprint = flow_fingerprint(str(flow_dir), "hypothesis001")
+    flow_file = flow_dir / "flow.dag.yaml"
+
+    flow = flow_file.read_text()
+    flow_file.write_text(flow.replace("max_tokens: 20", "max_tokens: 30", 1))
+
+    assert flow_fingerprint(str(flow_dir), "hypothesis001") != fingerprint
+
+
+def test_cache_returns_stored_responses(tmp_path):
+    path = str(tmp_path / "cache" / "responses.sqlite")
+    cache = ResponseCache(path)
+    key = ResponseCache.key(scope="flow", query="text", replicate=0)
+    cache.put(key, {"violation": True})
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get(key) == {"violation": True}
+    assert cache.get(ResponseCache.key(scope="flow", query="text", replicate=1)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_fingerprint_follows_additional_includes(tmp_path):
+    models_dir = os.path.join(FLOW_DIR, "..")
+    for flow in ("experiment_flow", "batched_flow"):
+        shutil.copytree(
+            os.path.join(models_dir, flow),
+            tmp_path / flow,
+            ignore=shutil.ignore_patterns("__pycache__"),
+        )
+    batched_flow = str(tmp_path / "batched_flow")
+    fingerprint = flow_fingerprint(batched_flow, "hypothesis_multi")
+
+    append_line(tmp_path / "experiment_flow" / "utils" / "rule_catalog.py")
+
+    assert flow_fingerprint(batched_flow, "hypothesis_multi") != fingerprint
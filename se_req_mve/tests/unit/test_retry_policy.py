@@ -0,0 +1,179 @@
+"""Test for experiment_flow.features.retry_policy"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from experiment_flow.features import retry_policy
+from experiment_flow.features.retry_policy import (
+    FATAL,
+    SERVER_ERROR,
+    THROTTLED,
+    TRANSIENT,
+    CircuitBreaker,
+    RetryPolicy,
+    classify_error,
+    retry_after,
+)
+
+
+class HTTPError(Exception):
+    def __init__(self, message="", status_code=None, headers=None):
+        super().__init__(message)
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+def wrapped(error):
+    """The error as promptflow raises it, wrapped in its own exception."""
+    try:
+        raise error
+    except Exception as cause:
+        try:
+            raise RuntimeError("Execution failure in 'classify_with_llm'") from cause
+        except RuntimeError as wrapper:
+            return wrapper
+
+
+@pytest.mark.parametrize(
+    "error, kind",
+    [
+        (HTTPError(status_code=429), THROTTLED),
+        (Exception("Error code: 429 - quota exceeded"), THROTTLED),
+        (Exception("Rate limit is exceeded. Try again later."), THROTTLED),
+        (HTTPError(status_code=500), SERVER_ERROR),
+        (HTTPError(status_code=503), SERVER_ERROR),
+        (HTTPError(status_code=400), FATAL),
+        (HTTPError(status_code=401), FATAL),
+        (TimeoutError("read timed out"), TRANSIENT),
+        (ConnectionError("connection reset"), TRANSIENT),
+        (wrapped(HTTPError(status_code=429)), THROTTLED),
+        (wrapped(HTTPError(status_code=404)), FATAL),
+    ],
+)
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+@pytest.mark.parametrize(
+    "error, seconds",
+    [
+        (HTTPError(status_code=429, headers={"Retry-After": "7"}), 7.0),
+        (HTTPError(status_code=429, headers={"retry-after-ms": "250"}), 0.25),
+        (Exception("Please retry after 12 seconds."), 12.0),
+        (Exception("Please retry after 500ms."), 0.5),
+        (wrapped(HTTPError(status_code=429, headers={"Retry-After": "3"})), 3.0),
+        (Exception("Rate limit is exceeded."), None),
+    ],
+)
+def test_retry_after(error, seconds):
+    assert retry_after(error) == seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(retry_policy, "time", clock)
+    monkeypatch.setattr(retry_policy, "asyncio", SimpleNamespace(sleep=clock.sleep))
+    return clock
+
+
+def test_breaker_opens_for_retry_after_delay(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+
+    breaker.trip(2)
+    asyncio.run(breaker.wait())
+
+    assert clock.now == 2
+    assert breaker.trips == 1
+
+
+def test_breaker_cools_down_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+
+    for _ in range(3):
+        breaker.trip(1)
+    asyncio.run(breaker.wait())
+
+    assert clock.now == 30
+    breaker.reset()
+    breaker.trip(1)
+    assert breaker.open_until == 31
+
+
+def test_breaker_keeps_the_latest_reopening(clock):
+    breaker = CircuitBreaker()
+
+    breaker.trip(10)
+    breaker.trip(5)
+
+    assert breaker.open_until == 10
+    assert breaker.trips == 1
+
+
+def failing(*errors, result="ok"):
+    """An attempt raising the errors one after the other, then returning."""
+    calls = []
+
+    async def attempt():
+        calls.append(len(calls))
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return attempt, calls
+
+
+def test_retries_transient_and_server_errors(clock):
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    attempt, calls = failing(TimeoutError(), HTTPError(status_code=502))
+
+    assert asyncio.run(policy.run(attempt)) == "ok"
+    assert len(calls) == 3
+    assert policy.stats()[TRANSIENT] == 1
+    assert policy.stats()[SERVER_ERROR] == 1
+    assert all(1 <= delay <= 8 for delay in clock.sleeps)
+
+
+def test_throttled_calls_wait_for_the_breaker(clock):
+    policy = RetryPolicy(base_delay=1)
+    attempt, calls = failing(HTTPError(status_code=429, headers={"Retry-After": "20"}))
+
+    assert asyncio.run(policy.run(attempt)) == "ok"
+    assert len(calls) == 2
+    assert clock.sleeps == [20]
+    assert policy.stats()[THROTTLED] == 1
+    assert policy.stats()["breaker_trips"] == 1
+    assert policy.breaker.consecutive_failures == 0
+
+
+def test_fatal_errors_are_not_retried(clock):
+    policy = RetryPolicy()
+    attempt, calls = failing(HTTPError("bad request", status_code=400))
+
+    with pytest.raises(HTTPError):
+        asyncio.run(policy.run(attempt))
+    assert len(calls) == 1
+
+
+def test_last_error_is_raised_after_max_attempts(clock):
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+    attempt, calls = failing(*[TimeoutError(f"timeout {i}") for i in range(5)])
+
+    with pytest.raises(TimeoutError, match="timeout 2"):
+        asyncio.run(policy.run(attempt))
+    assert len(calls) == 3
+    assert policy.stats()[TRANSIENT] == 2
@@ -0,0 +1,115 @@
+"""Test for the rule catalog of experiment_flow"""
+
+import json
+import os
+
+import pytest
+
+from utils.rule_catalog import load_catalog
+
+PROMPTS = os.path.join(
+    os.path.dirname(__file__), "..", "..", "models", "experiment_flow", "prompts"
+)
+RULES = [
+    {
+        "id": "R1",
+        "definition": "Use definite articles.",
+        "examples": [{"requirement": "A pump shall start.", "violation": "yes"}],
+    },
+    {
+        "id": "R2",
+        "definition": "Avoid vague terms.",
+        "examples": [
+            {"requirement": "The valve shall be fast.", "violation": "yes"},
+            {"requirement": "The valve shall close in 2s.", "violation": "no"},
+        ],
+    },
+    {"id": "R3", "definition": "Use active voice."},
+]
+
+
+@pytest.fixture
+def rules_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES))
+    return str(path)
+
+
+def test_select_single_rule(rules_file):
+    rule = load_catalog(rules_file).select("R2")
+
+    assert rule["id"] == "R2"
+    assert rule["definition"] == "Avoid vague terms."
+    assert rule["examples"] == RULES[1]["examples"]
+    assert rule["rules"] == [RULES[1]]
+    assert rule["fragments"] == {
+        "rule_lines": "R2: Avoid vague terms.\n",
+        "examples": "TEXT: The valve shall be fast.\nOUTPUT: yes\n"
+        "TEXT: The valve shall close in 2s.\nOUTPUT: no\n",
+    }
+
+
+def test_select_comma_separated_rules(rules_file):
+    rule = load_catalog(rules_file).select("R3,R1")
+
+    assert rule["id"] == "R3,R1"
+    assert rule["definition"] == "Use active voice.\nUse definite articles."
+    assert rule["rules"] == [RULES[2], RULES[0]]
+    assert rule["fragments"] == {
+        "rule_lines": "R3: Use active voice.\nR1: Use definite articles.\n",
+        "examples": "TEXT: A pump shall start.\nOUTPUT: yes\n",
+    }
+
+
+def test_examples_fragment_renders_in_the_prompt(rules_file):
+    jinja2 = pytest.importorskip("jinja2")
+    rule = load_catalog(rules_file).select("R2")
+    with open(os.path.join(PROMPTS, "hypothesis002.jinja2")) as template_file:
+        # the options promptflow renders LLM prompts with
+        template = jinja2.Template(
+            template_file.read(), trim_blocks=True, keep_trailing_newline=True
+        )
+
+    prompt = template.render(
+        rule_definition=rule["definition"],
+        examples=rule["fragments"]["examples"],
+        requirement="The pump shall start.",
+    )
+
+    assert (
+        "Here are a few examples:\n"
+        "TEXT: The valve shall be fast.\nOUTPUT: yes\n"
+        "TEXT: The valve shall close in 2s.\nOUTPUT: no\n"
+        "\nHere is the rule that the input must follow:\n"
+        "Avoid vague terms.\n"
+    ) in prompt
+
+
+def test_select_unknown_rule(rules_file):
+    with pytest.raises(KeyError, match="Unknown rule ID: R9"):
+        load_catalog(rules_file).select("R1,R9")
+
+
+def test_select_returns_a_copy(rules_file):
+    catalog = load_catalog(rules_file)
+
+    catalog.select("R1")["definition"] = "changed"
+
+    assert catalog.select("R1")["definition"] == "Use definite articles."
+
+
+def test_catalog_is_compiled_once_per_content(rules_file, tmp_path):
+    catalog = load_catalog(rules_file)
+    copy = tmp_path / "copy.json"
+    copy.write_text(json.dumps(RULES))
+
+    assert load_catalog(rules_file) is catalog
+    assert load_catalog(str(copy)) is catalog
+
+    with open(rules_file, "w") as changed_file:
+        json.dump(RULES[:1], changed_file)
+    os.utime(rules_file, ns=(0, 0))
+
+    changed = load_catalog(rules_file)
+    assert changed is not catalog
+    assert list(changed.rules) == ["R1"]
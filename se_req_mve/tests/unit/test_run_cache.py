@@ -0,0 +1,83 @@
+"""Test for llmops.common.run_cache"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from llmops.common.run_cache import RunCache, compute_run_key, hash_flow_directory
+
+
+@pytest.fixture
+def flow_dir(tmp_path):
+    (tmp_path / "flow.dag.yaml").write_text("nodes: []\n")
+    (tmp_path / "prompts").mkdir()
+    (tmp_path / "prompts" / "hypothesis001.jinja2").write_text("{{ query }}\n")
+    (tmp_path / "utils").mkdir()
+    (tmp_path / "utils" / "helper.py").write_text("VALUE = 1\n")
+    return tmp_path
+
+
+def test_flow_hash_changes_with_any_flow_file(flow_dir):
+    flow_hash = hash_flow_directory(str(flow_dir))
+
+    (flow_dir / "utils" / "helper.py").write_text("VALUE = 2\n")
+
+    assert hash_flow_directory(str(flow_dir)) != flow_hash
+
+
+def test_flow_hash_changes_with_file_names(flow_dir):
+    flow_hash = hash_flow_directory(str(flow_dir))
+
+    (flow_dir / "utils" / "helper.py").rename(flow_dir / "utils" / "other.py")
+
+    assert hash_flow_directory(str(flow_dir)) != flow_hash
+
+
+@pytest.mark.parametrize("directory", ["__pycache__", ".promptflow", ".runs", ".git"])
+def test_flow_hash_ignores_cache_and_hidden_directories(flow_dir, directory):
+    flow_hash = hash_flow_directory(str(flow_dir))
+
+    (flow_dir / directory).mkdir()
+    (flow_dir / directory / "output.json").write_text("{}")
+    (flow_dir / "utils" / directory).mkdir()
+    (flow_dir / "utils" / directory / "helper.pyc").write_text("")
+
+    assert hash_flow_directory(str(flow_dir)) == flow_hash
+
+
+def test_run_key_depends_on_every_input():
+    arguments = ("flow", "azureml:data:1", "${node.v1}", {"query": "${data.text}"})
+    run_key = compute_run_key(*arguments)
+
+    assert compute_run_key(*arguments) == run_key
+    for index, changed in enumerate(
+        ["other", "azureml:data:2", "${node.v2}", {"query": "${data.other}"}]
+    ):
+        changed_arguments = list(arguments)
+        changed_arguments[index] = changed
+        assert compute_run_key(*changed_arguments) != run_key
+
+
+def test_run_key_ignores_column_mapping_order():
+    assert compute_run_key(
+        "flow", "data", None, {"a": "${data.a}", "b": "${data.b}"}
+    ) == compute_run_key("flow", "data", "", {"b": "${data.b}", "a": "${data.a}"})
+
+
+def test_lookup_evicts_runs_that_did_not_complete(tmp_path):
+    statuses = {"done": "Completed", "broken": "Failed"}
+    pf = SimpleNamespace(
+        runs=SimpleNamespace(
+            get=lambda name: SimpleNamespace(name=name, status=statuses[name])
+        )
+    )
+    cache = RunCache(pf, cache_file=str(tmp_path / "run_cache.json"))
+    cache.add("key_done", "done")
+    cache.add("key_broken", "broken")
+    cache = RunCache(pf, cache_file=str(tmp_path / "run_cache.json"))
+
+    assert cache.lookup("key_done") == "done"
+    assert cache.lookup("key_broken") is None
+    assert cache.lookup("key_missing") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.index == {"key_done": "done"}
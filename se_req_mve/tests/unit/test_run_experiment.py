@@ -0,0 +1,338 @@
+"""Test for experiment_flow.features.experiment"""
+
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("promptflow")
+pytest.importorskip("sklearn")
+
+from convert_to_dict import convert_to_dict  # noqa: E402
+from experiment_flow.features import experiment  # noqa: E402
+from experiment_flow.features.call_stats import (  # noqa: E402
+    CallStats,
+    CallTimer,
+)
+from experiment_flow.features.response_cache import ResponseCache  # noqa: E402
+from experiment_flow.features.retry_policy import RetryPolicy  # noqa: E402
+
+FLOW = "../experiment_flow"
+VARIANT = "hypothesis001"
+
+
+class FakePFClient:
+    """Answers every call with the raw LLM output `answer`, or
+    `answers[variant]` for the variants it has, parsed by the
+    convert_to_dict node as the flow does. Tracks the calls in flight and
+    times out the first `failures` calls."""
+
+    def __init__(self, answer='{"violation": "yes"}', answers=None, latency=0):
+        self.answer = answer
+        self.answers = answers or {}
+        self.latency = latency
+        self.failures = 0
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def test(self, flow, inputs, variant):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise TimeoutError("Request timed out")
+            self.calls.append((flow, inputs, variant))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return {"output": convert_to_dict(self.answers.get(variant, self.answer))}
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    lines = [
+        {"text": "The pump shall start.", "r3": 0, "r7": 1},
+        {"text": "The valve shall be fast.", "r3": 1, "r7": 0},
+        {"text": "The system shall be nice.", "r3": 1, "r7": 1},
+    ]
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps(lines))
+    return str(path)
+
+
+@pytest.fixture
+def flow_dir(monkeypatch):
+    # the flow paths of the engine are relative to the flow directory
+    monkeypatch.chdir(experiment.__file__.rsplit("/features/", 1)[0])
+
+
+@pytest.fixture
+def pf(monkeypatch):
+    pf = FakePFClient()
+    clients = []
+
+    def get_promptflow_client(**kwargs):
+        clients.append(kwargs)
+        return pf, None
+
+    monkeypatch.setattr(experiment, "get_promptflow_client", get_promptflow_client)
+    pf.clients = clients
+    return pf
+
+
+def widths(monkeypatch, values):
+    """Makes the CI width of successive stopping checks `values`, recording
+    the number of replicates of each check."""
+    values = iter(values)
+    checks = []
+
+    def ci_width(metrics):
+        checks.append(len(metrics))
+        return next(values)
+
+    monkeypatch.setattr(experiment, "ci_width", ci_width)
+    return checks
+
+
+def run_experiment(dataset, output_dir, **kwargs):
+    return experiment.run_experiment(
+        dataset,
+        FLOW,
+        "incose_rules.json",
+        SimpleNamespace(),
+        output_dir=str(output_dir),
+        variant=VARIANT,
+        retry_policy=RetryPolicy(base_delay=0, max_delay=0),
+        **kwargs,
+    )
+
+
+def test_adaptive_replicates_stop_once_the_ci_is_narrow(
+    monkeypatch, tmp_path, dataset, flow_dir, pf
+):
+    checks = widths(monkeypatch, [0.3, 0.2, 0.04])
+
+    exper_out = run_experiment(
+        dataset, tmp_path, num_runs=1, max_runs=10, ci_threshold=0.05
+    )
+
+    # at least 2 replicates, then one more per check above the threshold
+    assert checks == [2, 3, 4]
+    assert exper_out.num_runs == 4
+    assert len(exper_out.all_metrics["f1"]) == 4
+    assert len(pf.calls) == 3 * 4
+    assert exper_out.stopping == {
+        "metric": "f1",
+        "ci_width": 0.04,
+        "ci_threshold": 0.05,
+        "min_runs": 2,
+        "max_runs": 10,
+        "converged": True,
+    }
+    # the added replicates share the client of the experiment
+    assert len(pf.clients) == 1
+    with open(exper_out.metrics_file) as metrics_file:
+        assert json.load(metrics_file)["stopping"] == exper_out.stopping
+
+
+def test_adaptive_replicates_stop_at_max_runs(
+    monkeypatch, tmp_path, dataset, flow_dir, pf
+):
+    checks = widths(monkeypatch, [1.0] * 10)
+
+    exper_out = run_experiment(
+        dataset, tmp_path, num_runs=3, max_runs=5, ci_metric="recall"
+    )
+
+    assert checks == [3, 4, 5]
+    assert exper_out.num_runs == 5
+    assert len(pf.calls) == 3 * 5
+    assert exper_out.stopping["metric"] == "recall"
+    assert exper_out.stopping["min_runs"] == 3
+    assert not exper_out.stopping["converged"]
+    # the predictions of each line hold every replicate in order
+    runs = sorted((tmp_path / "results").glob("**/runs/replicate_*.jsonl"))
+    assert [run.name for run in runs] == [
+        f"replicate_{idx:03}.jsonl" for idx in range(5)
+    ]
+
+
+def test_fixed_replicates_have_no_stopping_rule(tmp_path, dataset, flow_dir, pf):
+    exper_out = run_experiment(dataset, tmp_path, num_runs=1)
+
+    assert exper_out.num_runs == 1
+    assert exper_out.stopping is None
+    assert len(pf.calls) == 3
+
+
+def campaign_spec(dataset, **spec):
+    return {
+        "dataset_path": dataset,
+        "pf_model_path": FLOW,
+        "input_data_path": "incose_rules.json",
+        "num_runs": 2,
+        "query_id": "text",
+        "rule_ids": ["r3", "r7"],
+        "result_key": "violation",
+        "variant": VARIANT,
+        **spec,
+    }
+
+
+def test_campaign_runs_every_rule_with_every_variant_on_one_pool(
+    tmp_path, dataset, flow_dir, pf
+):
+    pf.answers = {"${classify_with_llm.hypothesis002}": '{"violation": "no"}'}
+    pf.latency = 0.01
+
+    outputs = experiment.run_campaign(
+        campaign_spec(dataset),
+        SimpleNamespace(),
+        variants=["hypothesis001", "hypothesis002"],
+        output_dir=str(tmp_path),
+        num_workers=2,
+        retry_policy=RetryPolicy(base_delay=0, max_delay=0),
+    )
+
+    # 3 lines x 2 replicates for each of 2 rules x 2 variants
+    assert len(pf.calls) == 3 * 2 * 2 * 2
+    assert pf.max_in_flight <= 2
+    assert len(pf.clients) == 1
+    assert {variant: sorted(rules) for variant, rules in outputs.items()} == {
+        "hypothesis001": ["r3", "r7"],
+        "hypothesis002": ["r3", "r7"],
+    }
+    for variant, recall in [("hypothesis001", 1.0), ("hypothesis002", 0.0)]:
+        for rule_id, exper_out in outputs[variant].items():
+            assert exper_out.experiment_name == f"campaign000/{variant}"
+            assert exper_out.num_runs == 2
+            assert exper_out.all_metrics["recall"] == [recall, recall]
+            assert exper_out.call_stats["calls"] == 3 * 2
+            assert exper_out.metrics_file == str(
+                tmp_path / "results" / "campaign000" / variant / rule_id
+                / "metrics.json"
+            )
+
+
+def test_campaign_defaults_to_the_variant_of_the_spec(
+    tmp_path, dataset, flow_dir, pf
+):
+    outputs = experiment.run_campaign(
+        campaign_spec(dataset, num_runs=1, rule_ids=["r3"]),
+        SimpleNamespace(),
+        output_dir=str(tmp_path),
+        output_predictions=False,
+        retry_policy=RetryPolicy(base_delay=0, max_delay=0),
+    )
+
+    assert list(outputs) == [VARIANT]
+    assert {variant for _, _, variant in pf.calls} == {
+        f"${{classify_with_llm.{VARIANT}}}"
+    }
+    # metrics are written without the predictions and call records
+    assert list((tmp_path / "results").glob("**/runs")) == []
+    assert outputs[VARIANT]["r3"].metrics_file is not None
+
+
+def test_campaign_rejects_an_invalid_spec(tmp_path, dataset, pf):
+    spec = campaign_spec(dataset)
+    del spec["rule_ids"]
+
+    with pytest.raises(ValueError, match="Invalid experiment spec"):
+        experiment.run_campaign(spec, SimpleNamespace(), output_dir=str(tmp_path))
+    assert pf.calls == []
+
+
+def timer(queue_wait, latency, attempts=1):
+    call_timer = CallTimer()
+    call_timer.queue_wait = queue_wait
+    call_timer.latency = latency
+    call_timer.attempts = attempts
+    return call_timer
+
+
+def test_call_stats_summarize_calls_and_cache_hits(tmp_path):
+    path = tmp_path / "runs" / "calls.jsonl"
+    call_stats = CallStats(str(path))
+
+    call_stats.record([0], 0, timer(0.5, 1.0), 100, 10)
+    call_stats.record([1], 0, timer(1.5, 3.0, attempts=3), 200, 20)
+    call_stats.record([0], 1)
+    call_stats.close()
+
+    summary = call_stats.summary(elapsed=2.0)
+    assert summary == {
+        "calls": 2,
+        "cache_hits": 1,
+        "retries": 2,
+        "latency_p50": 2.0,
+        "latency_p95": pytest.approx(2.9),
+        "latency_p99": pytest.approx(2.98),
+        "queue_wait_p50": 1.0,
+        "queue_wait_p95": pytest.approx(1.45),
+        "queue_wait_p99": pytest.approx(1.49),
+        "prompt_tokens": 300,
+        "completion_tokens": 30,
+        "total_tokens": 330,
+        "calls_per_second": 1.0,
+        "tokens_per_second": 165.0,
+    }
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[1] == {
+        "lines": [1],
+        "replicate": 0,
+        "cache_hit": False,
+        "queue_wait": 1.5,
+        "latency": 3.0,
+        "retries": 2,
+        "prompt_tokens": 200,
+        "completion_tokens": 20,
+    }
+    assert records[2]["cache_hit"]
+    assert records[2]["latency"] == 0.0
+
+
+def test_call_stats_without_calls():
+    summary = CallStats().summary(elapsed=0)
+
+    assert summary["calls"] == 0
+    assert summary["latency_p50"] is None
+    assert summary["calls_per_second"] == 0.0
+
+
+def test_experiment_records_every_call(tmp_path, dataset, flow_dir, pf):
+    pf.failures = 1
+
+    exper_out = run_experiment(dataset, tmp_path, num_runs=2)
+
+    with open(f"{exper_out.predictions_dir}/calls.jsonl") as calls_file:
+        records = [json.loads(line) for line in calls_file]
+    assert sorted((r["lines"], r["replicate"]) for r in records) == [
+        ([line], replicate) for line in range(3) for replicate in range(2)
+    ]
+    assert sum(r["retries"] for r in records) == 1
+    assert all(r["prompt_tokens"] > 0 for r in records)
+    call_stats = exper_out.call_stats
+    assert call_stats["calls"] == 6
+    assert call_stats["retries"] == 1
+    assert call_stats["prompt_tokens"] == sum(r["prompt_tokens"] for r in records)
+    with open(exper_out.metrics_file) as metrics_file:
+        assert json.load(metrics_file)["call_stats"] == call_stats
+
+
+def test_cache_hits_are_recorded_without_calls(tmp_path, dataset, flow_dir, pf):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    run_experiment(dataset, tmp_path / "first", num_runs=2, cache=cache)
+
+    exper_out = run_experiment(dataset, tmp_path / "second", num_runs=2, cache=cache)
+    cache.close()
+
+    assert len(pf.calls) == 6
+    assert exper_out.call_stats["calls"] == 0
+    assert exper_out.call_stats["cache_hits"] == 6
+    assert exper_out.call_stats["total_tokens"] == 0
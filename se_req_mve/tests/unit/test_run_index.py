@@ -0,0 +1,91 @@
+"""Test for llmops.common.run_index"""
+
+import threading
+from types import SimpleNamespace
+
+from llmops.common.run_index import (
+    NODE_VARIANT_PROPERTY,
+    RunIndex,
+    run_tags,
+)
+
+
+def tagged_run(name, rule, dataset, variant=None):
+    return SimpleNamespace(
+        name=name, tags=run_tags(rule, dataset, variant), properties={}
+    )
+
+
+def untagged_run(name, data, variant=None):
+    properties = {}
+    if variant is not None:
+        properties[NODE_VARIANT_PROPERTY] = f"${{classify.{variant}}}"
+    return SimpleNamespace(name=name, tags={}, data=data, properties=properties)
+
+
+class FakePFClient:
+    def __init__(self, runs):
+        self.by_name = {run.name: run for run in runs}
+        self.gets = []
+        self._lock = threading.Lock()
+        self.runs = SimpleNamespace(get=self.get)
+
+    def get(self, name):
+        with self._lock:
+            self.gets.append(name)
+        return self.by_name[name]
+
+
+RUNS = [
+    tagged_run("exp_r1_train", "r1", "train"),
+    tagged_run("exp_v1_r1_train", "r1", "train", "v1"),
+    tagged_run("exp_r2_test", "r2", "test"),
+    untagged_run("old_v1_r1_train", "azureml:train:3", "v1"),
+    untagged_run("old_r10_train", "azureml:train:3"),
+]
+
+
+def load(runs=RUNS, run_names=None):
+    pf = FakePFClient(runs)
+    index = RunIndex(pf)
+    index.load(run_names or [run.name for run in runs])
+    return index, pf
+
+
+def test_load_fetches_each_run_once():
+    names = [run.name for run in RUNS]
+    index, pf = load(run_names=names + names[:2])
+
+    assert sorted(pf.gets) == sorted(names)
+    index.load(names)
+    assert len(pf.gets) == len(names)
+    assert list(index.runs) == names
+
+
+def test_find_by_tags():
+    index, _ = load()
+
+    assert [run.name for run in index.find(rule="r2")] == ["exp_r2_test"]
+    assert [run.name for run in index.find(rule="r1", variant="v1")] == [
+        "exp_v1_r1_train",
+        "old_v1_r1_train",
+    ]
+    assert [run.name for run in index.find(dataset="test")] == ["exp_r2_test"]
+    assert len(index.find()) == len(RUNS)
+
+
+def test_untagged_runs_fall_back_to_data_property_and_name():
+    index, _ = load()
+
+    assert index.keys["old_v1_r1_train"] == {
+        "rule": None,
+        "dataset": "train",
+        "variant": "v1",
+    }
+    assert index.keys["old_r10_train"]["variant"] == "default"
+    # untagged runs match the rules their name contains
+    assert [run.name for run in index.find(rule="r10")] == ["old_r10_train"]
+    # the name match is a substring match, r1 is contained in r10
+    assert [
+        run.name for run in index.find(rule="r1", variant="default")
+    ] == ["exp_r1_train", "old_r10_train"]
@@ -0,0 +1,72 @@
+"""Test for llmops.common.run_manifest"""
+
+import pytest
+
+from llmops.common.run_manifest import (
+    RunManifest,
+    load_manifest,
+    read_completed_runs,
+)
+
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    path = str(tmp_path / "run_manifest.jsonl")
+    manifest = RunManifest(path)
+    manifest.record_submitted("key_a", "run_a", {"variant": "v1"})
+    manifest.record_completed("key_a", "run_a", {"variant": "v1"})
+    manifest.record_submitted("key_b", "run_b")
+    manifest.record_submitted("key_c", "run_c")
+    manifest.record_failed("key_c", "run_c")
+    return path
+
+
+def test_new_manifest_truncates_existing_one(manifest_path):
+    manifest = RunManifest(manifest_path)
+
+    assert manifest.runs == {}
+    assert load_manifest(manifest_path) == {}
+
+
+def test_resume_keeps_latest_event_of_every_run(manifest_path):
+    manifest = RunManifest(manifest_path, resume=True)
+
+    assert {key: record["event"] for key, record in manifest.runs.items()} == {
+        "key_a": "completed",
+        "key_b": "submitted",
+        "key_c": "failed",
+    }
+    assert manifest.runs["key_a"]["metadata"] == {"variant": "v1"}
+
+
+def test_resume_reattaches_completed_and_submitted_runs(manifest_path):
+    manifest = RunManifest(manifest_path, resume=True)
+
+    assert manifest.resumable_run("key_a") == "run_a"
+    assert manifest.resumable_run("key_b") == "run_b"
+    assert manifest.resumable_run("key_c") is None
+    assert manifest.resumable_run("key_d") is None
+
+
+def test_resume_appends_to_existing_manifest(manifest_path):
+    manifest = RunManifest(manifest_path, resume=True)
+    manifest.record_completed("key_b", "run_b")
+
+    assert [record["run_name"] for record in read_completed_runs(manifest_path)] == [
+        "run_a",
+        "run_b",
+    ]
+
+
+def test_resume_without_manifest_starts_empty(tmp_path):
+    path = tmp_path / "run_manifest.jsonl"
+
+    assert RunManifest(str(path), resume=True).runs == {}
+    assert path.exists()
+
+
+def test_load_skips_partially_written_line(manifest_path):
+    with open(manifest_path, "a") as manifest_file:
+        manifest_file.write('{"event": "completed", "run_key": "key_b"')
+
+    assert load_manifest(manifest_path)["key_b"]["event"] == "submitted"
@@ -0,0 +1,150 @@
+"""Test for llmops.common.run_scheduler"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("promptflow")
+
+from llmops.common.run_manifest import RunManifest  # noqa: E402
+from llmops.common.run_scheduler import RunScheduler, ScheduledRun  # noqa: E402
+from llmops.common.run_waiter import RunDetailsError  # noqa: E402
+
+
+class FakeRuns:
+    """Runs that complete, or fail, after a few status polls."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def create_or_update(self, run):
+        self.client.submitted.append(run.name)
+        self.client.active.add(run.name)
+        self.client.max_active = max(self.client.max_active, len(self.client.active))
+        self.client.polls[run.name] = 0
+        return SimpleNamespace(name=run.name, status="NotStarted")
+
+    def get(self, name):
+        self.client.polls[name] = self.client.polls.get(name, 0) + 1
+        if self.client.polls[name] < self.client.polls_to_finish:
+            status = "Running"
+        elif name in self.client.failing:
+            status = "Failed"
+            self.client.active.discard(name)
+        else:
+            status = "Completed"
+        return SimpleNamespace(name=name, status=status)
+
+
+class FakePFClient:
+    def __init__(self, polls_to_finish=2, failing=(), without_details=()):
+        self.polls_to_finish = polls_to_finish
+        self.failing = set(failing)
+        self.without_details = set(without_details)
+        self.submitted = []
+        self.active = set()
+        self.max_active = 0
+        self.polls = {}
+        self.runs = FakeRuns(self)
+
+    def get_details(self, run):
+        if run.name in self.without_details:
+            raise PermissionError("details not uploaded")
+        self.active.discard(run.name)
+        return {"run": run.name}
+
+    def get_metrics(self, run):
+        return {"accuracy": 1.0, "run": run.name}
+
+
+def scheduled_runs(*names):
+    return [ScheduledRun(run=SimpleNamespace(name=name)) for name in names]
+
+
+def make_scheduler(pf, max_concurrent_runs):
+    return RunScheduler(
+        pf, max_concurrent_runs=max_concurrent_runs, initial_delay=0, jitter=0
+    )
+
+
+def test_run_all_bounds_runs_in_flight():
+    pf = FakePFClient(polls_to_finish=3)
+    names = [f"run_{i}" for i in range(7)]
+
+    completed = list(make_scheduler(pf, 2).run_all(scheduled_runs(*names)))
+
+    assert pf.max_active == 2
+    assert sorted(scheduled.job.name for scheduled in completed) == names
+    for scheduled in completed:
+        assert scheduled.details == {"run": scheduled.job.name}
+        assert scheduled.metrics["run"] == scheduled.job.name
+
+
+def test_run_all_submits_follow_up_runs():
+    pf = FakePFClient()
+
+    def follow_up(scheduled):
+        if scheduled.job.name.startswith("eval_"):
+            return []
+        return scheduled_runs(f"eval_{scheduled.job.name}")
+
+    completed = list(
+        make_scheduler(pf, 1).run_all(scheduled_runs("a", "b"), follow_up)
+    )
+
+    # a follow-up run is submitted ahead of the runs still pending
+    assert pf.submitted == ["a", "eval_a", "b", "eval_b"]
+    assert len(completed) == 4
+
+
+def test_run_all_raises_on_failed_run():
+    pf = FakePFClient(failing={"b"})
+
+    scheduler = make_scheduler(pf, 1)
+    with pytest.raises(Exception, match="run b failed with Failed"):
+        list(scheduler.run_all(scheduled_runs("a", "b", "c")))
+
+    # the first failure stops the scheduler
+    assert pf.submitted == ["a", "b"]
+
+
+def test_run_all_collects_the_poll_of_a_run_without_details(tmp_path):
+    pf = FakePFClient(without_details={"b"})
+    manifest = RunManifest(str(tmp_path / "manifest.jsonl"))
+    runs = scheduled_runs("a", "b", "c")
+    for scheduled in runs:
+        scheduled.run_key = f"key_{scheduled.run.name}"
+    scheduler = RunScheduler(
+        pf, max_concurrent_runs=2, manifest=manifest, initial_delay=0,
+        jitter=0, max_details_attempts=1,
+    )
+
+    completed = []
+    with pytest.raises(RunDetailsError, match="Details of run b"):
+        for scheduled in scheduler.run_all(runs):
+            completed.append(scheduled)
+
+    # a finished in the same poll as b, the failure stops the scheduler
+    assert [scheduled.job.name for scheduled in completed] == ["a"]
+    assert completed[0].details == {"run": "a"}
+    assert pf.submitted == ["a", "b"]
+    assert manifest.runs["key_a"]["event"] == "completed"
+    assert manifest.runs["key_b"]["event"] == "failed"
+
+
+def test_run_all_tracks_a_shared_existing_run_once():
+    pf = FakePFClient()
+    runs = scheduled_runs("x", "y")
+    for scheduled in runs:
+        scheduled.existing_run_name = "cached"
+
+    completed = list(make_scheduler(pf, 2).run_all(runs))
+
+    assert pf.submitted == []
+    assert [scheduled.run.name for scheduled in completed] == ["x", "y"]
+    assert all(scheduled.metrics["run"] == "cached" for scheduled in completed)
+
+
+def test_scheduler_needs_one_run_in_flight():
+    with pytest.raises(ValueError):
+        RunScheduler(FakePFClient(), max_concurrent_runs=0)
@@ -0,0 +1,106 @@
+"""Test for llmops.common.run_waiter"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from llmops.common import run_waiter
+from llmops.common.run_waiter import RunCompletionWaiter, RunDetailsError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakePFClient:
+    """Client of a run that completes after `polls_to_finish` status polls
+    and whose details are ready after `details_failures` attempts."""
+
+    def __init__(self, clock, polls_to_finish, details_failures=0):
+        self.clock = clock
+        self.polls_to_finish = polls_to_finish
+        self.details_failures = details_failures
+        self.poll_times = []
+        self.details_calls = 0
+        self.runs = SimpleNamespace(get=self.get)
+
+    def get(self, name):
+        self.poll_times.append(self.clock.now)
+        finished = len(self.poll_times) >= self.polls_to_finish
+        return SimpleNamespace(name=name, status="Completed" if finished else "Running")
+
+    def get_details(self, run):
+        self.details_calls += 1
+        if self.details_calls <= self.details_failures:
+            raise PermissionError("details not uploaded yet")
+        return {"run": run.name}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(run_waiter, "time", clock)
+    return clock
+
+
+def test_polls_back_off_up_to_max_delay(clock):
+    pf = FakePFClient(clock, polls_to_finish=5)
+    waiter = RunCompletionWaiter(
+        pf, initial_delay=1, max_delay=3, multiplier=2, jitter=0
+    )
+
+    result = waiter.wait_all(["run"])["run"]
+
+    assert pf.poll_times == [0, 1, 3, 6, 9]
+    assert result.completed
+    assert result.polls == 5
+    assert result.waited_seconds == 9
+    assert result.details == {"run": "run"}
+    assert waiter.pending == 0
+
+
+def test_raises_timeout_error(clock):
+    pf = FakePFClient(clock, polls_to_finish=100)
+    waiter = RunCompletionWaiter(pf, initial_delay=1, jitter=0, timeout=5)
+
+    with pytest.raises(TimeoutError, match="did not finish within 5s"):
+        waiter.wait_all(["run"])
+
+    assert pf.poll_times == [0, 1, 3]
+
+
+def test_waits_for_details_of_completed_run(clock):
+    pf = FakePFClient(clock, polls_to_finish=1, details_failures=2)
+    waiter = RunCompletionWaiter(pf, initial_delay=1, jitter=0)
+
+    result = waiter.wait_all(["run"])["run"]
+
+    assert result.completed
+    assert result.details == {"run": "run"}
+    assert pf.details_calls == 3
+
+
+def test_fails_run_whose_details_cannot_be_read(clock):
+    pf = FakePFClient(clock, polls_to_finish=1, details_failures=100)
+    waiter = RunCompletionWaiter(
+        pf, initial_delay=1, jitter=0, max_details_attempts=4
+    )
+
+    with pytest.raises(RunDetailsError) as error:
+        waiter.wait_all(["run"])
+
+    assert pf.details_calls == 4
+    assert isinstance(error.value.__cause__, PermissionError)
+    assert error.value.result.status == "Failed"
+    assert not error.value.result.completed
+    assert waiter.pending == 0
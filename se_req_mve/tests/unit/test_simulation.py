@@ -0,0 +1,40 @@
+"""Test for llmops.common.simulation"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from llmops.common.simulation import (  # noqa: E402
+    SimulatedPFClient,
+    SimulationConfig,
+)
+
+
+def client():
+    return SimulatedPFClient(
+        SimulationConfig(
+            submit_latency=0, queue_latency=0, execute_latency=0,
+            latency_sigma=0, seed=0,
+        )
+    )
+
+
+def test_submitted_run_is_listed_by_name():
+    pf = client()
+
+    run = pf.runs.create_or_update(SimpleNamespace(name="exp_r1"))
+
+    assert pf.runs.get("exp_r1") is run
+    assert run.status == "Completed"
+
+
+def test_duplicate_run_name_is_rejected():
+    pf = client()
+    pf.runs.create_or_update(SimpleNamespace(name="exp_r1"))
+
+    with pytest.raises(Exception, match="'exp_r1' already exists"):
+        pf.runs.create_or_update(SimpleNamespace(name="exp_r1"))
+
+    assert [run.name for run in pf.simulated_runs] == ["exp_r1"]
@@ -0,0 +1,93 @@
+"""Test for llmops.common.tracing"""
+
+import json
+
+import pytest
+
+from llmops.common.tracing import RUN_NAME_ATTRIBUTE, Tracer
+
+
+def otlp_spans(trace):
+    (resource_spans,) = trace["resourceSpans"]
+    (scope_spans,) = resource_spans["scopeSpans"]
+    return {span["name"]: span for span in scope_spans["spans"]}
+
+
+def attributes(span):
+    return {item["key"]: item["value"] for item in span["attributes"]}
+
+
+def test_export_writes_nested_spans_as_otlp_json(tmp_path):
+    trace_file = tmp_path / "traces" / "prompt_pipeline.json"
+    tracer = Tracer("prompt_pipeline", str(trace_file))
+
+    with tracer.span("run_preparation", runs=3, dry_run=False):
+        with tracer.span("data_asset_lookup", dataset="train"):
+            pass
+    tracer.record_span("run.execute", 10.0, 12.5, ratio=0.5)
+    tracer.export()
+
+    trace = json.loads(trace_file.read_text())
+    resource = trace["resourceSpans"][0]["resource"]
+    assert resource["attributes"] == [
+        {"key": "service.name", "value": {"stringValue": "prompt_pipeline"}}
+    ]
+    spans = otlp_spans(trace)
+    parent = spans["run_preparation"]
+    child = spans["data_asset_lookup"]
+    assert child["parentSpanId"] == parent["spanId"]
+    assert "parentSpanId" not in parent
+    assert {span["traceId"] for span in spans.values()} == {tracer.trace_id}
+    assert attributes(parent) == {
+        "runs": {"intValue": "3"},
+        "dry_run": {"boolValue": False},
+    }
+    assert attributes(child) == {"dataset": {"stringValue": "train"}}
+    assert parent["status"] == {"code": 1}
+
+    execute = spans["run.execute"]
+    assert execute["startTimeUnixNano"] == "10000000000"
+    assert execute["endTimeUnixNano"] == "12500000000"
+    assert attributes(execute) == {"ratio": {"doubleValue": 0.5}}
+
+
+def test_failed_span_records_the_error():
+    tracer = Tracer("prompt_eval")
+
+    with pytest.raises(ValueError):
+        with tracer.span("report_writing"):
+            raise ValueError("no results")
+
+    (span,) = otlp_spans(tracer.to_otlp()).values()
+    assert span["status"] == {"code": 2, "message": "no results"}
+    assert tracer.current_span_id is None
+
+
+def test_export_without_trace_file_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracer = Tracer("prompt_eval")
+    with tracer.span("report_writing"):
+        pass
+
+    tracer.export()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_summary_totals_phases_per_run():
+    tracer = Tracer("prompt_pipeline")
+    run = tracer.record_span("run", 0, 10, **{RUN_NAME_ATTRIBUTE: "exp_r1"})
+    tracer.record_span(
+        "run.queue", 0, 4, parent_id=run.span_id, **{RUN_NAME_ATTRIBUTE: "exp_r1"}
+    )
+    tracer.record_span(
+        "run.execute", 4, 10, parent_id=run.span_id,
+        **{RUN_NAME_ATTRIBUTE: "exp_r1"}
+    )
+
+    lines = tracer.summary().splitlines()
+
+    assert lines[1].split() == ["run", "1", "10.0", "10.0"]
+    # phase columns are sorted by name: run, run.execute, run.queue
+    assert lines[-2].split() == ["run", "run", "run.execute", "run.queue"]
+    assert lines[-1].split() == ["exp_r1", "10.0", "6.0", "4.0"]